@@ -0,0 +1,286 @@
+"""
+End to end latency of every /api/v1 route on synthetic databases of a few
+sizes, through the Flask test client and optionally a local HTTP server.
+Results go to a JSON file so runs can be compared.
+
+    python -m benchmarks.api [--scales 1000 10000 50000] [--requests 200]
+                             [--http] [--no-cache] [--output api.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+from typing import Callable
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from kitchenfire import app
+from kitchenfire.counters import get_counters
+
+from .synthetic import WORDS, build_database, zipf_weights
+
+SKEW = 1.1
+
+
+class Scenario:
+    """Picks the arguments for requests the way a real feed would, with
+    popular recipes, tags and ingredients asked for more often."""
+
+    def __init__(self, db_url: str, seed: int = 0):
+        self.rng = random.Random(seed)
+        db = sqlite3.connect(db_url)
+        self.recipes = [r for (r,) in db.execute("SELECT RecipeId FROM Posts ORDER BY NumberOfLikes DESC")]
+        self.tags = [t for (t,) in db.execute("SELECT TagId FROM Tags ORDER BY TagId")]
+        self.ingredients = [i for (i,) in db.execute("SELECT IngredientId FROM Ingredients ORDER BY IngredientId")]
+        self.comments = db.execute("SELECT PostId, CommentId FROM Comments").fetchall()
+        db.close()
+        self.recipe_weights = zipf_weights(len(self.recipes), SKEW)
+        self.tag_weights = zipf_weights(len(self.tags), SKEW)
+        self.ingredient_weights = zipf_weights(len(self.ingredients), SKEW)
+        self.saved = 0
+
+    def recipe(self) -> int:
+        return self.rng.choices(self.recipes, cum_weights=self.recipe_weights)[0]
+
+    def tag(self) -> int:
+        return self.rng.choices(self.tags, cum_weights=self.tag_weights)[0]
+
+    def ingredient(self) -> int:
+        return self.rng.choices(self.ingredients, cum_weights=self.ingredient_weights)[0]
+
+    def ingredient_list(self, n: int) -> str:
+        return ",".join(str(self.ingredient()) for _ in range(n))
+
+    def comment(self) -> tuple[int, int]:
+        return self.rng.choice(self.comments) if self.comments else (self.recipe(), 1)
+
+    def new_recipe(self) -> dict:
+        self.saved += 1
+        return {
+            "name": f"Benchmark Recipe {self.saved} {self.rng.random()}",
+            "description": "Made by the API benchmark",
+            "instructions": " ".join(self.rng.choices(WORDS, k=30)),
+            "cooktime": self.rng.randint(5, 90),
+            "difficulty": self.rng.randint(1, 5),
+            "tags": list(dict.fromkeys(f"tag{self.tag()}" for _ in range(3))),
+            "ingredients": [
+                {"ingredient": f"Ingredient {i}", "amount": 1, "unit": "cup"}
+                for i in dict.fromkeys(self.ingredient() for _ in range(6))
+            ],
+        }
+
+
+# (name, method, builds (path, json body) for one request)
+Route = tuple[str, str, Callable[[Scenario], tuple[str, dict | None]]]
+
+ROUTES: list[Route] = [
+    ("recipe/by-id", "GET", lambda s: (f"/api/v1/recipe/by-id/{s.recipe()}", None)),
+    ("recipe/by-id (20)", "GET", lambda s: (
+        f"/api/v1/recipe/by-id/{','.join(str(s.recipe()) for _ in range(20))}", None)),
+    ("recipe/trending", "GET", lambda s: (
+        f"/api/v1/recipe/trending/{s.rng.choice([0, 0, 0, 20, 40, 100])}/20", None)),
+    ("recipe/trending/cursor", "GET", lambda s: ("/api/v1/recipe/trending/cursor/-/20", None)),
+    ("recipe/filter/ingredient", "GET", lambda s: (
+        f"/api/v1/recipe/filter/ingredient/{s.ingredient()}/{s.ingredient_list(2)}", None)),
+    ("recipe/filter/tag", "GET", lambda s: (
+        f"/api/v1/recipe/filter/tag/{s.tag()}/{s.tag()}", None)),
+    ("recipe/search", "GET", lambda s: (
+        f"/api/v1/recipe/search?tags={s.tag()}&ingredients={s.ingredient_list(2)}"
+        f"&max_cook_time={s.rng.randint(20, 120)}&count=20", None)),
+    ("recipe/pantry", "GET", lambda s: (
+        f"/api/v1/recipe/pantry/{s.ingredient_list(10)}?count=20", None)),
+    ("recipe/search/text", "GET", lambda s: (
+        f"/api/v1/recipe/search/text?q={'+'.join(s.rng.sample(WORDS, 2))}&count=20", None)),
+    ("tag/all", "GET", lambda s: ("/api/v1/tag/all", None)),
+    ("tag/by-id", "GET", lambda s: (f"/api/v1/tag/by-id/{s.tag()}", None)),
+    ("ingredient/all", "GET", lambda s: ("/api/v1/ingredient/all", None)),
+    ("ingredient/by-id", "GET", lambda s: (f"/api/v1/ingredient/by-id/{s.ingredient()}", None)),
+    ("post/comment/all", "GET", lambda s: (f"/api/v1/post/{s.recipe()}/comment/all", None)),
+    ("post/comment/by-id", "GET", lambda s: (
+        "/api/v1/post/{}/comment/by-id/{}".format(*s.comment()), None)),
+    ("post/like", "POST", lambda s: (f"/api/v1/post/like/{s.recipe()}", None)),
+    ("post/dislike", "POST", lambda s: (f"/api/v1/post/dislike/{s.recipe()}", None)),
+    ("post/comment/like", "POST", lambda s: ("/api/v1/post/{}/{}/like".format(*s.comment()), None)),
+    ("post/comment/dislike", "POST", lambda s: (
+        "/api/v1/post/{}/{}/dislike".format(*s.comment()), None)),
+    ("post/create_comment", "POST", lambda s: (
+        f"/api/v1/post/{s.recipe()}/create_comment",
+        {"author": "bench", "body": "Looks great", "rating": s.rng.randint(1, 5)})),
+    ("recipe/save", "PUT", lambda s: ("/api/v1/recipe/save", s.new_recipe())),
+    ("_debug/pool", "GET", lambda s: ("/api/v1/_debug/pool", None)),
+    ("_debug/cache", "GET", lambda s: ("/api/v1/_debug/cache", None)),
+]
+
+# Saving a recipe touches every index, so it gets fewer rounds
+WRITE_HEAVY = {"recipe/save": 0.1}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args):
+        pass
+
+
+def reset_app(db_url: str, cache: bool):
+    """Points the app at db_url, dropping everything loaded from the last one."""
+    if "kitchenfire.counters" in app.extensions:
+        with app.app_context():
+            get_counters().flush()
+    writer = app.extensions.get("kitchenfire.writer")
+    if writer is not None:
+        writer.close()
+    pool = app.extensions.get("kitchenfire.pool")
+    if pool is not None:
+        pool.close_all()
+    for name in [n for n in app.extensions if n.startswith("kitchenfire.")]:
+        del app.extensions[name]
+    app.config.update(DB_URL=db_url, CACHE=cache)
+
+
+def test_client_sender():
+    client = app.test_client()
+
+    def send(method: str, path: str, body: dict | None) -> int:
+        return client.open(path, method=method, json=body).status_code
+
+    return send
+
+
+def http_sender(base_url: str):
+    def send(method: str, path: str, body: dict | None) -> int:
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            base_url + path,
+            data=data,
+            method=method,
+            headers={"Content-Type": "application/json"} if data else {},
+        )
+        try:
+            with urllib.request.urlopen(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    return send
+
+
+def measure(send, scenario: Scenario, route: Route, requests: int) -> dict:
+    name, method, build = route
+    requests = max(int(requests * WRITE_HEAVY.get(name, 1)), 1)
+    times = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        path, body = build(scenario)
+        start = time.perf_counter()
+        status = send(method, path, body)
+        times.append(time.perf_counter() - start)
+        if status >= 400:
+            errors += 1
+    elapsed = time.perf_counter() - started
+
+    cuts = statistics.quantiles(times, n=100, method="inclusive") if len(times) > 1 else times * 99
+    return {
+        "route": name,
+        "method": method,
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": cuts[49] * 1000,
+        "p95_ms": cuts[94] * 1000,
+        "p99_ms": cuts[98] * 1000,
+        "throughput_rps": requests / elapsed,
+    }
+
+
+def run_scale(tmp: str, scale: int, requests: int, http: bool, cache: bool) -> list[dict]:
+    db_url = build_database(
+        os.path.join(tmp, f"api{scale}.db"),
+        recipes=scale,
+        ingredients=max(scale // 10, 100),
+        tags=max(scale // 100, 50),
+        skew=SKEW,
+        comments=scale * 4,
+    )
+    reset_app(db_url, cache)
+
+    transports = [("test_client", test_client_sender())]
+    server = None
+    if http:
+        server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        transports.append(("http", http_sender(f"http://127.0.0.1:{server.server_port}")))
+
+    results = []
+    try:
+        for seed, (transport, send) in enumerate(transports):
+            # A new seed, so the recipes it saves don't clash with the last run's
+            scenario = Scenario(db_url, seed)
+            # One warm up request per route, so lazily built indexes aren't timed
+            for route in ROUTES:
+                path, body = route[2](scenario)
+                send(route[1], path, body)
+            for route in ROUTES:
+                result = measure(send, scenario, route, requests)
+                result.update(scale=scale, transport=transport)
+                results.append(result)
+                print(
+                    f"{scale:>7} {transport:>11} {result['route']:<26} "
+                    f"{result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+                    f"{result['throughput_rps']:>8.0f} {result['errors']:>6}"
+                )
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End to end API benchmark.")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10_000, 50_000])
+    parser.add_argument("--requests", type=int, default=200, help="per route and scale")
+    parser.add_argument("--http", action="store_true", help="also go through a local HTTP server")
+    parser.add_argument("--no-cache", action="store_true", help="turn the response cache off")
+    parser.add_argument("--output", default="api.json")
+    args = parser.parse_args()
+    # Failures are counted per route, the tracebacks would drown the table
+    app.logger.disabled = True
+
+    print(
+        f"{'recipes':>7} {'transport':>11} {'route':<26} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'errors':>6}"
+    )
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            results.extend(run_scale(tmp, scale, args.requests, args.http, not args.no_cache))
+        reset_app(app.config["DB_URL"], True)
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "run": {
+                    "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "python": platform.python_version(),
+                    "sqlite": sqlite3.sqlite_version,
+                    "requests": args.requests,
+                    "cache": not args.no_cache,
+                },
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
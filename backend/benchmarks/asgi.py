@@ -0,0 +1,192 @@
+"""
+The API under flask run's threaded server and under uvicorn with the ASGI
+adapter, side by side. Many clients scroll trending pages and search at the
+same time as a few keep saving recipes and commenting. Each server runs in
+its own process, on its own copy of the same database, and every request
+opens a new connection so both servers are driven the same way.
+
+Reports reader and writer latency, throughput, 503s turned away by the
+adapter's backpressure and failed requests.
+
+    python -m benchmarks.asgi [--readers 200] [--writers 8] [--seconds 10]
+                              [--queue 64] [--servers flask asgi]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from .api import Scenario
+from .load import OPERATIONS
+from .synthetic import build_database
+
+READS = {"trending": 3, "filter": 1}
+WRITES = {"save": 1, "comment": 2}
+
+
+def serve(server: str, db_url: str, port: int, queue: int):
+    """Runs one server in this process until it is killed."""
+    from kitchenfire import app
+
+    app.config.update(DB_URL=db_url, ASGI_QUEUE=queue)
+    app.logger.disabled = True
+    if server == "flask":
+        from werkzeug.serving import run_simple
+
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        run_simple("127.0.0.1", port, app, threaded=True)
+    else:
+        import uvicorn
+
+        from kitchenfire.asgi import application
+
+        uvicorn.run(application, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port: int, process: subprocess.Popen):
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited before it was up")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server didn't come up")
+
+
+async def send(port: int, method: str, path: str, body: dict | None) -> int:
+    """Status of one request on a new connection, or 0 if it failed."""
+    data = json.dumps(body).encode() if body is not None else b""
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n"
+        f"Content-Length: {len(data)}\r\n"
+        + ("Content-Type: application/json\r\n" if body is not None else "")
+        + "\r\n"
+    )
+    try:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(head.encode() + data)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return int(response.split(b" ", 2)[1])
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+async def client(port: int, scenario: Scenario, mix: dict, deadline: float, out: list):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        operation = scenario.rng.choices(names, weights)[0]
+        method, path, body = OPERATIONS[operation](scenario)
+        start = time.perf_counter()
+        status = await send(port, method, path, body)
+        out.append((operation in WRITES, time.perf_counter() - start, status))
+        if status == 503:
+            # What a client honouring Retry-After would do, scaled down
+            await asyncio.sleep(0.05)
+
+
+async def warm_up(port: int, db_url: str):
+    """One of each request first, so the clients don't all land on the
+    server while it loads its indexes."""
+    scenario = Scenario(db_url, -1)
+    scenario.saved = -1_000_000
+    for operation in (*READS, *WRITES):
+        await send(port, *OPERATIONS[operation](scenario))
+
+
+async def drive(port: int, db_url: str, readers: int, writers: int, seconds: float) -> list:
+    await warm_up(port, db_url)
+    scenarios = [Scenario(db_url, seed) for seed in range(readers + writers)]
+    for scenario in scenarios[readers:]:
+        # Saved recipe names can't collide across clients
+        scenario.saved = scenario.rng.randrange(2**40)
+    samples: list = []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(
+            client(port, scenario, READS if i < readers else WRITES, deadline, samples)
+            for i, scenario in enumerate(scenarios)
+        )
+    )
+    return samples
+
+
+def summarize(samples: list, writes: bool, seconds: float) -> dict:
+    results = [(t, status) for is_write, t, status in samples if is_write == writes]
+    served = sorted(t for t, status in results if status and status != 503)
+    cuts = statistics.quantiles(served, n=100, method="inclusive") if len(served) > 1 else [0.0] * 99
+    return {
+        "ok_rps": sum(0 < status < 400 or status == 409 for _, status in results) / seconds,
+        "rejected": sum(status == 503 for _, status in results),
+        "failed": sum(status == 0 or (status >= 400 and status not in (409, 503)) for _, status in results),
+        "p50_ms": cuts[49] * 1000,
+        "p99_ms": cuts[98] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="flask run against the ASGI adapter under load.")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--queue", type=int, default=64, help="ASGI_QUEUE for the adapter")
+    parser.add_argument("--servers", nargs="+", default=["flask", "asgi"])
+    parser.add_argument("--serve", nargs=3, metavar=("SERVER", "DB", "PORT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        server, db_url, port = args.serve
+        return serve(server, db_url, int(port), args.queue)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = build_database(
+            os.path.join(tmp, "template.db"),
+            recipes=args.recipes,
+            ingredients=max(args.recipes // 10, 100),
+            tags=max(args.recipes // 100, 50),
+            skew=1.1,
+            comments=args.recipes * 4,
+        )
+        print(f"{args.readers} readers, {args.writers} writers, {args.seconds:.0f}s each")
+        print(f"{'server':<7} {'clients':<8} {'ok/s':>8} {'503s':>7} {'failed':>7} {'p50 ms':>8} {'p99 ms':>8}")
+        for server in args.servers:
+            db_url = os.path.join(tmp, f"{server}.db")
+            shutil.copy(template, db_url)
+            port = free_port()
+            process = subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.asgi", "--queue", str(args.queue),
+                 "--serve", server, db_url, str(port)],
+                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            )
+            try:
+                wait_for(port, process)
+                samples = asyncio.run(drive(port, db_url, args.readers, args.writers, args.seconds))
+            finally:
+                process.terminate()
+                process.wait()
+            for label, writes in (("readers", False), ("writers", True)):
+                s = summarize(samples, writes, args.seconds)
+                print(f"{server:<7} {label:<8} {s['ok_rps']:>8.1f} {s['rejected']:>7} {s['failed']:>7} "
+                      f"{s['p50_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Rows per second importing the static/ CSV exports, committing row by row
+the way database_populator.py used to against the bulk importer.
+
+    python -m benchmarks.bulk_import
+"""
+import os
+import tempfile
+import time
+
+from kitchenfire.importer import BulkImporter, create_database, read_csv
+
+from .synthetic import write_csvs
+
+SIZES = [1000, 10_000, 50_000]
+# Committing every row is slow enough that only the smallest size is run
+ROW_BY_ROW_SIZE = 1000
+
+
+def lookup(c, table: str, column: str, name: str) -> int:
+    return c.execute(f"SELECT {table[:-1]}Id FROM {table} WHERE {column} = ?", (name,)).fetchone()[0]
+
+
+# What database_populator.py used to do, with parameters instead of
+# f-strings: a lookup per name and a commit per row. It doesn't build the
+# search table, which the bulk timings include.
+def row_by_row(db, static_dir: str) -> int:
+    c = db.cursor()
+    c.execute("INSERT INTO IngredientTypes (TypeName) VALUES ('unknown')")
+    db.commit()
+    for _, (name, photo_url, tags, description, cook_time, difficulty, method) in read_csv(
+        os.path.join(static_dir, "RecipeInfo.csv")
+    ):
+        c.execute(
+            "INSERT INTO Recipes (RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, description, method, int(cook_time), int(difficulty), photo_url),
+        )
+        db.commit()
+        for tag in tags.split():
+            c.execute("INSERT OR IGNORE INTO Tags (TagName) VALUES (?)", (tag,))
+            db.commit()
+            c.execute(
+                "INSERT INTO HasTag VALUES (?, ?)",
+                (lookup(c, "Recipes", "RecipeName", name), lookup(c, "Tags", "TagName", tag)),
+            )
+            db.commit()
+    for _, (recipe, ingredient, amount, unit) in read_csv(
+        os.path.join(static_dir, "IngredientInfo.csv")
+    ):
+        c.execute("INSERT OR IGNORE INTO Ingredients (IngredientName, TypeId) VALUES (?, 1)", (ingredient,))
+        db.commit()
+        c.execute(
+            "INSERT INTO Requires VALUES (?, ?, ?, ?)",
+            (
+                lookup(c, "Recipes", "RecipeName", recipe),
+                lookup(c, "Ingredients", "IngredientName", ingredient),
+                float(amount) if amount else None,
+                unit or None,
+            ),
+        )
+        db.commit()
+    for _, (recipe, likes, rating, reviews) in read_csv(os.path.join(static_dir, "PostInfo.csv")):
+        c.execute(
+            "INSERT INTO Posts (RecipeId, NumberOfLikes, Rating, Reviews) VALUES (?, ?, ?, ?)",
+            (lookup(c, "Recipes", "RecipeName", recipe), int(likes), float(rating), int(reviews)),
+        )
+        db.commit()
+    for _, (recipe, likes) in read_csv(os.path.join(static_dir, "TrendingInfo.csv")):
+        c.execute(
+            "INSERT INTO Trending (RecipeId, NumberOfRecentLikes, ScoredAt) VALUES (?, ?, ?)",
+            (lookup(c, "Recipes", "RecipeName", recipe), float(likes), time.time()),
+        )
+        db.commit()
+    return sum(
+        c.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        for table in ("IngredientTypes", "Tags", "Ingredients", "Recipes", "HasTag", "Requires", "Posts", "Trending")
+    )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'recipes':>8} {'method':>11} {'rows':>8} {'seconds':>8} {'rows/s':>9}")
+        for size in SIZES:
+            static_dir = write_csvs(os.path.join(tmp, f"static{size}"), recipes=size)
+
+            if size <= ROW_BY_ROW_SIZE:
+                db = create_database(os.path.join(tmp, f"old{size}.db"))
+                db.isolation_level = ""
+                start = time.perf_counter()
+                rows = row_by_row(db, static_dir)
+                seconds = time.perf_counter() - start
+                db.close()
+                print(f"{size:>8} {'row by row':>11} {rows:>8} {seconds:>8.2f} {rows / seconds:>9.0f}")
+
+            db = create_database(os.path.join(tmp, f"new{size}.db"))
+            stats = BulkImporter(db, static_dir).run()
+            db.close()
+            print(
+                f"{size:>8} {'bulk':>11} {stats['rows']:>8} "
+                f"{stats['seconds']:>8.2f} {stats['rows_per_second']:>9.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+What the warm recipe catalog costs at startup and in memory, and what it
+saves per page against batched hydration.
+
+    python -m benchmarks.catalog
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from kitchenfire.catalog import RecipeCatalog
+from kitchenfire.hydrate import posts_by_recipe_ids
+
+from .synthetic import build_database
+
+PAGE_SIZES = [1, 10, 20, 100]
+ROUNDS = 200
+
+
+def median_ms(fn, ids: list[int]) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(ids)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=50_000)
+        db = sqlite3.connect(db_url)
+        c = db.cursor()
+
+        catalog = RecipeCatalog(refresh_interval=3600)
+        start = time.perf_counter()
+        catalog.refresh(c)
+        elapsed = time.perf_counter() - start
+
+        # Loaded again under tracemalloc, which would skew the timing above
+        tracemalloc.start()
+        traced = RecipeCatalog()
+        traced.refresh(c)
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del traced
+        print(f"loaded {len(catalog.recipes)} recipes in {elapsed:.2f}s, {size / 2**20:.1f} MiB")
+
+        ids = [r for (r,) in c.execute("SELECT RecipeId FROM Recipes ORDER BY random()")]
+
+        print(f"{'page':>6} {'batched ms':>11} {'catalog ms':>11} {'speedup':>8}")
+        for page in PAGE_SIZES:
+            page_ids = ids[:page]
+            assert [p.to_json() for p in posts_by_recipe_ids(c, page_ids)] == [
+                p.to_json() for p in catalog.posts(c, page_ids)
+            ]
+            old = median_ms(lambda i: posts_by_recipe_ids(c, i), page_ids)
+            new = median_ms(lambda i: catalog.posts(c, i), page_ids)
+            print(f"{page:>6} {old:>11.3f} {new:>11.3f} {old / new:>7.1f}x")
+
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
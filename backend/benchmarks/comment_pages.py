@@ -0,0 +1,110 @@
+"""
+Comment listing on posts with a handful to tens of thousands of comments:
+the whole list with and without the Comments indexes, against first and
+deep pages in each sort order and batched by-id lookups.
+
+    python -m benchmarks.comment_pages
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire import app
+
+from .api import reset_app
+from .synthetic import build_database
+
+COMMENTS_PER_POST = [10, 1000, 10_000, 50_000]
+# Background comments spread over the other posts, so a scan has a table to scan
+OTHER_COMMENTS = 200_000
+PAGE = 20
+REPEATS = 30
+
+
+def add_comments(db_url: str) -> dict[int, int]:
+    """Gives the first posts COMMENTS_PER_POST comments each, returning
+    post id -> comment count."""
+    rng = random.Random(0)
+    db = sqlite3.connect(db_url)
+    posts = {post_id: n for post_id, n in enumerate(COMMENTS_PER_POST, 1)}
+    others = [p for (p,) in db.execute("SELECT RecipeId FROM Posts") if p not in posts]
+    rows = [(p, rng.randint(0, 500)) for p, n in posts.items() for _ in range(n)]
+    rows += [(rng.choice(others), rng.randint(0, 50)) for _ in range(OTHER_COMMENTS)]
+    rng.shuffle(rows)
+    db.executemany(
+        "INSERT INTO Comments (PostId, Author, Body, NumberOfLikes, Rating) "
+        "VALUES (?, 'bench', 'Tried it, would make again', ?, 4)",
+        rows,
+    )
+    db.commit()
+    db.close()
+    return posts
+
+
+def timed(client, path: str) -> tuple[float, int, dict | list]:
+    """Median seconds and response bytes for path."""
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        response = client.get(path)
+        times.append(time.perf_counter() - start)
+    assert response.status_code == 200, path
+    return statistics.median(times), len(response.data), response.get_json()
+
+
+def deep_cursor(client, post_id: int, sort: str, pages: int) -> str:
+    cursor = "-"
+    for _ in range(pages):
+        cursor = client.get(f"/api/v1/post/{post_id}/comment/{sort}/{cursor}/500").get_json()["next"]
+    return cursor
+
+
+def main():
+    app.logger.disabled = True
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "comments.db"), recipes=2000)
+        posts = add_comments(db_url)
+        no_index = os.path.join(tmp, "no_index.db")
+        with sqlite3.connect(db_url) as db:
+            db.execute(f"VACUUM INTO '{no_index}'")
+        with sqlite3.connect(no_index) as db:
+            db.execute("DROP INDEX CommentsByPost")
+            db.execute("DROP INDEX CommentsByLikes")
+
+        results = {}
+        for label, url in (("no index", no_index), ("indexed", db_url)):
+            reset_app(url, cache=False)
+            client = app.test_client()
+            for post_id, n in posts.items():
+                results[label, "all", n] = timed(client, f"/api/v1/post/{post_id}/comment/all")[:2]
+
+        print(f"{'comments':>9} {'route':<28} {'ms':>8} {'KB':>8}")
+        for post_id, n in posts.items():
+            for label in ("no index", "indexed"):
+                seconds, size = results[label, "all", n]
+                print(f"{n:>9} {'all, ' + label:<28} {seconds * 1000:>8.2f} {size / 1024:>8.1f}")
+
+            for sort in ("newest", "liked"):
+                seconds, size, _ = timed(client, f"/api/v1/post/{post_id}/comment/{sort}/-/{PAGE}")
+                print(f"{n:>9} {sort + ', first page':<28} {seconds * 1000:>8.2f} {size / 1024:>8.1f}")
+                # Halfway through the comments, for posts with more than a page
+                cursor = deep_cursor(client, post_id, sort, n // 1000) if n >= 1000 else None
+                if cursor:
+                    seconds, size, _ = timed(client, f"/api/v1/post/{post_id}/comment/{sort}/{cursor}/{PAGE}")
+                    print(f"{n:>9} {sort + ', page at ' + str(n // 2):<28} {seconds * 1000:>8.2f} {size / 1024:>8.1f}")
+
+            page = client.get(f"/api/v1/post/{post_id}/comment/newest/-/500").get_json()["comments"]
+            ids = [c["id"] for c in random.Random(post_id).sample(page, min(50, len(page)))]
+            seconds, size, found = timed(
+                client, f"/api/v1/post/{post_id}/comment/by-id/{','.join(map(str, ids))}"
+            )
+            assert sorted(c["id"] for c in found) == sorted(ids)
+            print(f"{n:>9} {f'by-id, {len(ids)} ids':<28} {seconds * 1000:>8.2f} {size / 1024:>8.1f}")
+        reset_app(app.config["DB_URL"], True)
+
+
+if __name__ == "__main__":
+    main()
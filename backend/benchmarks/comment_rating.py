@@ -0,0 +1,71 @@
+"""
+Cost of adding a rated comment to posts with more and more comments:
+averaging every rating again, the way update_rating_for_post meant to,
+against folding it into the running totals on Posts.
+
+    python -m benchmarks.comment_rating
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from kitchenfire import ratings
+
+from .synthetic import build_database
+
+COMMENTS_PER_POST = [10, 1000, 10_000, 100_000]
+INSERTS = 500
+
+INSERT_COMMENT = "INSERT INTO Comments (PostId, Author, Body, Rating) VALUES (?, 'bench', 'Nice', ?)"
+
+
+def recompute(c: sqlite3.Cursor, post_id: int, rating: int):
+    c.execute(INSERT_COMMENT, (post_id, rating))
+    total, count = c.execute(
+        "SELECT total(Rating), count(Rating) FROM Comments WHERE PostId = ?", (post_id,)
+    ).fetchone()
+    c.execute(
+        "UPDATE Posts SET Rating = ?, Reviews = ?, RatingSum = ? WHERE RecipeId = ?",
+        (total / count, count, total, post_id),
+    )
+
+
+def running_total(c: sqlite3.Cursor, post_id: int, rating: int):
+    ratings.add_review(c, post_id, rating)
+    c.execute(INSERT_COMMENT, (post_id, rating))
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "ratings.db"), recipes=len(COMMENTS_PER_POST))
+        db = sqlite3.connect(db_url)
+        rng = random.Random(0)
+        for post_id, comments in enumerate(COMMENTS_PER_POST, 1):
+            db.executemany(INSERT_COMMENT, ((post_id, rng.randint(1, 5)) for _ in range(comments)))
+        db.commit()
+        with db:
+            ratings.backfill(db.cursor())
+        print(f"{'comments':>9} {'recompute us':>13} {'running total us':>17}")
+        for post_id, comments in enumerate(COMMENTS_PER_POST, 1):
+            timings = []
+            for add in (recompute, running_total):
+                start = time.perf_counter()
+                for _ in range(INSERTS):
+                    with db:
+                        add(db.cursor(), post_id, rng.randint(1, 5))
+                timings.append((time.perf_counter() - start) / INSERTS)
+            print(f"{comments:>9} {timings[0] * 1e6:>13.0f} {timings[1] * 1e6:>17.0f}")
+
+        # Both ways have to agree with the comments at the end
+        for post_id, rating, reviews in db.execute("SELECT RecipeId, Rating, Reviews FROM Posts"):
+            total, count = db.execute(
+                "SELECT total(Rating), count(Rating) FROM Comments WHERE PostId = ?", (post_id,)
+            ).fetchone()
+            assert count == reviews and abs(total / count - rating) < 1e-9
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Per-page latency of the trending feed, old per-recipe hydration against the
+batched one.
+
+    python -m benchmarks.feed_hydration
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire.Ingredient import Ingredient
+from kitchenfire.hydrate import posts_by_recipe_ids
+from kitchenfire.post import Post
+from kitchenfire.recipe import Recipe
+from kitchenfire.tag import Tag
+
+from .synthetic import build_database
+
+PAGE_SIZES = [1, 5, 10, 20, 50, 100]
+ROUNDS = 50
+
+
+def page_ids(db_url: str, count: int) -> list[int]:
+    with sqlite3.connect(db_url) as db:
+        return [
+            r[0]
+            for r in db.execute(
+                "SELECT RecipeId FROM Trending ORDER BY NumberOfRecentLikes DESC LIMIT ?",
+                (count,),
+            )
+        ]
+
+
+# What create_post_by_row used to do: a connection for the post, one for its
+# tags and one for its ingredients.
+def per_recipe(db_url: str, recipe_ids: list[int]) -> list[Post]:
+    posts = []
+    for recipe_id in recipe_ids:
+        with sqlite3.connect(db_url) as db:
+            likes, rating, reviews = db.execute(
+                "SELECT NumberOfLikes, Rating, Reviews FROM Posts WHERE RecipeId = ?",
+                (recipe_id,),
+            ).fetchone()
+            with sqlite3.connect(db_url) as tag_db:
+                tags = tag_db.execute(
+                    """
+                    SELECT TagId, TagName
+                    FROM Tags NATURAL JOIN (
+                        SELECT TagId FROM HasTag WHERE RecipeId = ?
+                    )
+                    """,
+                    (recipe_id,),
+                ).fetchall()
+            with sqlite3.connect(db_url) as ingredient_db:
+                ingredients = ingredient_db.execute(
+                    """
+                    SELECT IngredientId, IngredientName, TypeName, Amount, AmountUnit
+                    FROM Ingredients NATURAL JOIN (
+                        SELECT IngredientId, Amount, AmountUnit
+                        FROM Requires WHERE RecipeId = ?
+                    )
+                    NATURAL JOIN IngredientTypes
+                    """,
+                    (recipe_id,),
+                ).fetchall()
+            recipe_tuple = db.execute(
+                "SELECT RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL FROM Recipes WHERE RecipeId = ?",
+                (recipe_id,),
+            ).fetchone()
+        recipe = Recipe(
+            recipe_id,
+            *recipe_tuple,
+            [Ingredient(*i) for i in ingredients],
+            [Tag(*t) for t in tags],
+        )
+        posts.append(Post(recipe, likes, rating, reviews))
+    return posts
+
+
+def batched(db_url: str, recipe_ids: list[int]) -> list[Post]:
+    with sqlite3.connect(db_url) as db:
+        return posts_by_recipe_ids(db.cursor(), recipe_ids)
+
+
+def median_ms(fn, db_url: str, recipe_ids: list[int]) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(db_url, recipe_ids)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=10_000)
+
+        print(f"{'page':>6} {'per-recipe ms':>14} {'batched ms':>11} {'speedup':>8}")
+        for size in PAGE_SIZES:
+            ids = page_ids(db_url, size)
+            assert [p.to_json() for p in per_recipe(db_url, ids)] == [
+                p.to_json() for p in batched(db_url, ids)
+            ]
+            old = median_ms(per_recipe, db_url, ids)
+            new = median_ms(batched, db_url, ids)
+            print(f"{size:>6} {old:>14.3f} {new:>11.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Writes through the single writer thread with group commit, against each
+request thread taking the write lock for itself. Threads comment, like
+(with the counter buffer off, so every click is a write) and save recipes
+while others read trending pages, at a few thread counts.
+
+Reports write and read throughput and latency, requests that failed with
+"database is locked", how many write transactions found the lock taken,
+and how many mutations the writer committed per transaction.
+
+    python -m benchmarks.group_commit [--threads 1 8 32] [--seconds 5]
+                                      [--synchronous NORMAL]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+
+from kitchenfire import app
+
+from .api import reset_app
+from .load import run_workers, summarize
+from .synthetic import build_database
+
+MIX = {"comment": 4, "like": 4, "save": 1, "trending": 4}
+WRITES = ("comment", "like", "save")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group commit against per-request write transactions.")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--synchronous", default="NORMAL")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = build_database(
+            os.path.join(tmp, "template.db"),
+            recipes=args.recipes,
+            ingredients=max(args.recipes // 10, 100),
+            tags=max(args.recipes // 100, 50),
+            skew=1.1,
+            comments=args.recipes * 4,
+        )
+        print(f"{'threads':>7} {'writes':<13} {'write/s':>8} {'p50 ms':>7} {'p99 ms':>8} "
+              f"{'read/s':>7} {'p99 ms':>7} {'locked':>7} {'busy':>6} {'batch':>6}")
+        for threads in args.threads:
+            for writer in (False, True):
+                db_url = os.path.join(tmp, f"group-{threads}-{writer}.db")
+                shutil.copy(template, db_url)
+                config = {
+                    "WRITER": writer,
+                    "COUNTER_BUFFER": False,
+                    "DB_SYNCHRONOUS": args.synchronous,
+                }
+                samples, waits = run_workers(db_url, config, MIX, threads, args.seconds, 1)
+                batches = app.extensions.get("kitchenfire.writer")
+
+                writes = summarize([s for s in samples if s[0] in WRITES], args.seconds)
+                reads = summarize([s for s in samples if s[0] not in WRITES], args.seconds)
+                written = sum(w["throughput_rps"] for w in writes.values())
+                # Request latency over all the write routes together
+                all_writes = summarize([("write", t, o) for op, t, o in samples if op in WRITES], args.seconds)["write"]
+                locked = sum(w["locked"] for w in writes.values())
+                busy = sum(w["busy"] for w in waits.values())
+                batch = batches.committed / batches.batches if writer and batches.batches else 1.0
+                print(f"{threads:>7} {'writer' if writer else 'per request':<13} {written:>8.1f} "
+                      f"{all_writes['p50_ms']:>7.2f} {all_writes['p99_ms']:>8.2f} "
+                      f"{reads['trending']['throughput_rps']:>7.1f} {reads['trending']['p99_ms']:>7.2f} "
+                      f"{locked:>7} {busy:>6} {batch:>6.1f}")
+        reset_app(app.config["DB_URL"], True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Time an incremental import takes against how much of the CSVs changed,
+next to a full reimport, and checks both end up with the same recipes.
+
+    python -m benchmarks.incremental_import
+"""
+import csv
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from kitchenfire.importer import BulkImporter, IncrementalImporter, create_database
+
+from .synthetic import write_csvs
+
+RECIPES = 50_000
+CHANGES = [0, 10, 100, 1000]
+
+CONTENT_QUERIES = [
+    "SELECT RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL FROM Recipes ORDER BY 1",
+    "SELECT RecipeName, TagName FROM HasTag JOIN Tags USING (TagId) JOIN Recipes USING (RecipeId) ORDER BY 1, 2",
+    """
+    SELECT RecipeName, IngredientName, Amount, AmountUnit
+    FROM Requires JOIN Ingredients USING (IngredientId) JOIN Recipes USING (RecipeId)
+    ORDER BY 1, 2
+    """,
+    "SELECT TagName FROM Tags ORDER BY 1",
+    "SELECT IngredientName FROM Ingredients ORDER BY 1",
+]
+
+
+def edit_csvs(source: str, target: str, changes: int) -> str:
+    """
+    Copies the CSVs in source to target with changes recipes edited (new
+    description and tag), changes removed and changes added.
+    """
+    os.makedirs(target, exist_ok=True)
+    files = {}
+    for name in ("RecipeInfo.csv", "IngredientInfo.csv", "PostInfo.csv", "TrendingInfo.csv"):
+        with open(os.path.join(source, name), newline="") as f:
+            files[name] = list(csv.reader(f))
+
+    recipes = files["RecipeInfo.csv"]
+    header, rows = recipes[0], recipes[1:]
+    removed = {row[0] for row in rows[len(rows) - changes :]} if changes else set()
+    for row in rows[:changes]:
+        row[2] += " edited"
+        row[3] = "Edited: " + row[3]
+    added = [[f"New Recipe {i}", "", "new", "Added later", "10", "2", "Mix."] for i in range(changes)]
+    files["RecipeInfo.csv"] = [header] + [r for r in rows if r[0] not in removed] + added
+
+    for name in ("IngredientInfo.csv", "PostInfo.csv", "TrendingInfo.csv"):
+        files[name] = [r for r in files[name] if r[0] not in removed]
+    files["IngredientInfo.csv"] += [[r[0], "Ingredient 1", "1", "cup"] for r in added]
+    files["PostInfo.csv"] += [[r[0], "0", "0", "0"] for r in added]
+
+    for name, rows in files.items():
+        with open(os.path.join(target, name), "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+    return target
+
+
+def content(db_url: str) -> list:
+    with sqlite3.connect(db_url) as db:
+        return [db.execute(q).fetchall() for q in CONTENT_QUERIES]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        static_dir = write_csvs(os.path.join(tmp, "static"), recipes=RECIPES)
+        base = os.path.join(tmp, "base.db")
+        db = create_database(base)
+        BulkImporter(db, static_dir).run()
+        # A live counter the import has to leave alone
+        db.execute("UPDATE Posts SET NumberOfLikes = NumberOfLikes + 1000 WHERE RecipeId = 1")
+        (likes,) = db.execute("SELECT NumberOfLikes FROM Posts WHERE RecipeId = 1").fetchone()
+        db.close()
+
+        print(f"{RECIPES} recipes")
+        print(f"{'changes':>8} {'incremental s':>14} {'full reimport s':>16}")
+        for changes in CHANGES:
+            edited = edit_csvs(static_dir, os.path.join(tmp, f"edited{changes}"), changes)
+
+            db_url = os.path.join(tmp, f"incremental{changes}.db")
+            shutil.copy(base, db_url)
+            db = create_database(db_url)
+            start = time.perf_counter()
+            IncrementalImporter(db, edited).run()
+            incremental = time.perf_counter() - start
+            assert db.execute(
+                "SELECT NumberOfLikes FROM Posts WHERE RecipeId = 1"
+            ).fetchone() == (likes,)
+            db.close()
+
+            full_url = os.path.join(tmp, f"full{changes}.db")
+            db = create_database(full_url)
+            start = time.perf_counter()
+            BulkImporter(db, edited).run()
+            full = time.perf_counter() - start
+            db.close()
+
+            assert content(db_url) == content(full_url)
+            print(f"{changes:>8} {incremental:>14.3f} {full:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
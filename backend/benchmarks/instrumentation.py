@@ -0,0 +1,81 @@
+"""
+What turning on INSTRUMENT costs per request, on a few read and write
+routes, and a look at what it reports for them.
+
+    python -m benchmarks.instrumentation
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from kitchenfire import app
+
+from .api import ROUTES, Scenario, reset_app, test_client_sender
+from .synthetic import build_database
+
+RECIPES = 10_000
+REQUESTS = 500
+ROUNDS = 5
+BENCHED = {"recipe/by-id (20)", "recipe/trending", "recipe/search", "post/comment/all", "post/like"}
+
+
+def time_route(send, scenario: Scenario, route) -> float:
+    """Seconds per request over REQUESTS requests."""
+    _, method, build = route
+    requests = [build(scenario) for _ in range(REQUESTS)]
+    start = time.perf_counter()
+    for path, body in requests:
+        send(method, path, body)
+    return (time.perf_counter() - start) / REQUESTS
+
+
+def main():
+    app.logger.disabled = True
+    routes = [r for r in ROUTES if r[0] in BENCHED]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(
+            os.path.join(tmp, "instrument.db"),
+            recipes=RECIPES,
+            ingredients=RECIPES // 10,
+            tags=RECIPES // 100,
+            skew=1.1,
+            comments=RECIPES * 4,
+        )
+        timings: dict[bool, dict[str, list]] = {False: {}, True: {}}
+        # Off and on take turns, so drift in the machine hits both alike
+        for _ in range(ROUNDS):
+            for instrument in (False, True):
+                # The pool picks its connection class when it is created
+                reset_app(db_url, cache=False)
+                app.config.update(INSTRUMENT=instrument, INSTRUMENT_LOG=False)
+                send = test_client_sender()
+                scenario = Scenario(db_url)
+                for route in routes:
+                    send(route[1], *route[2](scenario))
+                for route in routes:
+                    timings[instrument].setdefault(route[0], []).append(
+                        time_route(send, scenario, route)
+                    )
+        metrics = app.test_client().get("/api/v1/_debug/metrics").get_json()["routes"]
+
+        print(f"{RECIPES} recipes, {REQUESTS} requests x {ROUNDS} rounds per route")
+        print(f"{'route':<20} {'off us':>8} {'on us':>8} {'overhead':>9} {'sql ms':>7} {'stmts':>6}")
+        urls = app.url_map.bind("localhost")
+        for route in routes:
+            name = route[0]
+            off = statistics.median(timings[False][name])
+            on = statistics.median(timings[True][name])
+            path, _ = route[2](Scenario(db_url))
+            rule, _ = urls.match(path.partition("?")[0], route[1], return_rule=True)
+            stats = metrics[rule.rule]
+            print(
+                f"{name:<20} {off * 1e6:>8.0f} {on * 1e6:>8.0f} {on / off - 1:>8.1%} "
+                f"{stats['sql_ms'] / stats['count']:>7.3f} {stats['statements'] / stats['count']:>6.1f}"
+            )
+        reset_app(app.config["DB_URL"], True)
+        app.config.update(INSTRUMENT=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Like/dislike write throughput with the counter buffer on and off.
+
+    python -m benchmarks.like_throughput
+"""
+import os
+import random
+import tempfile
+import threading
+import time
+
+from kitchenfire import app
+from kitchenfire.counters import get_counters
+
+from .synthetic import build_database
+
+THREADS = 8
+CLICKS_PER_THREAD = 500
+# Most clicks land on one viral post, the rest are spread over the catalog
+HOT_SHARE = 0.8
+
+
+def clicker(seed: int, recipes: int, errors: list):
+    rng = random.Random(seed)
+    client = app.test_client()
+    for _ in range(CLICKS_PER_THREAD):
+        post_id = 1 if rng.random() < HOT_SHARE else rng.randint(1, recipes)
+        action = "like" if rng.random() < 0.9 else "dislike"
+        if client.post(f"/api/v1/post/{action}/{post_id}").status_code != 201:
+            errors.append(post_id)
+
+
+def run(db_url: str, recipes: int, buffered: bool) -> tuple[float, int]:
+    app.config.update(DB_URL=db_url, COUNTER_BUFFER=buffered)
+    app.extensions.pop("kitchenfire.pool", None)
+    app.extensions.pop("kitchenfire.counters", None)
+
+    errors = []
+    threads = [
+        threading.Thread(target=clicker, args=(seed, recipes, errors))
+        for seed in range(THREADS)
+    ]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        get_counters().flush()
+    elapsed = time.perf_counter() - start
+
+    return THREADS * CLICKS_PER_THREAD / elapsed, len(errors)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        recipes = 1000
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=recipes)
+
+        print(f"{THREADS} threads x {CLICKS_PER_THREAD} clicks")
+        for buffered in (False, True):
+            rate, errors = run(db_url, recipes, buffered)
+            label = "buffered" if buffered else "direct"
+            print(f"{label:>9}: {rate:>9.0f} clicks/s, {errors} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Mixed read/write load against the app from many threads or processes at
+once, to see how feed reads, likes, comments and saves get in each other's
+way on one SQLite file.
+
+Reports per endpoint latency, throughput, error rate and how many errors
+were "database is locked", plus the time writers spent waiting for the
+write lock. Every combination of --journal-modes and --pool-sizes is run
+against a fresh copy of the same database.
+
+    python -m benchmarks.load [--workers 8] [--processes] [--seconds 10]
+                              [--mix trending=40,filter=20,like=25,dislike=5,comment=5,save=5]
+                              [--journal-modes WAL DELETE] [--pool-sizes 16]
+                              [--busy-timeout 5] [--no-counter-buffer] [--output load.json]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from kitchenfire import app
+from kitchenfire.counters import get_counters
+from kitchenfire.db import get_pool
+
+from .api import Scenario, reset_app
+from .synthetic import build_database
+
+DEFAULT_MIX = "trending=40,filter=20,like=25,dislike=5,comment=5,save=5"
+
+# Operation -> builds (method, path, json body) from a Scenario
+OPERATIONS = {
+    "trending": lambda s: (
+        "GET", f"/api/v1/recipe/trending/{s.rng.choice([0, 0, 20, 40])}/20", None),
+    "filter": lambda s: (
+        "GET", f"/api/v1/recipe/search?tags={s.tag()}&ingredients={s.ingredient_list(2)}", None),
+    "like": lambda s: ("POST", f"/api/v1/post/like/{s.recipe()}", None),
+    "dislike": lambda s: ("POST", f"/api/v1/post/dislike/{s.recipe()}", None),
+    "comment": lambda s: (
+        "POST",
+        f"/api/v1/post/{s.recipe()}/create_comment",
+        {"author": "load", "body": "Made this tonight", "rating": s.rng.randint(1, 5)},
+    ),
+    "save": lambda s: ("PUT", "/api/v1/recipe/save", s.new_recipe()),
+}
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation {name!r}, pick from {', '.join(OPERATIONS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def is_locked(e: BaseException) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and "locked" in str(e)
+
+
+def worker(seed: int, db_url: str, mix: dict[str, float], deadline: float, out: list):
+    """Sends requests until deadline, appending (operation, seconds, outcome)
+    to out, where outcome is "ok", "error" or "locked"."""
+    scenario = Scenario(db_url, seed)
+    # Seeds start high so saved recipe names can't collide across workers
+    scenario.saved = seed * 1_000_000
+    client = app.test_client()
+    names = list(mix)
+    weights = list(mix.values())
+    rng = random.Random(seed)
+    while time.perf_counter() < deadline:
+        operation = rng.choices(names, weights)[0]
+        method, path, body = OPERATIONS[operation](scenario)
+        start = time.perf_counter()
+        try:
+            status = client.open(path, method=method, json=body).status_code
+            outcome = "ok" if status < 400 or status == 409 else "error"
+        except Exception as e:
+            outcome = "locked" if is_locked(e) else "error"
+        out.append((operation, time.perf_counter() - start, outcome))
+
+
+def run_workers(db_url: str, config: dict, mix: dict, workers: int, seconds: float, first_seed: int):
+    """Runs workers threads in this process. Returns their samples and the
+    pool's lock waits."""
+    reset_app(db_url, cache=True)
+    app.config.update(config)
+    # Let the exceptions through the test client, to tell lock errors apart
+    app.config["PROPAGATE_EXCEPTIONS"] = True
+    app.logger.disabled = True
+
+    # One of each request first, so the workers don't all land on the app
+    # while it loads its indexes and fills the text search table
+    scenario = Scenario(db_url, 0)
+    scenario.saved = -1_000_000
+    client = app.test_client()
+    for operation in mix:
+        method, path, body = OPERATIONS[operation](scenario)
+        client.open(path, method=method, json=body)
+
+    samples: list = []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=worker, args=(first_seed + i, db_url, mix, deadline, samples))
+        for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    with app.app_context():
+        try:
+            get_counters().flush()
+        except sqlite3.Error as e:
+            samples.append(("like", 0.0, "locked" if is_locked(e) else "error"))
+        waits = get_pool().stats()["lock_waits"]
+    return samples, waits
+
+
+def run(db_url: str, config: dict, mix: dict, workers: int, seconds: float, processes: bool):
+    if not processes:
+        return run_workers(db_url, config, mix, workers, seconds, 1)
+
+    # Each process gets its own pool and counter buffer, like separate
+    # server workers would
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [
+            pool.submit(run_workers, db_url, config, mix, 1, seconds, seed)
+            for seed in range(1, workers + 1)
+        ]
+        samples: list = []
+        waits: dict = {}
+        for future in futures:
+            process_samples, process_waits = future.result()
+            samples.extend(process_samples)
+            for label, wait in process_waits.items():
+                total = waits.setdefault(
+                    label, {"writes": 0, "seconds": 0.0, "max_ms": 0.0, "timeouts": 0, "busy": 0}
+                )
+                total["writes"] += wait["writes"]
+                total["seconds"] += wait["seconds"]
+                total["max_ms"] = max(total["max_ms"], wait["max_ms"])
+                total["timeouts"] += wait["timeouts"]
+                total["busy"] += wait["busy"]
+    return samples, waits
+
+
+def summarize(samples: list, seconds: float) -> dict:
+    by_operation: dict[str, list] = {}
+    for operation, elapsed, outcome in samples:
+        by_operation.setdefault(operation, []).append((elapsed, outcome))
+
+    summary = {}
+    for operation, results in sorted(by_operation.items()):
+        times = sorted(t for t, _ in results)
+        errors = sum(outcome != "ok" for _, outcome in results)
+        cuts = statistics.quantiles(times, n=100, method="inclusive") if len(times) > 1 else times * 99
+        summary[operation] = {
+            "requests": len(results),
+            "throughput_rps": len(results) / seconds,
+            "error_rate": errors / len(results),
+            "locked": sum(outcome == "locked" for _, outcome in results),
+            "p50_ms": cuts[49] * 1000,
+            "p95_ms": cuts[94] * 1000,
+            "p99_ms": cuts[98] * 1000,
+        }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent mixed-workload load test.")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--processes", action="store_true", help="one process per worker")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--journal-modes", nargs="+", default=["WAL", "DELETE"])
+    parser.add_argument("--synchronous", default="NORMAL")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[16])
+    parser.add_argument("--busy-timeout", type=float, default=5.0)
+    parser.add_argument("--no-counter-buffer", action="store_true")
+    parser.add_argument("--output", default="load.json")
+    args = parser.parse_args()
+    mix = parse_mix(args.mix)
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        template = build_database(
+            os.path.join(tmp, "template.db"),
+            recipes=args.recipes,
+            ingredients=max(args.recipes // 10, 100),
+            tags=max(args.recipes // 100, 50),
+            skew=1.1,
+            comments=args.recipes * 4,
+        )
+        for journal_mode in args.journal_modes:
+            for pool_size in args.pool_sizes:
+                db_url = os.path.join(tmp, f"load-{journal_mode}-{pool_size}.db")
+                shutil.copy(template, db_url)
+                config = {
+                    "DB_JOURNAL_MODE": journal_mode,
+                    "DB_SYNCHRONOUS": args.synchronous,
+                    "DB_BUSY_TIMEOUT": args.busy_timeout,
+                    "POOL_MAX_IDLE": pool_size,
+                    "COUNTER_BUFFER": not args.no_counter_buffer,
+                }
+                samples, waits = run(
+                    db_url, config, mix, args.workers, args.seconds, args.processes
+                )
+                endpoints = summarize(samples, args.seconds)
+                runs.append({"config": config, "endpoints": endpoints, "lock_waits": waits})
+
+                print(f"\njournal_mode={journal_mode} pool={pool_size} "
+                      f"{'processes' if args.processes else 'threads'}={args.workers}")
+                print(f"{'operation':<10} {'req/s':>8} {'errors':>7} {'locked':>7} "
+                      f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+                for operation, s in endpoints.items():
+                    print(f"{operation:<10} {s['throughput_rps']:>8.1f} {s['error_rate']:>6.1%} "
+                          f"{s['locked']:>7} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f}")
+                print(f"{'writer':<18} {'writes':>7} {'busy':>6} {'waited s':>9} {'max ms':>8} {'timeouts':>9}")
+                for label, w in sorted(waits.items()):
+                    print(f"{label:<18} {w['writes']:>7} {w['busy']:>6} {w['seconds']:>9.3f} "
+                          f"{w['max_ms']:>8.1f} {w['timeouts']:>9}")
+        reset_app(app.config["DB_URL"], True)
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "run": {
+                    "workers": args.workers,
+                    "processes": args.processes,
+                    "seconds": args.seconds,
+                    "mix": mix,
+                    "recipes": args.recipes,
+                },
+                "results": runs,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
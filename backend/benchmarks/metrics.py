@@ -0,0 +1,63 @@
+"""
+Cost of updating the metrics registry from one thread and from many at
+once, and of exporting it with a realistic number of routes.
+
+    python -m benchmarks.metrics
+"""
+import random
+import threading
+import time
+
+from kitchenfire.metrics import Registry
+
+UPDATES = 200_000
+THREADS = [1, 4, 16]
+ROUTES = 40
+
+
+def hammer(registry: Registry, picks: list[tuple[str, float]]):
+    requests = registry["requests_total"]
+    latency = registry["request_duration_seconds"]
+    for route, seconds in picks:
+        requests.labels("GET", route, 200).inc()
+        latency.labels("GET", route).observe(seconds)
+
+
+def main():
+    routes = [f"/api/v1/route{i}/<id>" for i in range(ROUTES)]
+    # An update is what a request costs: a counter increment and an observation
+    print(f"{'threads':>7} {'updates':>9} {'ns/update':>10}")
+    for threads in THREADS:
+        registry = Registry()
+        registry.counter("requests_total", "", ("method", "route", "status"))
+        registry.histogram("request_duration_seconds", "", ("method", "route"))
+        per_thread = UPDATES // threads
+        rng = random.Random(threads)
+        workers = [
+            threading.Thread(
+                target=hammer,
+                args=(registry, [(rng.choice(routes), rng.expovariate(200)) for _ in range(per_thread)]),
+            )
+            for _ in range(threads)
+        ]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+        assert registry.value("requests_total", method="GET", route=routes[0], status="200") > 0
+        total = sum(
+            registry.value("request_duration_seconds_count", method="GET", route=r) or 0 for r in routes
+        )
+        assert total == per_thread * threads
+        print(f"{threads:>7} {total:>9} {elapsed / total * 1e9:>10.0f}")
+
+    start = time.perf_counter()
+    for _ in range(100):
+        text = registry.expose()
+    print(f"export of {ROUTES} routes: {(time.perf_counter() - start) * 10:.2f} ms, {len(text)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Bytes per recipe held by a warm list of hydrated posts, with the old
+dict-backed models against the slotted ones.
+
+    python -m benchmarks.model_memory
+"""
+import gc
+import os
+import sqlite3
+import tempfile
+import tracemalloc
+from dataclasses import dataclass
+from typing import List
+
+from kitchenfire.hydrate import INGREDIENTS_QUERY, POSTS_QUERY, TAGS_QUERY, posts_by_recipe_ids
+
+from .synthetic import build_database
+
+RECIPES = 20_000
+
+
+# The models as they were before they had __slots__
+class OldIngredient:
+    def __init__(self, ingredient_id, name, ingredient_type, amount, amount_unit):
+        self.ingredient_id = ingredient_id
+        self.name = name
+        self.ingredient_type = ingredient_type
+        self.amount = amount
+        self.amount_unit = amount_unit
+
+
+@dataclass
+class OldTag:
+    tag_id: int
+    name: str
+
+
+@dataclass
+class OldRecipe:
+    recipe_id: int
+    name: str
+    description: str
+    instructions: str
+    cook_time: int
+    difficulty: int
+    photo_url: str
+    ingredients: List[OldIngredient]
+    tags: List[OldTag]
+
+
+@dataclass
+class OldPost:
+    recipe: OldRecipe
+    number_of_likes: int
+    rating: float
+    reviews: int
+
+
+def old_posts(c: sqlite3.Cursor, ids: str) -> list[OldPost]:
+    tags: dict[int, list[OldTag]] = {}
+    for recipe_id, *tag in c.execute(TAGS_QUERY, (ids,)):
+        tags.setdefault(recipe_id, []).append(OldTag(*tag))
+    ingredients: dict[int, list[OldIngredient]] = {}
+    for recipe_id, *ingredient in c.execute(INGREDIENTS_QUERY, (ids,)):
+        ingredients.setdefault(recipe_id, []).append(OldIngredient(*ingredient))
+    return [
+        OldPost(
+            OldRecipe(*row[:7], ingredients.get(row[0], []), tags.get(row[0], [])),
+            *row[7:10],
+        )
+        for row in c.execute(POSTS_QUERY, (ids,))
+    ]
+
+
+def measure(build) -> int:
+    gc.collect()
+    tracemalloc.start()
+    posts = build()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del posts
+    return size
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=RECIPES)
+        c = sqlite3.connect(db_url).cursor()
+        ids = list(range(1, RECIPES + 1))
+
+        old = measure(lambda: old_posts(c, str(ids)))
+        new = measure(lambda: posts_by_recipe_ids(c, ids))
+
+    print(f"{RECIPES} recipes, 8 ingredients and 3 tags each")
+    print(f"  dict-backed models: {old / RECIPES:>7.0f} bytes/recipe")
+    print(f"  slotted models:     {new / RECIPES:>7.0f} bytes/recipe")
+
+
+if __name__ == "__main__":
+    main()
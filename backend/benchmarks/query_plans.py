@@ -0,0 +1,137 @@
+"""
+Runs EXPLAIN QUERY PLAN on every statement in the queries registry, against
+a large synthetic database, and fails if any of them scans a whole table
+it wasn't meant to. Whole-table listings (tag/all and the like) are
+allowed to scan the one table they list. tests/test_query_plans.py runs the
+same check on a smaller database as part of make check.
+
+    python -m benchmarks.query_plans [--recipes 50000] [--comments 200000] [--verbose]
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+
+from kitchenfire import comments, queries, text_search
+
+from .synthetic import build_database
+
+SCAN = re.compile(r"^SCAN (\w+)(?! VIRTUAL TABLE)")
+
+# Lookup tables with a handful of rows, which the planner is right to loop
+# over from the outside
+TINY_TABLES = {"IngredientTypes"}
+
+
+# Parameters to plan each registered statement with, and the tables it may
+# scan. Every statement in the registry needs an entry here.
+IDS = json.dumps([1, 2, 3, 50, 400])
+NAMES = json.dumps(["butter", "garlic"])
+PARAMETERS: dict[str, tuple[tuple, set[str]]] = {
+    "tags.all": ((), {"Tags"}),
+    "tags.by_id": ((IDS,), set()),
+    "ingredients.all": ((), {"Ingredients"}),
+    "ingredients.by_id": ((IDS,), set()),
+    "filter.ingredient": ((IDS, IDS), set()),
+    # Everything but the excluded recipes is a listing of Recipes
+    "filter.ingredient_exclude_only": ((IDS,), {"Recipes"}),
+    "filter.tag": ((IDS, IDS), set()),
+    "filter.tag_exclude_only": ((IDS,), {"Recipes"}),
+    "save.insert_tags": ((NAMES,), set()),
+    "save.tag_ids": ((NAMES,), set()),
+    "save.insert_ingredients": ((1, NAMES), set()),
+    "save.ingredient_ids": ((NAMES,), set()),
+    "save.name_taken": (("x",), set()),
+    "save.insert_recipe": (("x", "", "", 0, 1, ""), set()),
+    "save.insert_has_tag": ((1, 1), set()),
+    "save.insert_requires": ((1, 1, 1, "g"), set()),
+    "save.insert_post": ((1,), set()),
+    "save.insert_trending": ((1,), set()),
+    "comments.insert": ((1, "x", "x", 4), set()),
+    "hydrate.posts": ((IDS,), set()),
+    "hydrate.tags": ((IDS,), set()),
+    "hydrate.ingredients": ((IDS,), set()),
+    "catalog.max_id": ((), set()),
+    "catalog.recipes_after": ((49_000, 50_000), set()),
+    "catalog.tags_after": ((49_000, 50_000), set()),
+    "catalog.ingredients_after": ((49_000, 50_000), set()),
+    "catalog.counters": ((IDS,), set()),
+    "comments.all": ((1,), set()),
+    "comments.newest": ((1, comments.MAX_ID, 21), set()),
+    "comments.liked": ((1, 10, comments.MAX_ID, 21), set()),
+    "comments.by_ids": ((1, IDS), set()),
+    "likes.post": ((1, 1), set()),
+    "likes.comment": ((1, 1, 1), set()),
+    "trending.scores": ((IDS,), set()),
+    "trending.save_score": ((1, 0.0, 1), set()),
+    "ratings.add_review": ((4, 1), set()),
+    "ratings.post": ((1,), set()),
+    "search.text": (("butter", 20, 0), set()),
+    "search.unindex": ((1,), set()),
+    "search.index": ((1,), set()),
+}
+
+
+def full_scans(
+    db: sqlite3.Connection, sql: str, parameters: tuple, allowed: set[str]
+) -> tuple[list[str], list[str]]:
+    """The query's plan, and the steps in it that scan a table they shouldn't."""
+    tables = {name for (name,) in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    plan = [row[3] for row in db.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+    bad = []
+    for detail in plan:
+        match = SCAN.match(detail)
+        if match and match.group(1) in tables - TINY_TABLES - allowed:
+            bad.append(detail)
+    return plan, bad
+
+
+def plan_database(path: str, recipes: int, comments: int) -> sqlite3.Connection:
+    """A synthetic database to plan against, with statistics, like an import leaves."""
+    db_url = build_database(
+        path,
+        recipes=recipes,
+        ingredients=max(recipes // 10, 100),
+        tags=max(recipes // 100, 50),
+        skew=1.1,
+        comments=comments,
+    )
+    db = sqlite3.connect(db_url)
+    # Imports end with ANALYZE, so plans are checked with statistics
+    db.execute("ANALYZE")
+    db.execute(text_search.CREATE_TABLE)
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the API's queries don't scan whole tables.")
+    parser.add_argument("--recipes", type=int, default=50_000)
+    parser.add_argument("--comments", type=int, default=200_000)
+    parser.add_argument("--verbose", action="store_true", help="print every plan")
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        db = plan_database(os.path.join(tmp, "plans.db"), args.recipes, args.comments)
+        for name, sql in queries.STATEMENTS.items():
+            if name not in PARAMETERS:
+                failures += 1
+                print(f"{'UNCHECKED':<9} {name}, add it to PARAMETERS")
+                continue
+            parameters, allowed = PARAMETERS[name]
+            plan, bad = full_scans(db, sql, parameters, allowed)
+            failures += bool(bad)
+            print(f"{'FULL SCAN' if bad else 'ok':<9} {name}")
+            for detail in bad if not args.verbose else plan:
+                print(f"{'':<9}   {detail}")
+        db.close()
+
+    if failures:
+        sys.exit(f"{failures} statements scan whole tables or are unchecked")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Ingredient and tag filters from the in-memory index against the SQL they
+replaced. tests/test_recipe_filters.py checks they agree.
+
+    python -m benchmarks.recipe_filters
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire import filter_by_ingredient_sql, filter_by_tag_sql
+from kitchenfire.recipe_index import RecipeIndex
+
+from .synthetic import build_database
+
+QUERIES = 50
+
+
+def median_us(fn, queries) -> float:
+    times = []
+    for args in queries:
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1_000_000
+
+
+def random_queries(rng: random.Random, ids: int) -> list[tuple[list[int], list[int] | None]]:
+    queries = []
+    for _ in range(QUERIES):
+        exclude = rng.sample(range(1, ids + 1), rng.randint(0, 5))
+        include = rng.sample(range(1, ids + 1), rng.randint(1, 5)) if rng.random() < 0.7 else None
+        queries.append((exclude, include))
+    return queries
+
+
+def as_path(ids: list[int] | None) -> str:
+    return ",".join(map(str, ids)) if ids else "-"
+
+
+def main():
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for recipes in (1_000, 10_000, 100_000):
+            db_url = build_database(
+                os.path.join(tmp, f"bench{recipes}.db"),
+                recipes=recipes,
+                ingredients=2_000,
+                tags=200,
+            )
+            c = sqlite3.connect(db_url).cursor()
+            index = RecipeIndex()
+            index.load(c)
+
+            for kind, ids, sql, indexed in (
+                ("ingredient", 2_000, filter_by_ingredient_sql, index.filter_ingredients),
+                ("tag", 200, filter_by_tag_sql, index.filter_tags),
+            ):
+                queries = random_queries(rng, ids)
+                paths = [(c, as_path(e), as_path(i)) for e, i in queries]
+                print(
+                    f"{recipes:>7} recipes, {kind:>10}: "
+                    f"sql {median_us(sql, paths):>10.1f} us, "
+                    f"index {median_us(indexed, queries):>8.1f} us"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Encoding a 50 post feed page: the old nested to_json strings, one pass with
+the stdlib encoder, and one pass with orjson if it is installed.
+
+    python -m benchmarks.serialization
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire import serialize
+from kitchenfire.hydrate import posts_by_recipe_ids
+
+from .synthetic import build_database
+
+PAGE = 50
+ROUNDS = 500
+
+
+def median_us(fn) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1_000_000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=PAGE)
+        with sqlite3.connect(db_url) as db:
+            posts = posts_by_recipe_ids(db.cursor(), range(1, PAGE + 1))
+
+    orjson = serialize.orjson
+
+    def nested():
+        return f"[{','.join(p.to_json() for p in posts)}]".encode()
+
+    def stdlib():
+        serialize.orjson = None
+        try:
+            return serialize.dumps(posts)
+        finally:
+            serialize.orjson = orjson
+
+    print(f"{PAGE} posts, {len(nested())} bytes nested, {len(stdlib())} bytes flat")
+    print(f"  nested to_json strings: {median_us(nested):>8.1f} us")
+    print(f"  stdlib json, one pass:  {median_us(stdlib):>8.1f} us")
+    if orjson is not None:
+        print(f"  orjson, one pass:       {median_us(lambda: serialize.dumps(posts)):>8.1f} us")
+    else:
+        print("  orjson not installed")
+
+
+if __name__ == "__main__":
+    main()
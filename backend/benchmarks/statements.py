@@ -0,0 +1,164 @@
+"""
+What preparing statements again costs. The id lookups and filters as they
+used to be, with the ids formatted into the SQL so every call is new text,
+against the registry statements taking the ids as a json array. The
+registry statements are also run with no statement cache, which is the
+parse and plan cost every formatted call paid. Then the same lookups
+through the app, with its pool's cache sized from the registry and turned
+off.
+
+    python -m benchmarks.statements
+"""
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire import app, queries
+
+from .api import reset_app
+from .synthetic import build_database
+
+RECIPES = 20_000
+CALLS = 2_000
+REQUESTS = 1_000
+
+
+def values(ids: list[int]) -> str:
+    return ",".join(f"({i})" for i in ids)
+
+
+# The SQL the lookups and filters used to format for each call
+def formatted_tags(ids: list[int]) -> str:
+    return f"""
+        WITH GetIds(TagId) AS (VALUES {values(ids)})
+        SELECT TagId, TagName FROM Tags WHERE TagId IN GetIds
+        """
+
+
+def formatted_ingredients(ids: list[int]) -> str:
+    return f"""
+        WITH GetIds(IngredientId) AS (VALUES {values(ids)})
+        SELECT IngredientId, IngredientName FROM Ingredients WHERE IngredientId IN GetIds
+        """
+
+
+def formatted_tag_filter(exclude: list[int], include: list[int]) -> str:
+    return f"""
+        WITH
+            ExcludeIds(TagId) AS (VALUES {values(exclude)}),
+            IncludeIds(TagId) AS (VALUES {values(include)})
+        SELECT RecipeId, RecipeName
+        FROM Recipes NATURAL JOIN HasTag WHERE TagId IN IncludeIds
+            EXCEPT
+        SELECT RecipeId, RecipeName
+        FROM Recipes NATURAL JOIN HasTag
+        WHERE TagId IN ExcludeIds;
+        """
+
+
+def sample(rng: random.Random, ids: int) -> list[int]:
+    return rng.sample(range(1, ids + 1), rng.randint(1, 10))
+
+
+def calls(rng: random.Random, tags: int, ingredients: int) -> list[tuple[str, list, list]]:
+    """(lookup, ids, more ids) for random lookups of each kind, one kind
+    after another. The filters run long enough that fewer of them do."""
+    return [
+        (kind, sample(rng, n), sample(rng, tags))
+        for kind, n, count in (
+            ("tags", tags, CALLS),
+            ("ingredients", ingredients, CALLS),
+            ("tag filter", tags, CALLS // 10),
+        )
+        for _ in range(count)
+    ]
+
+
+def run_formatted(db: sqlite3.Connection, kind: str, ids: list[int], more: list[int]):
+    if kind == "tags":
+        return db.execute(formatted_tags(ids)).fetchall()
+    if kind == "ingredients":
+        return db.execute(formatted_ingredients(ids)).fetchall()
+    return db.execute(formatted_tag_filter(ids, more)).fetchall()
+
+
+def run_registry(db: sqlite3.Connection, kind: str, ids: list[int], more: list[int]):
+    if kind == "tags":
+        return db.execute(queries.TAGS_BY_ID_QUERY, (queries.id_list(ids),)).fetchall()
+    if kind == "ingredients":
+        return db.execute(queries.INGREDIENTS_BY_ID_QUERY, (queries.id_list(ids),)).fetchall()
+    return db.execute(
+        queries.FILTER_BY_TAG_QUERY, (queries.id_list(ids), queries.id_list(more))
+    ).fetchall()
+
+
+def time_calls(db: sqlite3.Connection, run, workload) -> dict[str, float]:
+    """Median microseconds per call of each kind."""
+    times: dict[str, list[float]] = {}
+    for kind, ids, more in workload:
+        start = time.perf_counter()
+        run(db, kind, ids, more)
+        times.setdefault(kind, []).append(time.perf_counter() - start)
+    return {kind: statistics.median(t) * 1_000_000 for kind, t in times.items()}
+
+
+def time_requests(client, paths: list[str]) -> float:
+    start = time.perf_counter()
+    for path in paths:
+        assert client.get(path).status_code == 200, path
+    return (time.perf_counter() - start) / len(paths) * 1_000_000
+
+
+def main():
+    app.logger.disabled = True
+    rng = random.Random(0)
+    tags, ingredients = RECIPES // 100, RECIPES // 10
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(
+            os.path.join(tmp, "statements.db"), recipes=RECIPES, ingredients=ingredients, tags=tags
+        )
+        workload = calls(rng, tags, ingredients)
+
+        cached = sqlite3.connect(db_url, cached_statements=queries.cache_size())
+        uncached = sqlite3.connect(db_url, cached_statements=0)
+        for kind, ids, more in workload[:30]:
+            assert sorted(run_formatted(cached, kind, ids, more)) == sorted(
+                run_registry(cached, kind, ids, more)
+            ), (kind, ids, more)
+
+        results = {
+            "formatted": time_calls(cached, run_formatted, workload),
+            "registry, no cache": time_calls(uncached, run_registry, workload),
+            "registry": time_calls(cached, run_registry, workload),
+        }
+        cached.close()
+        uncached.close()
+
+        print(f"{'':<20} " + " ".join(f"{kind + ' us':>16}" for kind in results["registry"]))
+        for label, times in results.items():
+            print(f"{label:<20} " + " ".join(f"{us:>16.1f}" for us in times.values()))
+
+        paths = [
+            f"/api/v1/{kind}/by-id/{','.join(map(str, sample(rng, n)))}"
+            for _ in range(REQUESTS)
+            for kind, n in (("tag", tags), ("ingredient", ingredients))
+        ]
+        print()
+        for label, size in (("no cache", 0), (f"{queries.cache_size()} statements", None)):
+            reset_app(db_url, cache=False)
+            if size is None:
+                app.config.pop("DB_CACHED_STATEMENTS", None)
+            else:
+                app.config["DB_CACHED_STATEMENTS"] = size
+            client = app.test_client()
+            time_requests(client, paths[:50])
+            print(f"by-id routes, {label:<16} {time_requests(client, paths):>8.1f} us/request")
+        app.config.pop("DB_CACHED_STATEMENTS", None)
+        reset_app(app.config["DB_URL"], True)
+
+
+if __name__ == "__main__":
+    main()
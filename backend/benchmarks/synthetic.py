@@ -0,0 +1,268 @@
+"""
+Deterministic synthetic data for the benchmarks. Also writes a database
+for trying the app at scale:
+
+    python -m benchmarks.synthetic data/big.db --recipes 50000 --skew 1.1
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import time
+from itertools import accumulate
+
+from kitchenfire import migrate
+
+UNITS = ["g", "kg", "ml", "cup", "tbsp", "tsp", "oz", "pinch", None]
+
+WORDS = (
+    "butter chicken garlic honey crispy spicy sweet sour creamy smoky fried "
+    "baked roasted grilled noodle rice salad soup curry taco shaved ice "
+    "watermelon cucumber tiramisu egg pork beef tofu mushroom ginger chili "
+    "lemon lime basil coconut sesame soy sauce glaze marinate simmer whisk "
+    "chop slice dice fold stir season serve quick easy viral weeknight"
+).split()
+
+
+# Made up filler words, so the real ones above are only in a slice of recipes
+FILLER = [a + b + c for a in "bdfgklmnprstvz" for b in "aeiou" for c in ("", "n", "ra", "lo", "mi")]
+VOCABULARY = WORDS + FILLER
+WEIGHTS = [1] * len(WORDS) + [2] * len(FILLER)
+CUM_WEIGHTS = list(accumulate(WEIGHTS))
+
+
+def words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=CUM_WEIGHTS, k=count))
+
+
+def zipf_weights(n: int, skew: float) -> list[float]:
+    """Cumulative weights for ranks 1..n following Zipf's law with exponent
+    skew. A skew of 0 is uniform."""
+    return list(accumulate(1 / rank**skew for rank in range(1, n + 1)))
+
+
+def zipf_sample(rng: random.Random, population: list, weights: list[float], k: int) -> list:
+    """k distinct items drawn with Zipf weights, popular ones first in line."""
+    k = min(k, len(population))
+    chosen: dict = {}
+    while len(chosen) < k:
+        for item in rng.choices(population, cum_weights=weights, k=k - len(chosen)):
+            chosen[item] = None
+    return list(chosen)
+
+
+def build_database(
+    path: str,
+    recipes: int = 1000,
+    ingredients: int = 500,
+    tags: int = 100,
+    ingredients_per_recipe: int = 8,
+    tags_per_recipe: int = 3,
+    seed: int = 0,
+    skew: float = 0.0,
+    comments: int = 0,
+) -> str:
+    """
+    Writes a deterministic database of the given size to path, replacing
+    anything already there. Returns path.
+
+    With skew above 0, tag and ingredient use, likes and comments follow
+    Zipf's law with that exponent: a few recipes get most of the attention
+    like on the real feed. comments are spread over the posts the same way,
+    and then set each post's rating and reviews.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+
+    db = sqlite3.connect(path)
+    migrate.create(db)
+    c = db.cursor()
+
+    c.execute("INSERT INTO IngredientTypes (TypeName) VALUES ('unknown')")
+    c.executemany(
+        "INSERT INTO Tags (TagName) VALUES (?)",
+        ((f"tag{i}",) for i in range(1, tags + 1)),
+    )
+    c.executemany(
+        "INSERT INTO Ingredients (IngredientName, TypeId) VALUES (?, 1)",
+        ((f"Ingredient {i}",) for i in range(1, ingredients + 1)),
+    )
+    c.executemany(
+        """
+        INSERT INTO Recipes (RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (
+                f"{words(rng, 3).title()} {i}",
+                words(rng, 12),
+                words(rng, 40),
+                rng.randint(5, 120),
+                rng.randint(1, 5),
+                f"/image/recipe{i}.jpg",
+            )
+            for i in range(1, recipes + 1)
+        ),
+    )
+
+    tag_ids = list(range(1, tags + 1))
+    ingredient_ids = list(range(1, ingredients + 1))
+    tag_weights = zipf_weights(tags, skew)
+    ingredient_weights = zipf_weights(ingredients, skew)
+    # How popular each recipe is, 1 being the most liked
+    popularity = list(range(1, recipes + 1))
+    if skew:
+        rng.shuffle(popularity)
+
+    has_tag = []
+    requires = []
+    posts = []
+    trending = []
+    now = time.time()
+    for recipe_id in range(1, recipes + 1):
+        if skew:
+            recipe_tags = zipf_sample(rng, tag_ids, tag_weights, tags_per_recipe)
+            recipe_ingredients = zipf_sample(
+                rng, ingredient_ids, ingredient_weights, ingredients_per_recipe
+            )
+        else:
+            recipe_tags = rng.sample(tag_ids, min(tags_per_recipe, tags))
+            recipe_ingredients = rng.sample(
+                ingredient_ids, min(ingredients_per_recipe, ingredients)
+            )
+        for tag_id in recipe_tags:
+            has_tag.append((recipe_id, tag_id))
+        for ingredient_id in recipe_ingredients:
+            unit = rng.choice(UNITS)
+            amount = round(rng.uniform(0.25, 500), 2) if unit else None
+            requires.append((recipe_id, ingredient_id, amount, unit))
+        if skew:
+            rank = popularity[recipe_id - 1]
+            likes = int(50_000 / rank**skew)
+            recent = float(int(1000 / rank**skew * rng.uniform(0.5, 1.5)))
+        else:
+            likes = rng.randint(0, 5000)
+        rating, reviews = round(rng.uniform(0, 5), 1), rng.randint(0, 500)
+        posts.append([recipe_id, likes, rating, reviews, rating * reviews])
+        if not skew:
+            recent = float(rng.randint(0, 100))
+        trending.append((recipe_id, recent, now))
+
+    comment_rows = []
+    if comments:
+        by_popularity = sorted(range(1, recipes + 1), key=lambda r: popularity[r - 1])
+        post_weights = zipf_weights(recipes, skew)
+        authors = zipf_weights(1000, skew)
+        ratings: dict[int, list[int]] = {}
+        for post_id in rng.choices(by_popularity, cum_weights=post_weights, k=comments):
+            rating = rng.randint(1, 5)
+            ratings.setdefault(post_id, []).append(rating)
+            author = rng.choices(range(1, 1001), cum_weights=authors)[0]
+            comment_likes = int(200 / rng.randint(1, 200) ** skew) if skew else rng.randint(0, 50)
+            comment_rows.append((post_id, f"user{author}", words(rng, 15), comment_likes, rating))
+        for post in posts:
+            post_ratings = ratings.get(post[0], [])
+            post[2] = sum(post_ratings) / len(post_ratings) if post_ratings else 0.0
+            post[3] = len(post_ratings)
+            post[4] = float(sum(post_ratings))
+
+    c.executemany("INSERT INTO HasTag VALUES (?, ?)", has_tag)
+    c.executemany("INSERT INTO Requires VALUES (?, ?, ?, ?)", requires)
+    c.executemany(
+        "INSERT INTO Posts (RecipeId, NumberOfLikes, Rating, Reviews, RatingSum) VALUES (?, ?, ?, ?, ?)",
+        posts,
+    )
+    c.executemany("INSERT INTO Trending (RecipeId, NumberOfRecentLikes, ScoredAt) VALUES (?, ?, ?)", trending)
+    c.executemany(
+        "INSERT INTO Comments (PostId, Author, Body, NumberOfLikes, Rating) VALUES (?, ?, ?, ?, ?)",
+        comment_rows,
+    )
+    db.commit()
+    db.close()
+    return path
+
+
+def write_csvs(
+    directory: str,
+    recipes: int = 1000,
+    ingredients: int = 500,
+    tags: int = 100,
+    ingredients_per_recipe: int = 8,
+    tags_per_recipe: int = 3,
+    seed: int = 0,
+) -> str:
+    """
+    Writes the four CSV exports the importer reads from static/, for a
+    deterministic data set of the given size. Returns directory.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+
+    def writer(name: str, header: list[str]):
+        f = open(os.path.join(directory, name), "w", newline="")
+        w = csv.writer(f)
+        w.writerow(header)
+        return f, w
+
+    files = [
+        writer("RecipeInfo.csv", ["Name", "PhotoURL", "Tags", "Description", "Cook Time", "Difficulty", "Method"]),
+        writer("IngredientInfo.csv", ["Recipe", "Ingredient", "Amount", "Unit"]),
+        writer("PostInfo.csv", ["Recipe Name", "Number of Likes", "Rating", "Reviews"]),
+        writer("TrendingInfo.csv", ["Recipe Name", "Number of recent likes"]),
+    ]
+    (_, recipe_csv), (_, ingredient_csv), (_, post_csv), (_, trending_csv) = files
+
+    for i in range(1, recipes + 1):
+        name = f"{words(rng, 3).title()} {i}"
+        recipe_tags = rng.sample(range(1, tags + 1), min(tags_per_recipe, tags))
+        recipe_csv.writerow(
+            [
+                name,
+                f"/image/recipe{i}.jpg",
+                " ".join(f"tag{t}" for t in recipe_tags),
+                # Quotes of both kinds, which the old populator choked on
+                f"\"{words(rng, 2)}\" it's {words(rng, 10)}",
+                rng.randint(5, 120),
+                rng.randint(1, 5),
+                words(rng, 40),
+            ]
+        )
+        for ingredient in rng.sample(
+            range(1, ingredients + 1), min(ingredients_per_recipe, ingredients)
+        ):
+            unit = rng.choice(UNITS)
+            amount = round(rng.uniform(0.25, 500), 2) if unit else ""
+            ingredient_csv.writerow([name, f"Ingredient {ingredient}", amount, unit or ""])
+        post_csv.writerow([name, rng.randint(0, 5000), round(rng.uniform(0, 5), 1), rng.randint(0, 500)])
+        trending_csv.writerow([name, rng.randint(0, 100)])
+
+    for f, _ in files:
+        f.close()
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes a synthetic fire.db.")
+    parser.add_argument("path")
+    parser.add_argument("--recipes", type=int, default=10_000)
+    parser.add_argument("--ingredients", type=int, default=1000)
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--comments", type=int, default=50_000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    build_database(
+        args.path,
+        recipes=args.recipes,
+        ingredients=args.ingredients,
+        tags=args.tags,
+        seed=args.seed,
+        skew=args.skew,
+        comments=args.comments,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+FTS5 recipe search against a LIKE scan over the same columns, on a 100k
+recipe catalog.
+
+    python -m benchmarks.text_search
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire import text_search
+
+from .synthetic import build_database
+
+RECIPES = 100_000
+COUNT = 20
+QUERIES = ["butter chicken", "spicy", "garl", "coconut curry soup", "vir noo"]
+
+LIKE_COLUMNS = ["RecipeName", "Description", "Instructions"]
+
+
+# A LIKE scan can't rank, so it is timed both stopping at the first COUNT
+# matches and finding every match (which any ranking would need)
+def like_search(c: sqlite3.Cursor, text: str, limit: int = -1) -> list[int]:
+    words = text.split()
+    where = " AND ".join(
+        "(" + " OR ".join(f"{column} LIKE ?" for column in LIKE_COLUMNS) + ")"
+        for _ in words
+    )
+    args = [f"%{word}%" for word in words for _ in LIKE_COLUMNS]
+    return [
+        r
+        for (r,) in c.execute(
+            f"SELECT RecipeId FROM Recipes WHERE {where} LIMIT ?", (*args, limit)
+        )
+    ]
+
+
+def median_ms(fn, *args) -> float:
+    times = []
+    for _ in range(10):
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=RECIPES)
+        db = sqlite3.connect(db_url)
+        c = db.cursor()
+
+        start = time.perf_counter()
+        text_search.rebuild(c)
+        db.commit()
+        print(f"index build: {(time.perf_counter() - start) * 1000:.0f} ms for {RECIPES} recipes")
+
+        print(
+            f"{'query':>20} {'matches':>8} {'like first':>11} {'like all':>9} {'fts5 ranked':>12}  (ms)"
+        )
+        for query in QUERIES:
+            matches = len(like_search(c, query))
+            first = median_ms(like_search, c, query, COUNT)
+            every = median_ms(like_search, c, query)
+            fts = median_ms(text_search.search, c, query, 0, COUNT)
+            print(f"{query:>20} {matches:>8} {first:>11.2f} {every:>9.2f} {fts:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
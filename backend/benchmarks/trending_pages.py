@@ -0,0 +1,86 @@
+"""
+Latency of fetching one deep trending page (page 1000 of 20) by offset and
+by cursor, both from SQLite and from the in-memory ranking.
+
+    python -m benchmarks.trending_pages
+"""
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from kitchenfire.trending import TrendingEngine
+
+from .synthetic import build_database
+
+PAGE = 1000
+COUNT = 20
+ROUNDS = 200
+
+
+def median_us(fn) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1_000_000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_url = build_database(os.path.join(tmp, "bench.db"), recipes=100_000)
+        db = sqlite3.connect(db_url)
+        offset = PAGE * COUNT
+
+        def sql_offset():
+            return db.execute(
+                """
+                SELECT RecipeId FROM Trending
+                ORDER BY NumberOfRecentLikes DESC
+                LIMIT ? OFFSET ?
+                """,
+                (COUNT, offset),
+            ).fetchall()
+
+        # The row before the page, as a cursor would have remembered it
+        score, last_id = db.execute(
+            """
+            SELECT NumberOfRecentLikes, RecipeId FROM Trending
+            ORDER BY NumberOfRecentLikes DESC, RecipeId DESC
+            LIMIT 1 OFFSET ?
+            """,
+            (offset - 1,),
+        ).fetchone()
+
+        def sql_cursor():
+            return db.execute(
+                """
+                SELECT RecipeId FROM Trending
+                WHERE (NumberOfRecentLikes, RecipeId) < (?, ?)
+                ORDER BY NumberOfRecentLikes DESC, RecipeId DESC
+                LIMIT ?
+                """,
+                (score, last_id, COUNT),
+            ).fetchall()
+
+        engine = TrendingEngine()
+        engine.load(db.execute("SELECT RecipeId, NumberOfRecentLikes, ScoredAt FROM Trending"))
+        recipe_ids, cursor = engine.page_after(None, offset)
+
+        print(f"page {PAGE} of {COUNT}, 100k recipes")
+        print(f"  sqlite offset:           {median_us(sql_offset):>9.1f} us")
+        print(f"  sqlite cursor, no index: {median_us(sql_cursor):>9.1f} us")
+        db.execute(
+            "CREATE INDEX TrendingByScore ON Trending (NumberOfRecentLikes, RecipeId)"
+        )
+        print(f"  sqlite offset, index:    {median_us(sql_offset):>9.1f} us")
+        print(f"  sqlite cursor, index:    {median_us(sql_cursor):>9.1f} us")
+        print(f"  memory offset:           {median_us(lambda: engine.page(offset, COUNT)):>9.1f} us")
+        print(f"  memory cursor:           {median_us(lambda: engine.page_after(cursor, COUNT)):>9.1f} us")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 from dataclasses import dataclass
+from sys import intern
 from typing import Optional
 import json
 
 
+@dataclass(slots=True, frozen=True)
 class Ingredient:
     ingredient_id: int
     name: str
@@ -10,26 +12,31 @@ class Ingredient:
     amount: Optional[float]
     amount_unit: Optional[str]
 
-    def to_json(self):
-        return json.dumps(
-            {
-                "id": self.ingredient_id,
-                "ingredient": self.name,
-                "amount": self.amount,
-                "unit": self.amount_unit,
-            }
+    @classmethod
+    def from_row(
+        cls, row: tuple[int, str, str, Optional[float], Optional[str]]
+    ) -> "Ingredient":
+        """
+        From an (IngredientId, IngredientName, TypeName, Amount, AmountUnit)
+        row. Names, types and units repeat across thousands of recipes, so
+        they are interned and every copy shares one string.
+        """
+        ingredient_id, name, ingredient_type, amount, amount_unit = row
+        return cls(
+            ingredient_id,
+            intern(name),
+            intern(ingredient_type),
+            amount,
+            intern(amount_unit) if amount_unit is not None else None,
         )
 
-    def __init__(
-        self,
-        ingredient_id: int,
-        name: str,
-        ingredient_type: str,
-        amount: Optional[float],
-        amount_unit: Optional[str],
-    ):
-        self.ingredient_id = ingredient_id
-        self.name = name
-        self.ingredient_type = ingredient_type
-        self.amount = amount
-        self.amount_unit = amount_unit
+    def to_dict(self) -> dict:
+        return {
+            "id": self.ingredient_id,
+            "ingredient": self.name,
+            "amount": self.amount,
+            "unit": self.amount_unit,
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
@@ -1,40 +1,40 @@
 from flask import Flask, Response, request
-import sqlite3
+import heapq
 import json
 
-from .tag import Tag
-
-from .Ingredient import Ingredient
 from .post import Post
-from .recipe import Recipe
-
+from .hydrate import posts_by_recipe_ids
+from .db import get_db, get_pool, init_app as init_db
+from .counters import get_counters
+from .trending import decode_cursor, encode_cursor, get_trending
+from .recipe_index import get_recipe_index
+from .pantry import get_pantry
+from .catalog import get_catalog
+from . import comments, queries, ratings, text_search
+from .serialize import json_response
+from .cache import cached, get_cache, tag_response
+from .instrument import get_route_timings, init_app as init_instrument
+from .metrics import init_app as init_metrics
+from .writer import init_app as init_writer, mutate
 
-app = Flask(__name__)
 
 DB_URL = "data/fire.db"
 
+# Trending pages also change when recipes that aren't on them get liked, so
+# they are only trusted for a few seconds
+TRENDING_CACHE_TTL = 5
 
+app = Flask(__name__)
+app.config.from_mapping(DB_URL=DB_URL, RECIPE_INDEX=True, CATALOG=True, LEGACY_JSON=False)
+init_db(app)
+init_instrument(app)
+init_metrics(app)
+init_writer(app)
 
 
-def tags_by_recipe_id(recipe_id: int) -> list[Tag]:
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        tags = c.execute(
-            """
-            SELECT TagId, TagName
-            FROM Tags NATURAL JOIN (
-                SELECT TagId
-                FROM HasTag
-                WHERE RecipeId = ?
-            ) AS AssociatedTags;
-            """,
-            (recipe_id,),
-        ).fetchall()
-    return [Tag(*t) for t in tags]
 
 
 def create_post_to_database(json_post) -> int:
-    print(json_post)
     # const formattedRecipe = {
     #   id: newId,
     #   name: recipeData.name,
@@ -56,387 +56,414 @@ def create_post_to_database(json_post) -> int:
     #   dislikes: 0, // Random dislikes between 1-11
     #   comments: 0, // Random comments between 10-40
     # }
-    tags: list[str] = json_post["tags"]
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(
-            """
-            CREATE TEMPORARY TABLE NewPostTags(TagName);
-        """
-        )
-
-        c.executemany(
-            """
-            INSERT OR IGNORE INTO NewPostTags (TagName)
-            VALUES (?)
-        """,
-            ((t,) for t in tags),
-        )
-        db.commit()
-
-        # insert tags
-        c.execute(
-            """
-            INSERT OR IGNORE INTO Tags (TagName)
-            SELECT * FROM NewPostTags
-        """
-        )
-        db.commit()
-
-        tag_ids = c.execute(
-            """
-            SELECT TagId FROM Tags
-            NATURAL JOIN NewPostTags
-        """
-        ).fetchall()
-        tag_ids = [t[0] for t in tag_ids]
+    text_search.ensure_table()
+
+    # One transaction throughout, so a save can't be left half done
+    saved = mutate(lambda c: save_recipe_rows(c, json_post))
+    if saved is None:
+        return -1
+    recipe_id, tag_ids, ing_to_id = saved
+
+    get_trending().track(recipe_id)
+    get_recipe_index().add(
+        recipe_id,
+        json_post["name"],
+        int(json_post.get("cooktime", 0)),
+        int(json_post.get("difficulty", 3)),
+        ing_to_id.values(),
+        tag_ids,
+    )
+    get_pantry().add(recipe_id, ing_to_id.values())
+    if app.config["CATALOG"]:
+        with get_db() as db:
+            get_catalog().refresh(db.cursor())
 
-        c.execute(
-            """
-            DROP TABLE NewPostTags;
-        """
-        )
+    return recipe_id
 
-        # Ingredients
 
-        c.execute(
-            """
-            CREATE TEMPORARY TABLE NewPostIngredients(IngredientName, TypeId);
-        """
-        )
+def save_recipe_rows(c, json_post) -> tuple[int, list[int], dict[str, int]] | None:
+    """
+    Writes a new recipe's rows, returning its id, tag ids and ingredient name
+    -> id, or None if the name is taken.
+    """
+    tags: list[str] = json_post["tags"]
+    tag_names = json.dumps(tags)
+    c.execute(queries.INSERT_TAGS_QUERY, (tag_names,))
+    tag_ids = [t for (t,) in c.execute(queries.TAG_IDS_QUERY, (tag_names,))]
+
+    names = json.dumps([i["ingredient"] for i in json_post["ingredients"]])
+    c.execute(queries.INSERT_INGREDIENTS_QUERY, (1, names))
+    ing_to_id = dict(c.execute(queries.INGREDIENT_IDS_QUERY, (names,)).fetchall())
+
+    # -- create recipe
+    exists = not not c.execute(queries.NAME_TAKEN_QUERY, (json_post["name"],)).fetchone()[0]
+    if exists:
+        return None
+
+    c.execute(
+        queries.INSERT_RECIPE_QUERY,
+        (
+            json_post["name"],
+            json_post.get("description", "No Description"),
+            json_post["instructions"],
+            json_post.get("cooktime", 0),
+            json_post.get("difficulty", 3),
+            json_post.get("image", "/recipe_not_found.png"),
+        ),
+    )
+    recipe_id = c.lastrowid
 
-        c.executemany(
-            """
-            INSERT OR IGNORE INTO NewPostIngredients (IngredientName, TypeId)
-            VALUES (?, ?)
-        """,
-            ((i["ingredient"], 1) for i in json_post["ingredients"]),
-        )
-        db.commit()
+    # -- has tags
 
-        # insert ings
-        c.execute(
-            """
-            INSERT OR IGNORE INTO Ingredients (IngredientName, TypeId)
-            SELECT * FROM NewPostIngredients
-        """
-        )
-        db.commit()
+    c.executemany(queries.INSERT_HAS_TAG_QUERY, ((recipe_id, t) for t in tag_ids))
 
-        ing_ids = c.execute(
-            """
-            SELECT IngredientName, IngredientId FROM Ingredients
-            NATURAL JOIN NewPostIngredients;
-        """
-        ).fetchall()
-        ing_to_id = {name: id_ for name, id_ in ing_ids}
+    ings = {}
+    for iiiii in json_post['ingredients']:
+        ings[iiiii['ingredient']] = iiiii
 
-        c.execute(
-            """
-            DROP TABLE NewPostIngredients;
-        """
-        )
+    # ingredient amount unit
 
-        # -- create recipe
-        exists = not not c.execute(
-            "SELECT COUNT(*) FROM Recipes WHERE RecipeName = ?", (json_post["name"],)
-        ).fetchone()[0]
-        if exists:
-            return -1
+    c.executemany(
+            queries.INSERT_REQUIRES_QUERY,
+            ((recipe_id, iiiid, ings[iiiiname]['amount'], ings[iiiiname]['unit'] ) for iiiiname,iiiid in ing_to_id.items()))
 
-        c.execute(
-            """
-INSERT INTO Recipes (RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL)
-VALUES (?, ?, ?, ?, ?, ?);
-                  """,
-            (
-                json_post["name"],
-                json_post.get("description", "No Description"),
-                json_post["instructions"],
-                json_post.get("cooktime", 0),
-                json_post.get("difficulty", 3),
-                json_post.get("image", "/recipe_not_found.png"),
-            ),
-        )
+    #----
+    c.execute(queries.INSERT_POST_QUERY, (recipe_id,))
+    c.execute(queries.INSERT_TRENDING_QUERY, (recipe_id,))
+    text_search.index_recipe(c, recipe_id)
 
-        db.commit()
-
-        recipe_id = c.execute("""
-                  SELECT RecipeId FROM Recipes
-                  WHERE RecipeName = ?
-                  """, (json_post['name'],)).fetchone()[0]
-        recipe_id = int(recipe_id)
-
-        # -- has tags
-
-        c.executemany(
-                """
-                INSERT INTO HasTag
-                VALUES (?, ?)
-                """,
-                ((recipe_id, t) for t in tag_ids))
-        db.commit()
-
-        ings = {}
-        for iiiii in json_post['ingredients']:
-            ings[iiiii['ingredient']] = iiiii
-
-        # ingredient amount unit
-
-        c.executemany(
-                """
-                INSERT INTO Requires
-                VALUES (?, ?, ?, ?)
-                """,
-                ((recipe_id, iiiid, ings[iiiiname]['amount'], ings[iiiiname]['unit'] ) for iiiiname,iiiid in ing_to_id.items()))
-        db.commit()
-
-        #----
-        c.execute("""
-                  INSERT INTO Posts (RecipeId, NumberOfLikes, Rating, Reviews)
-                  VALUES (?, ?, ?, ?)
-                  """, (recipe_id, 0, 0, 0))
-        db.commit()
-
-    return recipe_id
+    return recipe_id, tag_ids, ing_to_id
 
 
-def ingredients_by_recipe_id(recipe_id: int) -> list[Ingredient]:
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        ingredients = c.execute(
-            """
-            SELECT IngredientId, IngredientName, TypeName, Amount, AmountUnit
-            FROM Ingredients NATURAL JOIN (
-                SELECT IngredientId, Amount, AmountUnit
-                FROM Requires
-                WHERE RecipeId = ?
-            )
-            NATURAL JOIN IngredientTypes
-            AS RequiredIngredients;
-            """,
-            (recipe_id,),
-        ).fetchall()
-        print(ingredients)
-
-    # TODO: Ask ryan about ingredient types in the database......
-    return [Ingredient(*t) for t in ingredients]  # wip
+def load_posts(c, recipe_ids) -> list[Post]:
+    """
+    posts_by_recipe_ids, with likes that haven't been flushed yet added in.
+    Recipe bodies come from the in-memory catalog when CATALOG is set.
+    Tags the response with the recipes so the cache can drop it when they change.
+    """
+    counters = get_counters()
+    with counters.reading():
+        if app.config["CATALOG"]:
+            posts = get_catalog().posts(c, recipe_ids)
+        else:
+            posts = posts_by_recipe_ids(c, recipe_ids)
+        for post in {p.recipe.recipe_id: p for p in posts}.values():
+            pending = counters.pending_likes(post.recipe.recipe_id)
+            post.number_of_likes = max(post.number_of_likes + pending, 0)
+    tag_response(*(f"recipe:{p.recipe.recipe_id}" for p in posts))
+    return posts
 
 
 def create_post_by_row(post_id: int) -> Post:
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(
-            "SELECT NumberOfLikes, Rating, Reviews FROM Posts WHERE RecipeId = ?",
-            (post_id,),
-        )
-        (likes, rating, reviews) = c.fetchone()
-        tags = tags_by_recipe_id(post_id)
-        ingredients = ingredients_by_recipe_id(post_id)
-        recipe_tuple: tuple[str, str, str, int, int, str] = c.execute(
-            "SELECT RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL FROM Recipes WHERE RecipeId = ?",
-            (post_id,),
-        ).fetchone()
-
-        recipe = Recipe(post_id, *recipe_tuple, ingredients, tags)
-        return Post(recipe, likes, rating, reviews)
+    with get_db() as db:
+        return load_posts(db.cursor(), [post_id])[0]
 
 
 @app.get("/api/v1/recipe/by-id/<recipe_id>")
+@cached()
 def get_recipe_by_id(recipe_id):
-    posts = []
-    for id_ in map(lambda x: int(x), recipe_id.replace(" ", ",").split(",")):
-        posts.append(create_post_by_row(id_).to_json())
-    return Response(
-        f"[{','.join(posts)}]",
-        content_type="application/json",
-    )
+    ids = [int(x) for x in recipe_id.replace(" ", ",").split(",")]
+    with get_db() as db:
+        posts = load_posts(db.cursor(), ids)
+    # Ids that aren't saved yet too, so saving one drops the cached miss
+    tag_response(*(f"recipe:{i}" for i in ids))
+    return json_response(posts)
 
 
 @app.get("/api/v1/recipe/trending/<offset>/<count>")
 @app.get("/api/v1/recipe/trending/<offset>")
+@cached(ttl=TRENDING_CACHE_TTL)
 def get_trending_recipe_by_offset(offset, count=1):
     if offset == "-":
         offset = 0
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        recipe_ids = c.execute(
-            """
-            SELECT RecipeId
-            FROM Trending
-            ORDER BY NumberOfRecentLikes DESC
-            LIMIT ? OFFSET ?
-            """,
-            (int(count), int(offset)),
-        ).fetchall()
+    recipe_ids = get_trending().page(int(offset), int(count))
+    with get_db() as db:
+        posts = load_posts(db.cursor(), recipe_ids)
+
+    return json_response(posts)
+
+
+@app.get("/api/v1/recipe/trending/cursor/<cursor>/<count>")
+@cached(ttl=TRENDING_CACHE_TTL)
+def get_trending_recipe_by_cursor(cursor, count):
+    try:
+        after = decode_cursor(cursor) if cursor != "-" else None
+    except ValueError:
+        return Response(status=400)
+
+    recipe_ids, next_cursor = get_trending().page_after(after, int(count))
+    with get_db() as db:
+        posts = load_posts(db.cursor(), recipe_ids)
+
+    return json_response(
+        {
+            "posts": posts,
+            "next": encode_cursor(next_cursor) if next_cursor else None,
+        }
+    )
+
+
+def parse_ids(ids: str) -> list[int]:
+    return [int(i) for i in ids.replace(" ", ",").split(",")]
 
-    json = [create_post_by_row(int(*recipe_id)).to_json() for recipe_id in recipe_ids]
 
-    return Response(f"[{','.join(json)}]", content_type="application/json")
+def filter_by_ingredient_sql(c, without: str, with_="-") -> list[tuple[int, str]]:
+    exclude_ids = queries.id_list(parse_ids(without) if without != "-" else [])
+    if with_ == "-":
+        return c.execute(queries.FILTER_ALL_BY_INGREDIENT_QUERY, (exclude_ids,)).fetchall()
+    include_ids = queries.id_list(parse_ids(with_))
+    return c.execute(queries.FILTER_BY_INGREDIENT_QUERY, (exclude_ids, include_ids)).fetchall()
 
 
-# Takes smth like 123,1234,345
-# returns (123),(1234),(345)
-def transform_ids(ids: str) -> str:
-    return ",".join(map(lambda i: f"({int(i)})", ids.replace(" ", ",").split(",")))
+def filter_by_tag_sql(c, without: str, with_="-") -> list[tuple[int, str]]:
+    exclude_ids = queries.id_list(parse_ids(without) if without != "-" else [])
+    if with_ == "-":
+        return c.execute(queries.FILTER_ALL_BY_TAG_QUERY, (exclude_ids,)).fetchall()
+    include_ids = queries.id_list(parse_ids(with_))
+    return c.execute(queries.FILTER_BY_TAG_QUERY, (exclude_ids, include_ids)).fetchall()
 
 
 @app.get("/api/v1/recipe/filter/ingredient/<without>")
 @app.get("/api/v1/recipe/filter/ingredient/<without>/<with_>")
+@cached("recipes")
 def get_recipe_filtered_by_ingredient(without: str, with_="-"):
-    # Safety: ids are cast to int, so no sql injection
-    exclude_ids = transform_ids(without) if without != "-" else "(null)"
-    include_ids = transform_ids(with_) if with_ != "-" else "(null)"
-
-    query = f"""
-        WITH
-            ExcludeIds(IngredientId) AS (VALUES {exclude_ids}),
-            IncludeIds(IngredientId) AS (VALUES {include_ids})
-        SELECT RecipeId, RecipeName
-        FROM Recipes {"NATURAL JOIN Requires WHERE IngredientId IN IncludeIds" if with_ != "-" else ""}
-            EXCEPT
-        SELECT RecipeId, RecipeName
-        FROM Recipes NATURAL JOIN Requires
-        WHERE IngredientId IN ExcludeIds;
-        """
-
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        result = c.execute(query).fetchall()
+    if app.config["RECIPE_INDEX"]:
+        result = get_recipe_index().filter_ingredients(
+            parse_ids(without) if without != "-" else [],
+            parse_ids(with_) if with_ != "-" else None,
+        )
+    else:
+        with get_db() as db:
+            result = filter_by_ingredient_sql(db.cursor(), without, with_)
 
-    return Response(
-        json.dumps([{"id": t[0], "name": t[1]} for t in result]),
-        content_type="application/json",
-    )
+    return json_response([{"id": t[0], "name": t[1]} for t in result])
 
 
 @app.get("/api/v1/recipe/filter/tag/<without>")
 @app.get("/api/v1/recipe/filter/tag/<without>/<with_>")
+@cached("recipes")
 def get_recipe_filtered_by_tag(without, with_="-"):
-    # Safety: ids are cast to int, so no sql injection
-    exclude_ids = transform_ids(without) if without != "-" else "(null)"
-    include_ids = transform_ids(with_) if with_ != "-" else "(null)"
-
-    query = f"""
-        WITH
-            ExcludeIds(TagId) AS (VALUES {exclude_ids}),
-            IncludeIds(TagId) AS (VALUES {include_ids})
-        SELECT RecipeId, RecipeName
-        FROM Recipes {"NATURAL JOIN HasTag WHERE TagId IN IncludeIds" if with_ != "-" else ""}
-            EXCEPT
-        SELECT RecipeId, RecipeName
-        FROM Recipes NATURAL JOIN HasTag
-        WHERE TagId IN ExcludeIds;
-        """
-
-    with sqlite3.connect(DB_URL) as db:
+    if app.config["RECIPE_INDEX"]:
+        result = get_recipe_index().filter_tags(
+            parse_ids(without) if without != "-" else [],
+            parse_ids(with_) if with_ != "-" else None,
+        )
+    else:
+        with get_db() as db:
+            result = filter_by_tag_sql(db.cursor(), without, with_)
+
+    return json_response([{"id": t[0], "name": t[1]} for t in result])
+
+
+# Takes ?ingredients=1,2&exclude_ingredients=3&tags=4&exclude_tags=5
+#       &max_cook_time=30&min_difficulty=1&max_difficulty=3&mode=all|any
+#       &offset=0&count=20
+# Ranked by how many of the included ingredients and tags each recipe has,
+# then by trending score
+@app.get("/api/v1/recipe/search")
+def search_recipes():
+    args = request.args
+    try:
+        ids = {
+            name: parse_ids(args[name]) if args.get(name) else []
+            for name in ("ingredients", "exclude_ingredients", "tags", "exclude_tags")
+        }
+        max_cook_time = args.get("max_cook_time", type=int)
+        min_difficulty = int(args.get("min_difficulty", 1))
+        max_difficulty = int(args.get("max_difficulty", 5))
+        offset = int(args.get("offset", 0))
+        count = int(args.get("count", 20))
+    except ValueError:
+        return Response(status=400)
+    mode = args.get("mode", "all")
+    if mode not in ("all", "any") or offset < 0 or count < 0:
+        return Response(status=400)
+
+    matches = get_recipe_index().search(
+        include_ingredients=ids["ingredients"],
+        exclude_ingredients=ids["exclude_ingredients"],
+        include_tags=ids["tags"],
+        exclude_tags=ids["exclude_tags"],
+        max_cook_time=max_cook_time,
+        min_difficulty=min_difficulty,
+        max_difficulty=max_difficulty,
+        match_all=mode == "all",
+    )
+
+    trending = get_trending()
+    ranked = heapq.nsmallest(
+        offset + count,
+        matches.items(),
+        key=lambda m: (-m[1], -trending.score(m[0]), m[0]),
+    )[offset:]
+
+    with get_db() as db:
+        posts = load_posts(db.cursor(), (recipe_id for recipe_id, _ in ranked))
+
+    return json_response({"total": len(matches), "posts": posts})
+
+
+# Takes the ingredient ids in the pantry, and optionally ?count=20&max_missing=2
+# Returns [{"missing": [ingredient ids], "post": {...}}], fewest missing first
+@app.get("/api/v1/recipe/pantry/<ingredient_ids>")
+def get_recipe_by_pantry(ingredient_ids):
+    try:
+        pantry = parse_ids(ingredient_ids) if ingredient_ids != "-" else []
+        count = int(request.args.get("count", 20))
+        max_missing = request.args.get("max_missing", type=int)
+    except ValueError:
+        return Response(status=400)
+
+    matches = get_pantry().match(pantry, count, max_missing)
+    with get_db() as db:
+        posts = {
+            p.recipe.recipe_id: p
+            for p in load_posts(db.cursor(), (r for r, _ in matches))
+        }
+
+    return json_response(
+        [{"missing": missing, "post": posts[r]} for r, missing in matches if r in posts]
+    )
+
+
+# Takes ?q=butter chick&offset=0&count=20
+# Returns [{"snippet": "...", "post": {...}}], best match first. Words match
+# as prefixes. The snippet is HTML: the recipe text is escaped and the
+# matches are wrapped in <mark></mark>
+@app.get("/api/v1/recipe/search/text")
+def search_recipes_by_text():
+    try:
+        offset = int(request.args.get("offset", 0))
+        count = int(request.args.get("count", 20))
+    except ValueError:
+        return Response(status=400)
+
+    text_search.ensure_table()
+    with get_db() as db:
         c = db.cursor()
-        result = c.execute(query).fetchall()
+        matches = text_search.search(c, request.args.get("q", ""), offset, count)
+        posts = {
+            p.recipe.recipe_id: p
+            for p in load_posts(c, (r for r, _ in matches))
+        }
+
+    return json_response(
+        [{"snippet": snippet, "post": posts[r]} for r, snippet in matches if r in posts]
+    )
+
+
+@app.get("/api/v1/_debug/pool")
+def get_pool_stats():
+    return json_response(get_pool().stats())
+
+
+@app.get("/api/v1/_debug/cache")
+def get_cache_stats():
+    return json_response(get_cache().stats())
+
 
-    return Response(
-        json.dumps([{"id": t[0], "name": t[1]} for t in result]),
-        content_type="application/json",
+@app.get("/api/v1/_debug/metrics")
+def get_metrics():
+    return json_response(
+        {"instrument": app.config.get("INSTRUMENT", False), "routes": get_route_timings().snapshot()}
     )
 
 
 @app.get("/api/v1/tag/all")
+@cached("tags")
 def get_all_tags():
     tags = []
-    with sqlite3.connect(DB_URL) as db:
+    with get_db() as db:
         c = db.cursor()
-        c.execute("SELECT TagId, TagName FROM Tags")
+        c.execute(queries.ALL_TAGS_QUERY)
         for tag_id, tag_name in c.fetchall():
             tags.append({"name": tag_name, "id": tag_id})
 
-    return Response(json.dumps(tags), content_type="application/json")
+    return json_response(tags)
 
 
 @app.get("/api/v1/tag/by-id/<tag_id>")
+@cached("tags")
 def get_tag_by_id(tag_id):
-    ids = transform_ids(tag_id)
-    with sqlite3.connect(DB_URL) as db:
+    ids = queries.id_list(parse_ids(tag_id))
+    with get_db() as db:
         c = db.cursor()
-        c.execute(
-            f"""
-                  WITH GetIds(TagId)
-                  AS (VALUES {ids})
-                  SELECT TagId, TagName
-                  FROM Tags
-                  WHERE TagId IN GetIds
-                  """
-        )
+        c.execute(queries.TAGS_BY_ID_QUERY, (ids,))
 
         tag = [{"name": tag_name, "id": tag_id} for (tag_id, tag_name) in c.fetchall()]
-    return Response(json.dumps(tag), content_type="application/json")
+    return json_response(tag)
 
 
 @app.get("/api/v1/ingredient/all")
+@cached("ingredients")
 def get_all_ingredients():
     ingredients = []
-    with sqlite3.connect(DB_URL) as db:
+    with get_db() as db:
         c = db.cursor()
-        c.execute("SELECT IngredientId, IngredientName FROM Ingredients")
+        c.execute(queries.ALL_INGREDIENTS_QUERY)
         for ingredient_id, ingredient_name in c.fetchall():
             ingredients.append({"name": ingredient_name, "id": ingredient_id})
 
-    return Response(json.dumps(ingredients), content_type="application/json")
+    return json_response(ingredients)
 
 
 @app.get("/api/v1/ingredient/by-id/<ingredient_id>")
+@cached("ingredients")
 def get_ingredient_by_id(ingredient_id):
-    ids = transform_ids(ingredient_id)
-    with sqlite3.connect(DB_URL) as db:
+    ids = queries.id_list(parse_ids(ingredient_id))
+    with get_db() as db:
         c = db.cursor()
-        c.execute(
-            f"""
-                  WITH GetIds(IngredientId)
-                  AS (VALUES {ids})
-                  SELECT IngredientId, IngredientName
-                  FROM Ingredients
-                  WHERE IngredientId IN GetIds
-                  """
-        )
+        c.execute(queries.INGREDIENTS_BY_ID_QUERY, (ids,))
 
         ingredients = [
             {"name": ingredient_name, "id": ingredient_id}
             for (ingredient_id, ingredient_name) in c.fetchall()
         ]
 
-    return Response(json.dumps(ingredients), content_type="application/json")
+    return json_response(ingredients)
 
 
 @app.get("/api/v1/post/<post_id>/comment/all")
 def get_all_comments(post_id):
-    comments = []
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  SELECT Author, Body, NumberOfLikes, Rating
-                  FROM Comments
-                  WHERE PostId = {post_id};
-                  """)
-        for author, body, number_of_likes, rating in c.fetchall():
-            comments.append({"author": author, "body": body, "likes": number_of_likes, "rating": rating})
-
-    return Response(json.dumps(comments), content_type="application/json")
+    counters = get_counters()
+    with counters.reading(), get_db() as db:
+        rows = comments.all_comments(db.cursor(), int(post_id))
+        found = comments.to_dicts(rows, int(post_id), counters)
+    return json_response(found)
+
+
+# Takes newest or liked, a cursor from the last page's "next" (or - for the
+# first page) and a page size
+# Returns {"comments": [...], "next": cursor or null}
+@app.get("/api/v1/post/<post_id>/comment/<any(newest, liked):sort>/<cursor>/<count>")
+def get_comments_page(post_id, sort, cursor, count):
+    try:
+        after = comments.decode_cursor(cursor) if cursor != "-" else None
+        count = int(count)
+    except ValueError:
+        return Response(status=400)
+    if count < 1:
+        return Response(status=400)
+
+    counters = get_counters()
+    with counters.reading(), get_db() as db:
+        rows, next_cursor = comments.page(db.cursor(), int(post_id), sort, after, count)
+        found = comments.to_dicts(rows, int(post_id), counters)
+    return json_response(
+        {
+            "comments": found,
+            "next": comments.encode_cursor(next_cursor) if next_cursor else None,
+        }
+    )
 
 
 @app.get("/api/v1/post/<post_id>/comment/by-id/<comment_id>")
 def get_comment_by_id(post_id, comment_id):
-    ids = transform_ids(comment_id)
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  WITH GetIds(CommentId)
-                  AS (VALUES {ids})
-                  SELECT Author, Body, NumberOfLikes, Rating
-                  FROM Comments
-                  WHERE CommentId IN GetIds
-                  AND PostId = {post_id};
-                  """)
-
-        comment = [{"author": author, "body": body, "likes": number_of_likes, "rating": rating} for (author, body, number_of_likes, rating) in c.fetchall()]
-    return Response(json.dumps(comment), content_type="application/json")
+    counters = get_counters()
+    with counters.reading(), get_db() as db:
+        rows = comments.by_ids(db.cursor(), int(post_id), parse_ids(comment_id))
+        found = comments.to_dicts(rows, int(post_id), counters)
+    return json_response(found)
 
 
 @app.put("/api/v1/recipe/save")
@@ -445,7 +472,8 @@ def save_recipe():
     post_id = create_post_to_database(request.json)
 
     if post_id > 0:
-        return Response(json.dumps({"id": post_id}), status=201)
+        get_cache().invalidate("recipes", "tags", "ingredients", f"recipe:{post_id}")
+        return json_response({"id": post_id}, status=201)
     else:
         return Response(status=409)
 
@@ -453,97 +481,53 @@ def save_recipe():
 @app.post("/api/v1/post/<post_id>/create_comment")
 def create_comment(post_id):
     comment = request.json
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  INSERT INTO Comments (PostId, Author, Body, Rating)
-                  VALUES ({post_id, comment['author'], comment['body'], comment['rating']});
-                  """)
-        db.commit()
-    update_rating_for_post(post_id)
-    return Response(status=201)
-
+    rating = comment.get("rating")
+    # JSON true/false come through as bools, which are ints too
+    valid = isinstance(rating, int) and not isinstance(rating, bool) and 0 <= rating <= 5
+    if rating is not None and not valid:
+        return Response(status=400)
+
+    def add(c):
+        post = ratings.add_review(c, int(post_id), rating)
+        if post is None:
+            return None
+        c.execute(
+            queries.INSERT_COMMENT_QUERY,
+            (int(post_id), comment.get("author") or "Anonymous", comment["body"], rating),
+        )
+        return c.lastrowid, post
 
-def update_rating_for_post(post_id):
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        ratings = c.execute(f"""
-                            SELECT Rating
-                            FROM Comments
-                            WHERE PostId = {post_id};
-                            """).fetchall()
-        overall_rating = sum(ratings) / len(ratings)
-        c.execute(f"""
-                  INSERT INTO Posts (Rating)
-                  VALUES ({overall_rating})
-                  WHERE PostId = {post_id};
-                  """)
-        db.commit()
+    added = mutate(add)
+    if added is None:
+        return Response(status=404)
+    comment_id, post = added
+    get_cache().invalidate(f"recipe:{int(post_id)}")
+    return json_response({"id": comment_id, "rating": post[0], "reviews": post[1]}, status=201)
 
 
 @app.post("/api/v1/post/like/<post_id>")
 def like_post(post_id):
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  UPDATE Posts
-                  SET NumberOfLikes = NumberOfLikes + 1
-                  WHERE RecipeId = {post_id};
-                  """)
-
-        c.execute(f"""
-                  UPDATE Trending
-                  SET NumberOfRecentLikes = NumberOfRecentLikes + 1
-                  WHERE RecipeId = {post_id};
-                  """)
-
-        db.commit()
+    get_counters().add_post(int(post_id), 1, 1)
+    get_trending().add(int(post_id), 1)
+    get_cache().invalidate(f"recipe:{int(post_id)}")
     return Response(status=201)
 
 
 @app.post("/api/v1/post/dislike/<post_id>")
 def dislike_post(post_id):
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  UPDATE Posts
-                  SET NumberOfLikes = NumberOfLikes - 1
-                  WHERE RecipeId = {post_id} AND NumberOfLikes > 0;
-                  """)
-
-        c.execute(f"""
-                  UPDATE Trending
-                  SET NumberOfRecentLikes = NumberOfRecentLikes - 0.2
-                  WHERE RecipeId = {post_id} AND NumberOfRecentLikes > 0;
-                  """)
-
-        db.commit()
+    get_counters().add_post(int(post_id), -1, -0.2)
+    get_trending().add(int(post_id), -0.2)
+    get_cache().invalidate(f"recipe:{int(post_id)}")
     return Response(status=201)
 
 
 @app.post("/api/v1/post/<post_id>/<comment_id>/like")
 def like_comment(post_id, comment_id):
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  UPDATE Comments
-                  SET NumberOfLikes = NumberOfLikes + 1
-                  WHERE CommentId = {comment_id} AND PostId = {post_id};
-                  """)
-        db.commit()
+    get_counters().add_comment(int(post_id), int(comment_id), 1)
     return Response(status=201)
 
 
 @app.post("/api/v1/post/<post_id>/<comment_id>/dislike")
 def dislike_comment(post_id, comment_id):
-    with sqlite3.connect(DB_URL) as db:
-        c = db.cursor()
-        c.execute(f"""
-                  UPDATE Comments
-                  SET NumberOfLikes = NumberOfLikes - 1
-                  WHERE CommentId = {comment_id}
-                  AND PostId = {post_id}
-                  AND NumberOfLikes > 0;
-                  """)
-        db.commit()
+    get_counters().add_comment(int(post_id), int(comment_id), -1)
     return Response(status=201)
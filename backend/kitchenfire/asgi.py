@@ -0,0 +1,252 @@
+"""
+The API as an ASGI app, for serving with uvicorn instead of flask run:
+
+    uvicorn kitchenfire.asgi:application --port 5123
+
+Requests still go through the Flask app and its views, but on one of two
+thread pools, so the event loop is never blocked by SQLite. Reads (GET,
+HEAD and OPTIONS) run on the reader pool and everything else on the writer
+pool, so a slow save only holds up other writes while feed requests carry
+on. Writer threads mostly wait for the writer thread to commit their
+mutations, and the more of them are waiting the more share a commit.
+
+Each pool takes a bounded number of requests, counting those waiting for a
+thread; past that it answers 503 with a Retry-After straight away instead
+of letting the queue and everyone's latency grow. Request bodies are
+capped too, and responses are sent as the app generates them rather than
+held in memory whole.
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask
+
+from . import app
+from .metrics import get_metrics
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Disconnected(Exception):
+    """The client went away before sending the whole request body."""
+
+
+class Lane:
+    """A thread pool and a limit on how many requests it holds at once."""
+
+    def __init__(self, name: str, threads: int, queue: int):
+        self.name = name
+        self.limit = threads + queue
+        self.pending = 0
+        self.rejected = 0
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix=f"kitchenfire-{name}")
+
+    def full(self) -> bool:
+        return self.pending >= self.limit
+
+
+class AsgiAdapter:
+    """
+    Serves a Flask app over ASGI, running each request on a reader or
+    writer Lane.
+
+    The pool sizes come from ASGI_READERS, ASGI_WRITERS and ASGI_QUEUE in
+    the app's config, and the largest request body it reads (in bytes,
+    anything longer gets a 413) from ASGI_MAX_BODY. Only the event loop's
+    thread touches the counts, so they need no lock.
+    """
+
+    def __init__(self, app: Flask):
+        self.app = app
+        config = app.config
+        self.max_body = config.get("ASGI_MAX_BODY", 2**20)
+        queue = config.get("ASGI_QUEUE", 64)
+        self.readers = Lane("reader", config.get("ASGI_READERS", 16), queue)
+        self.writers = Lane("writer", config.get("ASGI_WRITERS", 8), queue)
+        with app.app_context():
+            registry = get_metrics()
+        registry.collected(
+            "kitchenfire_asgi_pending",
+            "Requests running or waiting for a thread, by pool.",
+            "gauge",
+            lambda: {(lane.name,): lane.pending for lane in (self.readers, self.writers)},
+            ("pool",),
+        )
+        registry.collected(
+            "kitchenfire_asgi_rejected_total",
+            "Requests turned away with a 503 because their pool was full, by pool.",
+            "counter",
+            lambda: {(lane.name,): lane.rejected for lane in (self.readers, self.writers)},
+            ("pool",),
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self.http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for lane in (self.readers, self.writers):
+                    lane.executor.shutdown(wait=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def http(self, scope, receive, send):
+        lane = self.readers if scope["method"] in READ_METHODS else self.writers
+        if lane.full():
+            lane.rejected += 1
+            await send_response(send, 503, [(b"retry-after", b"1")], b"")
+            return
+
+        lane.pending += 1
+        try:
+            try:
+                body = await read_body(scope, receive, self.max_body)
+            except Disconnected:
+                # Nobody to answer, and the request is cut short, so don't run it
+                return
+            if body is None:
+                # The rest of the body is left unread, so the connection can't be reused
+                await send_response(send, 413, [(b"connection", b"close")], b"")
+                return
+            loop = asyncio.get_running_loop()
+            last = await loop.run_in_executor(
+                lane.executor, self.call_wsgi, environ(scope, body), send, loop
+            )
+            await send_all(send, last)
+        finally:
+            lane.pending -= 1
+
+    def call_wsgi(self, environ: dict, send, loop: asyncio.AbstractEventLoop) -> list[dict]:
+        """
+        Runs the Flask app on environ, on this thread, as streamed responses
+        read from the database while they go. Each chunk is held back until
+        the next one turns up; every chunk but the last is sent through the
+        event loop from here, waiting for the send so a slow client holds up
+        the response rather than letting it pile up in memory. Returns the
+        messages that finish the response, for the loop to send once this
+        thread is free again, which for most responses is all of them.
+        """
+        started = []
+
+        def start_response(status: str, headers, exc_info=None):
+            if exc_info is not None and started and started[2]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            started[:] = [status, headers, False]
+            return lambda data: emit(data, True)
+
+        def emit(body: bytes, more_body: bool) -> list[dict]:
+            messages = []
+            status, headers, sent = started
+            if not sent:
+                started[2] = True
+                messages.append(
+                    {
+                        "type": "http.response.start",
+                        "status": int(status.split(" ", 1)[0]),
+                        "headers": [
+                            (name.lower().encode("latin-1"), value.encode("latin-1"))
+                            for name, value in headers
+                        ],
+                    }
+                )
+            messages.append({"type": "http.response.body", "body": body, "more_body": more_body})
+            if more_body:
+                asyncio.run_coroutine_threadsafe(send_all(send, messages), loop).result()
+            return messages
+
+        result = self.app.wsgi_app(environ, start_response)
+        try:
+            held = None
+            for chunk in result:
+                if not chunk:
+                    continue
+                if held is not None:
+                    emit(held, True)
+                held = chunk
+            return emit(held or b"", False)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+
+
+async def read_body(scope: dict, receive, limit: int) -> bytes | None:
+    """
+    The request body, or None if it is longer than limit bytes. Raises
+    Disconnected if the client goes away before it has all come in.
+    """
+    for name, value in scope.get("headers", []):
+        if name == b"content-length" and value.isdigit() and int(value) > limit:
+            return None
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise Disconnected
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > limit:
+            return None
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def send_all(send, messages: list[dict]):
+    for message in messages:
+        await send(message)
+
+
+async def send_response(send, status: int, headers: list[tuple[bytes, bytes]], body: bytes):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+def environ(scope: dict, body: bytes) -> dict:
+    """The WSGI environ for an ASGI http scope and its request body."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    env = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            env[name] = value
+            continue
+        key = f"HTTP_{name}"
+        env[key] = f"{env[key]},{value}" if key in env else value
+    # The body is read in full, so its length is known even when it came in
+    # chunked without a Content-Length, and wsgi.input ends where it does
+    env["CONTENT_LENGTH"] = str(len(body))
+    env["wsgi.input_terminated"] = True
+    return env
+
+
+application = AsgiAdapter(app)
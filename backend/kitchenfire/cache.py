@@ -0,0 +1,184 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from flask import Response, current_app, g, request
+
+
+@dataclass
+class Entry:
+    body: bytes
+    content_type: str
+    etag: str
+    expires: float
+    tags: set[str] = field(default_factory=set)
+
+    def response(self) -> Response:
+        response = Response(self.body, content_type=self.content_type)
+        response.set_etag(self.etag)
+        # Let browsers and Caddy keep a copy, but check it with If-None-Match
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+
+class ResponseCache:
+    """
+    Finished responses, keyed by endpoint and normalized arguments, with LRU
+    eviction past max_entries and a ttl in seconds.
+
+    Each entry carries tags naming what it was built from ("recipe:3",
+    "tags", ...) so a write can drop exactly the entries it changed.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped on every invalidation, so a response built from data that
+        # changed while it was being built isn't stored
+        self.generation = 0
+        self._entries: OrderedDict[tuple, Entry] = OrderedDict()
+        self._by_tag: dict[str, set[tuple]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Entry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(
+        self,
+        key: tuple,
+        body: bytes,
+        content_type: str,
+        tags: set[str],
+        ttl: float | None = None,
+        generation: int | None = None,
+    ) -> Entry:
+        entry = Entry(
+            body,
+            content_type,
+            hashlib.blake2b(body, digest_size=16).hexdigest(),
+            time.monotonic() + (self.ttl if ttl is None else ttl),
+            tags,
+        )
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return entry
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+        return entry
+
+    def invalidate(self, *tags: str):
+        with self._lock:
+            self.generation += 1
+            for tag in tags:
+                for key in self._by_tag.pop(tag, ()):
+                    self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+
+
+def get_cache() -> ResponseCache:
+    """The app's response cache, sized from the CACHE_* settings."""
+    cache = current_app.extensions.get("kitchenfire.cache")
+    if cache is None:
+        config = current_app.config
+        cache = current_app.extensions.setdefault(
+            "kitchenfire.cache",
+            ResponseCache(config.get("CACHE_MAX_ENTRIES", 1024), config.get("CACHE_TTL", 60)),
+        )
+    return cache
+
+
+def tag_response(*tags: str):
+    """Marks the response being built by a cached view with tags."""
+    if "cache_tags" in g:
+        g.cache_tags.update(tags)
+
+
+def _key() -> tuple:
+    view_args = tuple(
+        sorted((k, str(v).replace(" ", ",")) for k, v in (request.view_args or {}).items())
+    )
+    return request.endpoint, view_args, tuple(sorted(request.args.items(multi=True)))
+
+
+def cached(*tags: str, ttl: float | None = None):
+    """
+    Serves a GET view from the response cache, with ETag revalidation.
+
+    tags are added to every response of the view; the view can add more
+    with tag_response. Only 200 responses that aren't streamed are kept.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not current_app.config.get("CACHE", True):
+                return view(*args, **kwargs)
+
+            cache = get_cache()
+            key = _key()
+            entry = cache.get(key)
+            if entry is None:
+                generation = cache.generation
+                g.cache_tags = set(tags)
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                entry = cache.put(
+                    key,
+                    response.get_data(),
+                    response.content_type,
+                    g.cache_tags,
+                    ttl,
+                    generation,
+                )
+            return entry.response()
+
+        return wrapper
+
+    return decorator
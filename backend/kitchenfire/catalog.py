@@ -0,0 +1,132 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Iterable
+
+from flask import current_app
+
+from .db import get_db
+from .hydrate import group_ingredients, group_tags
+from .post import Post
+from .queries import statement
+from .recipe import Recipe
+
+# Where a refresh stops. A save commits a recipe with its tags and
+# ingredients, so the three queries below, bounded by this, all see the same
+# recipes whatever is saved while they run
+MAX_ID_QUERY = statement("catalog.max_id", "SELECT MAX(RecipeId) FROM Recipes;")
+
+# Everything about a recipe that doesn't change once it is saved, for every
+# recipe between the two RecipeIds
+RECIPES_AFTER_QUERY = statement(
+    "catalog.recipes_after",
+    """
+    SELECT RecipeId, RecipeName, Description, Instructions, CookTime,
+           Difficulty, PhotoURL
+    FROM Recipes
+    WHERE RecipeId > ? AND RecipeId <= ?
+    ORDER BY RecipeId;
+    """,
+)
+
+TAGS_AFTER_QUERY = statement(
+    "catalog.tags_after",
+    """
+    SELECT RecipeId, TagId, TagName
+    FROM HasTag JOIN Tags USING (TagId)
+    WHERE RecipeId > ? AND RecipeId <= ?
+    ORDER BY RecipeId, TagId;
+    """,
+)
+
+INGREDIENTS_AFTER_QUERY = statement(
+    "catalog.ingredients_after",
+    """
+    SELECT RecipeId, IngredientId, IngredientName, TypeName, Amount, AmountUnit
+    FROM Requires
+        JOIN Ingredients USING (IngredientId)
+        JOIN IngredientTypes USING (TypeId)
+    WHERE RecipeId > ? AND RecipeId <= ?
+    ORDER BY RecipeId, IngredientId;
+    """,
+)
+
+# The parts of a post that change all the time, read fresh on every request
+COUNTERS_QUERY = statement(
+    "catalog.counters",
+    """
+    SELECT RecipeId, NumberOfLikes, Rating, Reviews
+    FROM Posts
+    WHERE RecipeId IN (SELECT value FROM json_each(?));
+    """,
+)
+
+
+class RecipeCatalog:
+    """
+    Every recipe body (name, text, photo, ingredients, tags) held in memory,
+    so hydrating a post only has to read its counters from Posts.
+
+    Recipes are never edited once saved, so the catalog only ever has to
+    pick up new ones: everything above the highest RecipeId it has seen.
+    It looks for them when asked for a recipe it doesn't have, at most every
+    refresh_interval seconds otherwise (for recipes saved by other
+    processes), and whenever refresh() is called after a save.
+    """
+
+    def __init__(self, refresh_interval: float = 5):
+        self.refresh_interval = refresh_interval
+        self.recipes: dict[int, Recipe] = {}
+        self.max_id = 0
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, c: sqlite3.Cursor):
+        """Loads every recipe saved since the last refresh."""
+        with self._lock:
+            after = self.max_id
+            (upto,) = c.execute(MAX_ID_QUERY).fetchone()
+            if upto is not None and upto > after:
+                bounds = (after, upto)
+                tags = group_tags(c.execute(TAGS_AFTER_QUERY, bounds))
+                ingredients = group_ingredients(c.execute(INGREDIENTS_AFTER_QUERY, bounds))
+                for row in c.execute(RECIPES_AFTER_QUERY, bounds):
+                    recipe_id = row[0]
+                    self.recipes[recipe_id] = Recipe.from_row(
+                        row, ingredients.get(recipe_id, []), tags.get(recipe_id, [])
+                    )
+                self.max_id = upto
+            self._checked = time.monotonic()
+
+    def posts(self, c: sqlite3.Cursor, recipe_ids: Iterable[int]) -> list[Post]:
+        """
+        Same as hydrate.posts_by_recipe_ids, but only the counters come from
+        the database.
+        """
+        recipe_ids = [int(i) for i in recipe_ids]
+        if not recipe_ids:
+            return []
+
+        stale = time.monotonic() - self._checked > self.refresh_interval
+        if stale or any(i not in self.recipes and i > self.max_id for i in recipe_ids):
+            self.refresh(c)
+
+        ids = json.dumps(sorted(set(recipe_ids)))
+        posts = {
+            recipe_id: Post(self.recipes[recipe_id], likes, rating, reviews)
+            for recipe_id, likes, rating, reviews in c.execute(COUNTERS_QUERY, (ids,))
+            if recipe_id in self.recipes
+        }
+        return [posts[i] for i in recipe_ids if i in posts]
+
+
+def get_catalog() -> RecipeCatalog:
+    """The app's recipe catalog, loaded in full on first use."""
+    catalog = current_app.extensions.get("kitchenfire.catalog")
+    if catalog is None:
+        catalog = RecipeCatalog(current_app.config.get("CATALOG_REFRESH_INTERVAL", 5))
+        with get_db() as db:
+            catalog.refresh(db.cursor())
+        catalog = current_app.extensions.setdefault("kitchenfire.catalog", catalog)
+    return catalog
@@ -0,0 +1,120 @@
+import base64
+import json
+import sqlite3
+import struct
+
+from .counters import CounterBuffer
+from .queries import statement
+
+COLUMNS = "CommentId, Author, Body, NumberOfLikes, Rating"
+
+# Every query here is a range of CommentsByPost or CommentsByLikes, so a
+# page costs the same however many comments the post has
+ALL_QUERY = statement(
+    "comments.all",
+    f"""
+    SELECT {COLUMNS}
+    FROM Comments
+    WHERE PostId = ?
+    ORDER BY CommentId;
+    """,
+)
+
+NEWEST_QUERY = statement(
+    "comments.newest",
+    f"""
+    SELECT {COLUMNS}
+    FROM Comments
+    WHERE PostId = ?1 AND CommentId < ?2
+    ORDER BY CommentId DESC
+    LIMIT ?3;
+    """,
+)
+
+LIKED_QUERY = statement(
+    "comments.liked",
+    f"""
+    SELECT {COLUMNS}
+    FROM Comments
+    WHERE PostId = ?1 AND (NumberOfLikes, CommentId) < (?2, ?3)
+    ORDER BY NumberOfLikes DESC, CommentId DESC
+    LIMIT ?4;
+    """,
+)
+
+BY_IDS_QUERY = statement(
+    "comments.by_ids",
+    f"""
+    SELECT {COLUMNS}
+    FROM Comments
+    WHERE PostId = ? AND CommentId IN (SELECT value FROM json_each(?))
+    ORDER BY CommentId;
+    """,
+)
+
+SORTS = ("newest", "liked")
+
+MAX_ID = 2**63 - 1
+
+
+def encode_cursor(cursor: tuple[int, int]) -> str:
+    return base64.urlsafe_b64encode(struct.pack(">qq", *cursor)).decode().rstrip("=")
+
+
+def decode_cursor(text: str) -> tuple[int, int]:
+    """Raises ValueError if text isn't a cursor from encode_cursor."""
+    try:
+        return struct.unpack(">qq", base64.urlsafe_b64decode(text + "=="))
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Invalid cursor {text!r}") from e
+
+
+def to_dicts(rows: list[tuple], post_id: int, counters: CounterBuffer) -> list[dict]:
+    """
+    Comment rows as the API sends them, with unflushed likes added in. Call
+    it inside counters.reading(), along with the query that read the rows.
+    """
+    return [
+        {
+            "id": comment_id,
+            "author": author,
+            "body": body,
+            "likes": max(likes + counters.pending_comment_likes(post_id, comment_id), 0),
+            "rating": rating,
+        }
+        for comment_id, author, body, likes, rating in rows
+    ]
+
+
+def all_comments(c: sqlite3.Cursor, post_id: int) -> list[tuple]:
+    return c.execute(ALL_QUERY, (post_id,)).fetchall()
+
+
+def page(
+    c: sqlite3.Cursor, post_id: int, sort: str, after: tuple[int, int] | None, count: int
+) -> tuple[list[tuple], tuple[int, int] | None]:
+    """
+    Up to count comments on post_id after the cursor after, newest first or
+    most liked first. Returns them and the cursor for the next page, which
+    is None on the last one.
+
+    Most liked goes by the stored like counts, so clicks that haven't been
+    flushed yet show up in the counts but don't move comments around.
+    """
+    if sort == "newest":
+        before = after[1] if after else MAX_ID
+        rows = c.execute(NEWEST_QUERY, (post_id, before, count + 1)).fetchall()
+    else:
+        likes, before = after if after else (MAX_ID, MAX_ID)
+        rows = c.execute(LIKED_QUERY, (post_id, likes, before, count + 1)).fetchall()
+
+    # The extra row only says whether there is another page
+    if len(rows) <= count:
+        return rows, None
+    rows = rows[:count]
+    last_id, _, _, last_likes, _ = rows[-1]
+    return rows, (last_likes if sort == "liked" else 0, last_id)
+
+
+def by_ids(c: sqlite3.Cursor, post_id: int, comment_ids: list[int]) -> list[tuple]:
+    return c.execute(BY_IDS_QUERY, (post_id, json.dumps(comment_ids))).fetchall()
@@ -0,0 +1,248 @@
+import atexit
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from flask import Flask, current_app
+
+from .queries import statement
+from .trending import HALF_LIFE, save_scores
+from .writer import mutate
+
+POST_QUERY = statement(
+    "likes.post",
+    """
+    UPDATE Posts
+    SET NumberOfLikes = max(NumberOfLikes + ?, 0)
+    WHERE RecipeId = ?;
+    """,
+)
+
+COMMENT_QUERY = statement(
+    "likes.comment",
+    """
+    UPDATE Comments
+    SET NumberOfLikes = max(NumberOfLikes + ?, 0)
+    WHERE PostId = ? AND CommentId = ?;
+    """,
+)
+
+
+class CounterBuffer:
+    """
+    Collects like/dislike deltas in memory and writes them out together, so a
+    burst of clicks on one post costs one transaction instead of one each.
+
+    Deltas are flushed every flush_interval seconds, as soon as max_pending
+    clicks are waiting, and when the process exits. Until then the pending_*
+    methods let reads add in what hasn't been written yet. Reads that do so
+    go inside reading(), which keeps them from straddling a flush's commit.
+
+    With enabled off every click is written straight away instead.
+    """
+
+    def __init__(
+        self,
+        app: Flask,
+        enabled: bool = True,
+        flush_interval: float = 1.0,
+        max_pending: int = 1000,
+        half_life: float = HALF_LIFE,
+    ):
+        self.app = app
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.half_life = half_life
+        self.flushes = 0
+        self.retries = 0
+        # (target, direction) -> clicks received, for the metrics endpoint
+        self.clicks: dict[tuple[str, str], int] = {}
+
+        self._likes: dict[int, int] = {}
+        self._recent_likes: dict[int, float] = {}
+        self._comment_likes: dict[tuple[int, int], int] = {}
+        self._pending = 0
+        self._flushing: tuple[dict, dict, dict] = ({}, {}, {})
+        self._committing = False
+        self._readers = 0
+        self._reading = threading.local()
+        self._lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher: threading.Thread | None = None
+
+    def add_post(self, post_id: int, likes: int, recent_likes: float):
+        self._click("post", likes)
+        if not self.enabled:
+            mutate(lambda c: write(c, {post_id: likes}, {post_id: recent_likes}, {}, self.half_life))
+            return
+
+        with self._lock:
+            self._likes[post_id] = self._likes.get(post_id, 0) + likes
+            self._recent_likes[post_id] = (
+                self._recent_likes.get(post_id, 0) + recent_likes
+            )
+            self._pending += 1
+            full = self._pending >= self.max_pending
+        self._start()
+        if full:
+            self._wake.set()
+
+    def add_comment(self, post_id: int, comment_id: int, likes: int):
+        self._click("comment", likes)
+        if not self.enabled:
+            mutate(lambda c: write(c, {}, {}, {(post_id, comment_id): likes}, self.half_life))
+            return
+
+        key = (post_id, comment_id)
+        with self._lock:
+            self._comment_likes[key] = self._comment_likes.get(key, 0) + likes
+            self._pending += 1
+            full = self._pending >= self.max_pending
+        self._start()
+        if full:
+            self._wake.set()
+
+    def _click(self, target: str, likes: int):
+        key = (target, "like" if likes > 0 else "dislike")
+        with self._lock:
+            self.clicks[key] = self.clicks.get(key, 0) + 1
+
+    def clicks_snapshot(self) -> dict[tuple[str, str], int]:
+        with self._lock:
+            return dict(self.clicks)
+
+    @property
+    def pending(self) -> int:
+        """Clicks waiting for the next flush."""
+        return self._pending
+
+    @contextmanager
+    def reading(self):
+        """
+        Wraps reading counts from the database and adding the pending_* deltas
+        to them. A flush waits for these to finish before it commits, and they
+        wait for it to clear its deltas after, so a read never sees the
+        committed counts with the deltas still pending (counting them twice)
+        or the old counts with them cleared (not at all).
+        """
+        if getattr(self._reading, "active", False):
+            # Already counted; waiting here would wait on our own read
+            yield
+            return
+        with self._settled:
+            self._settled.wait_for(lambda: not self._committing)
+            self._readers += 1
+        self._reading.active = True
+        try:
+            yield
+        finally:
+            self._reading.active = False
+            with self._settled:
+                self._readers -= 1
+                if not self._readers:
+                    self._settled.notify_all()
+
+    def pending_likes(self, post_id: int) -> int:
+        with self._lock:
+            return self._likes.get(post_id, 0) + self._flushing[0].get(post_id, 0)
+
+    def pending_comment_likes(self, post_id: int, comment_id: int) -> int:
+        key = (post_id, comment_id)
+        with self._lock:
+            return self._comment_likes.get(key, 0) + self._flushing[2].get(key, 0)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not (self._likes or self._comment_likes):
+                    return
+                self._flushing = (self._likes, self._recent_likes, self._comment_likes)
+                self._likes, self._recent_likes, self._comment_likes = {}, {}, {}
+                self._pending = 0
+
+            likes, recent_likes, comment_likes = self._flushing
+
+            def commit(c):
+                # On the writer, once it has got to this flush, so reads only
+                # wait for the flush's own transaction and not the queue
+                with self._settled:
+                    self._committing = True
+                    self._settled.wait_for(lambda: not self._readers)
+                write(c, likes, recent_likes, comment_likes, self.half_life)
+
+            failed = True
+            try:
+                with self.app.app_context():
+                    mutate(commit)
+                failed = False
+                self.flushes += 1
+            finally:
+                with self._settled:
+                    if failed:
+                        # Put the deltas back so the next flush tries them again
+                        self.retries += 1
+                        for pending, deltas in zip(
+                            (self._likes, self._recent_likes, self._comment_likes),
+                            self._flushing,
+                        ):
+                            for key, delta in deltas.items():
+                                pending[key] = pending.get(key, 0) + delta
+                    self._flushing = ({}, {}, {})
+                    self._committing = False
+                    self._settled.notify_all()
+
+    def _start(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run, name="kitchenfire-counters", daemon=True
+            )
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                self.app.logger.exception("Could not flush like counters: %s", e)
+
+
+def write(
+    c: sqlite3.Cursor,
+    likes: dict[int, int],
+    recent_likes: dict[int, float],
+    comment_likes: dict[tuple[int, int], int],
+    half_life: float = HALF_LIFE,
+):
+    c.executemany(POST_QUERY, ((d, i) for i, d in likes.items() if d))
+    save_scores(c, recent_likes, half_life)
+    c.executemany(
+        COMMENT_QUERY, ((d, p, i) for (p, i), d in comment_likes.items() if d)
+    )
+
+
+def get_counters() -> CounterBuffer:
+    """The app's counter buffer, configured from the COUNTER_* settings."""
+    counters = current_app.extensions.get("kitchenfire.counters")
+    if counters is None:
+        config = current_app.config
+        counters = current_app.extensions.setdefault(
+            "kitchenfire.counters",
+            CounterBuffer(
+                current_app._get_current_object(),
+                enabled=config.get("COUNTER_BUFFER", True),
+                flush_interval=config.get("COUNTER_FLUSH_INTERVAL", 1.0),
+                max_pending=config.get("COUNTER_MAX_PENDING", 1000),
+                half_life=config.get("TRENDING_HALF_LIFE", HALF_LIFE),
+            ),
+        )
+    return counters
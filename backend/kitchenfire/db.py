@@ -0,0 +1,219 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from flask import Flask, current_app, g, has_request_context, request
+
+from . import migrate, queries
+from .instrument import InstrumentedConnection, current_timing
+
+# Applied to every connection as it is opened. WAL lets the feed readers keep
+# going while a like is being written.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def pragmas(journal_mode: str = "WAL", synchronous: str = "NORMAL") -> tuple[str, ...]:
+    """PRAGMAS with a different journal mode or sync level, for trying others."""
+    return (
+        f"PRAGMA journal_mode = {journal_mode}",
+        f"PRAGMA synchronous = {synchronous}",
+        *PRAGMAS[2:],
+    )
+
+
+# A BEGIN IMMEDIATE that takes longer than this found the write lock taken
+# and sat in SQLite's busy handler, which first retries after a millisecond
+BUSY_THRESHOLD = 0.001
+
+
+class ConnectionPool:
+    """
+    Keeps opened connections around so a request doesn't pay for opening the
+    database and reading the schema again.
+
+    Each worker thread checks one connection out for the length of its app
+    context and hands it back at teardown, so a connection is only ever used
+    by one thread at a time.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        max_idle: int = 16,
+        pragmas: tuple[str, ...] = PRAGMAS,
+        busy_timeout: float = 5.0,
+        factory: type[sqlite3.Connection] = sqlite3.Connection,
+        cached_statements: int = 128,
+    ):
+        self.db_url = db_url
+        self.max_idle = max_idle
+        self.pragmas = pragmas
+        self.busy_timeout = busy_timeout
+        self.factory = factory
+        self.cached_statements = cached_statements
+        self.hits = 0
+        self.misses = 0
+        # Label -> [writes, seconds waited, longest wait, timed out, busy]
+        self.lock_waits: dict[str, list] = {}
+        self._idle: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def open(self) -> sqlite3.Connection:
+        db = sqlite3.connect(
+            self.db_url,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            factory=self.factory,
+            cached_statements=self.cached_statements,
+        )
+        for pragma in self.pragmas:
+            db.execute(pragma)
+        timing = current_timing()
+        if timing is not None:
+            timing.connections += 1
+        return db
+
+    def begin_write(self, db: sqlite3.Connection, label: str):
+        """
+        Starts a transaction on db that takes SQLite's write lock straight
+        away, and records how long it had to wait for it under label.
+        """
+        start = time.perf_counter()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            self._waited(label, time.perf_counter() - start, timed_out=True)
+            raise
+        self._waited(label, time.perf_counter() - start)
+
+    def _waited(self, label: str, seconds: float, timed_out: bool = False):
+        with self._lock:
+            wait = self.lock_waits.setdefault(label, [0, 0.0, 0.0, 0, 0])
+            wait[0] += 1
+            wait[1] += seconds
+            wait[2] = max(wait[2], seconds)
+            wait[3] += timed_out
+            wait[4] += seconds > BUSY_THRESHOLD
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self.misses += 1
+        return self.open()
+
+    def release(self, db: sqlite3.Connection):
+        if db.in_transaction:
+            db.rollback()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(db)
+                return
+        db.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for db in idle:
+            db.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "idle": len(self._idle),
+                "lock_waits": {
+                    label: {
+                        "writes": writes,
+                        "seconds": seconds,
+                        "max_ms": longest * 1000,
+                        "timeouts": timeouts,
+                        "busy": busy,
+                    }
+                    for label, (writes, seconds, longest, timeouts, busy) in self.lock_waits.items()
+                },
+            }
+
+
+def init_app(app: Flask):
+    app.teardown_appcontext(_release_db)
+
+
+def get_pool() -> ConnectionPool:
+    """
+    The app's pool, opened against DB_URL the first time it is needed.
+    DB_JOURNAL_MODE, DB_SYNCHRONOUS, DB_BUSY_TIMEOUT and POOL_MAX_IDLE
+    override the defaults. Each connection caches as many prepared
+    statements as there are in the queries registry, or DB_CACHED_STATEMENTS.
+    With INSTRUMENT set, its connections time every statement.
+
+    The database is migrated to the current schema when the pool is made,
+    unless MIGRATE is turned off.
+    """
+    pool = current_app.extensions.get("kitchenfire.pool")
+    if pool is None:
+        config = current_app.config
+        pool = ConnectionPool(
+            config["DB_URL"],
+            config.get("POOL_MAX_IDLE", 16),
+            pragmas(config.get("DB_JOURNAL_MODE", "WAL"), config.get("DB_SYNCHRONOUS", "NORMAL")),
+            config.get("DB_BUSY_TIMEOUT", 5.0),
+            InstrumentedConnection if config.get("INSTRUMENT") else sqlite3.Connection,
+            config.get("DB_CACHED_STATEMENTS", queries.cache_size()),
+        )
+        # Before anyone else gets the pool, so no request sees the old schema
+        if config.get("MIGRATE", True):
+            db = pool.acquire()
+            try:
+                migrate.migrate(db)
+            finally:
+                pool.release(db)
+        pool = current_app.extensions.setdefault("kitchenfire.pool", pool)
+    return pool
+
+
+def get_db() -> sqlite3.Connection:
+    """
+    The connection for the current app context. Use it as a context manager
+    to commit (or roll back) around a block of statements.
+    """
+    if "db" not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+@contextmanager
+def write_transaction(label: str | None = None) -> Iterator[sqlite3.Connection]:
+    """
+    get_db() inside a transaction that holds the write lock from the start,
+    committed at the end of the block.
+
+    A transaction that starts out reading and then writes can fail with
+    "database is locked" straight away if another writer got in first,
+    whatever the busy timeout. Taking the lock up front means writers queue
+    for it instead, and the wait is recorded under label (the endpoint by
+    default) in the pool's lock_waits.
+    """
+    db = get_db()
+    if not db.in_transaction:
+        if label is None:
+            label = request.endpoint if has_request_context() else "-"
+        get_pool().begin_write(db, label)
+    with db:
+        yield db
+
+
+def _release_db(exception):
+    db = g.pop("db", None)
+    if db is not None:
+        get_pool().release(db)
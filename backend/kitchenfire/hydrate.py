@@ -0,0 +1,92 @@
+import json
+import sqlite3
+from typing import Iterable
+
+from .Ingredient import Ingredient
+from .post import Post
+from .queries import statement
+from .recipe import Recipe
+from .tag import Tag
+
+
+# Every query takes the whole id list as one json array, so a page costs the
+# same three statements no matter how many recipes are on it.
+POSTS_QUERY = statement(
+    "hydrate.posts",
+    """
+    SELECT RecipeId, RecipeName, Description, Instructions, CookTime,
+           Difficulty, PhotoURL, NumberOfLikes, Rating, Reviews
+    FROM Recipes JOIN Posts USING (RecipeId)
+    WHERE RecipeId IN (SELECT value FROM json_each(?));
+    """,
+)
+
+TAGS_QUERY = statement(
+    "hydrate.tags",
+    """
+    SELECT RecipeId, TagId, TagName
+    FROM HasTag JOIN Tags USING (TagId)
+    WHERE RecipeId IN (SELECT value FROM json_each(?))
+    ORDER BY RecipeId, TagId;
+    """,
+)
+
+INGREDIENTS_QUERY = statement(
+    "hydrate.ingredients",
+    """
+    SELECT RecipeId, IngredientId, IngredientName, TypeName, Amount, AmountUnit
+    FROM Requires
+        JOIN Ingredients USING (IngredientId)
+        JOIN IngredientTypes USING (TypeId)
+    WHERE RecipeId IN (SELECT value FROM json_each(?))
+    ORDER BY RecipeId, IngredientId;
+    """,
+)
+
+
+def group_tags(rows: Iterable[tuple]) -> dict[int, list[Tag]]:
+    """RecipeId -> Tags from (RecipeId, TagId, TagName) rows."""
+    # Tags are immutable, so recipes with the same tag share one object
+    shared: dict[int, Tag] = {}
+    tags: dict[int, list[Tag]] = {}
+    for row in rows:
+        tag = shared.get(row[1])
+        if tag is None:
+            tag = shared[row[1]] = Tag.from_row(row[1:])
+        tags.setdefault(row[0], []).append(tag)
+    return tags
+
+
+def group_ingredients(rows: Iterable[tuple]) -> dict[int, list[Ingredient]]:
+    """RecipeId -> Ingredients from rows shaped like INGREDIENTS_QUERY's."""
+    ingredients: dict[int, list[Ingredient]] = {}
+    for row in rows:
+        ingredients.setdefault(row[0], []).append(Ingredient.from_row(row[1:]))
+    return ingredients
+
+
+def posts_by_recipe_ids(c: sqlite3.Cursor, recipe_ids: Iterable[int]) -> list[Post]:
+    """
+    Builds the posts for recipe_ids in a fixed number of queries.
+
+    Posts come back in the order the ids were given, duplicates included.
+    Ids without a post are skipped.
+    """
+    recipe_ids = [int(i) for i in recipe_ids]
+    if not recipe_ids:
+        return []
+
+    ids = json.dumps(sorted(set(recipe_ids)))
+
+    tags = group_tags(c.execute(TAGS_QUERY, (ids,)))
+    ingredients = group_ingredients(c.execute(INGREDIENTS_QUERY, (ids,)))
+
+    posts: dict[int, Post] = {}
+    for row in c.execute(POSTS_QUERY, (ids,)):
+        recipe_id = row[0]
+        recipe = Recipe.from_row(
+            row[:7], ingredients.get(recipe_id, []), tags.get(recipe_id, [])
+        )
+        posts[recipe_id] = Post(recipe, *row[7:10])
+
+    return [posts[i] for i in recipe_ids if i in posts]
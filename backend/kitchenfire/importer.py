@@ -0,0 +1,500 @@
+import csv
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from itertools import islice
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from . import migrate, text_search
+from .db import PRAGMAS
+
+
+# Nothing else has the database open during an import, so durability only
+# matters once it is finished: a crash halfway means starting again anyway.
+LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+)
+
+INSERT_TAG = "INSERT INTO Tags (TagId, TagName) VALUES (?, ?)"
+INSERT_TYPE = "INSERT INTO IngredientTypes (TypeId, TypeName) VALUES (?, ?)"
+INSERT_INGREDIENT = "INSERT INTO Ingredients (IngredientId, IngredientName, TypeId) VALUES (?, ?, ?)"
+INSERT_RECIPE = """
+    INSERT INTO Recipes (RecipeId, RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+INSERT_HAS_TAG = "INSERT OR IGNORE INTO HasTag (RecipeId, TagId) VALUES (?, ?)"
+INSERT_REQUIRES = """
+    INSERT OR IGNORE INTO Requires (RecipeId, IngredientId, Amount, AmountUnit)
+    VALUES (?, ?, ?, ?)
+    """
+# The CSVs only have the average, the running total is worked back from it
+INSERT_POST = (
+    "INSERT OR IGNORE INTO Posts (RecipeId, NumberOfLikes, Rating, Reviews, RatingSum) "
+    "VALUES (?, ?, ?, ?, ?3 * ?4)"
+)
+# Scores in the CSVs are taken as of the import
+INSERT_TRENDING = "INSERT OR IGNORE INTO Trending (RecipeId, NumberOfRecentLikes, ScoredAt) VALUES (?, ?, ?)"
+INSERT_IMPORTED = "INSERT OR REPLACE INTO Imported (RecipeName, Digest) VALUES (?, ?)"
+
+# Every ingredient in the CSVs gets this type, there's no column for it yet
+DEFAULT_TYPE = "unknown"
+
+Progress = Callable[[str, int], None]
+
+
+def read_csv(path: str) -> Iterator[tuple[int, list[str]]]:
+    """(line number, row) for every row of path after the header."""
+    # Some of the exports start with a byte order mark
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if row:
+                yield reader.line_num, row
+
+
+def batches(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def deferred_indexes(c: sqlite3.Cursor) -> list[str]:
+    """Drops every explicitly created index, returning the SQL to recreate them."""
+    indexes = c.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    ).fetchall()
+    for name, _ in indexes:
+        c.execute(f'DROP INDEX "{name}"')
+    return [sql for _, sql in indexes]
+
+
+class CsvRecipe(NamedTuple):
+    """Everything the CSVs say about one recipe, as the raw strings."""
+
+    row: list[str]
+    ingredients: list[list[str]]
+    post: list[str] | None
+    trending: list[str] | None
+
+
+def recipe_digests(static_dir: str) -> dict[str, str]:
+    """
+    RecipeName -> a hash of its rows in the CSVs, to tell which recipes
+    changed since the last import without keeping the rows around.
+
+    Only whether there is a post or trending row counts: their numbers are
+    live counters once imported, and are never overwritten.
+    """
+    hashes = {}
+    for _, row in read_csv(os.path.join(static_dir, "RecipeInfo.csv")):
+        if row[0] not in hashes:
+            hashes[row[0]] = hashlib.blake2b("\x1f".join(row).encode(), digest_size=16)
+    for name, include_values in (
+        ("IngredientInfo.csv", True),
+        ("PostInfo.csv", False),
+        ("TrendingInfo.csv", False),
+    ):
+        marker = f"\x1e{name}".encode()
+        for _, row in read_csv(os.path.join(static_dir, name)):
+            h = hashes.get(row[0])
+            if h is not None:
+                h.update(marker + ("\x1f".join(row[1:]).encode() if include_values else b""))
+    return {name: h.hexdigest() for name, h in hashes.items()}
+
+
+def read_recipes(static_dir: str, names: set[str]) -> dict[str, CsvRecipe]:
+    """RecipeName -> CsvRecipe for the recipes in names. Like the bulk
+    import, the first row wins when a name or ingredient is repeated."""
+    recipes: dict[str, CsvRecipe] = {}
+    for _, row in read_csv(os.path.join(static_dir, "RecipeInfo.csv")):
+        if row[0] in names and row[0] not in recipes:
+            recipes[row[0]] = CsvRecipe(row, [], None, None)
+
+    seen = set()
+    for _, row in read_csv(os.path.join(static_dir, "IngredientInfo.csv")):
+        if row[0] in recipes and (row[0], row[1]) not in seen:
+            seen.add((row[0], row[1]))
+            recipes[row[0]].ingredients.append(row[1:])
+
+    for name, field in (("PostInfo.csv", "post"), ("TrendingInfo.csv", "trending")):
+        for _, row in read_csv(os.path.join(static_dir, name)):
+            recipe = recipes.get(row[0])
+            if recipe is not None and getattr(recipe, field) is None:
+                recipes[row[0]] = recipe._replace(**{field: row[1:]})
+    return recipes
+
+
+class BulkImporter:
+    """
+    Loads the CSV exports in static/ into an empty database in a single
+    transaction.
+
+    The files are streamed batch_size rows at a time. Names are turned into
+    ids from in-memory dicts instead of a SELECT per row, so every batch is
+    one executemany per table. Indexes and the search table are built once
+    at the end rather than kept up to date row by row.
+
+    Rows that point at a recipe that isn't in RecipeInfo.csv, and repeated
+    recipe names, are skipped and counted.
+    """
+
+    def __init__(
+        self,
+        db: sqlite3.Connection,
+        static_dir: str,
+        batch_size: int = 5000,
+        progress: Progress | None = None,
+    ):
+        self.db = db
+        self.static_dir = static_dir
+        self.batch_size = batch_size
+        self.progress = progress
+        self.tags: dict[str, int] = {}
+        self.ingredients: dict[str, int] = {}
+        self.recipes: dict[str, int] = {}
+        self.rows = 0
+        self.skipped = 0
+
+    def run(self) -> dict:
+        c = self.db.cursor()
+        (existing,) = c.execute("SELECT count(*) FROM Recipes").fetchone()
+        if existing:
+            raise ValueError(
+                f"the database already has {existing} recipes, use an incremental import"
+            )
+
+        start = time.perf_counter()
+        for pragma in LOAD_PRAGMAS:
+            c.execute(pragma)
+        try:
+            c.execute("BEGIN")
+            indexes = deferred_indexes(c)
+            self.load_recipes(c)
+            self.load_ingredients(c)
+            self.load_posts(c)
+            self.load_trending(c)
+            self._report("indexes", len(indexes))
+            for sql in indexes:
+                c.execute(sql)
+            text_search.rebuild(c)
+            self._report("RecipeSearch", len(self.recipes))
+            c.executemany(
+                INSERT_IMPORTED,
+                recipe_digests(self.static_dir).items(),
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+        finally:
+            for pragma in PRAGMAS:
+                c.execute(pragma)
+        c.execute("ANALYZE")
+
+        seconds = time.perf_counter() - start
+        return {
+            "recipes": len(self.recipes),
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "seconds": seconds,
+            "rows_per_second": self.rows / seconds if seconds else 0.0,
+        }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.static_dir, name)
+
+    def _report(self, name: str, done: int):
+        if self.progress is not None:
+            self.progress(name, done)
+
+    def _insert(self, c: sqlite3.Cursor, query: str, rows: list):
+        if rows:
+            c.executemany(query, rows)
+            self.rows += len(rows)
+
+    def _recipe_rows(self, name: str) -> Iterator[list[str]]:
+        """Rows of a CSV keyed by recipe name, with the name swapped for its id."""
+        for _, row in read_csv(self._path(name)):
+            recipe_id = self.recipes.get(row[0])
+            if recipe_id is None:
+                self.skipped += 1
+                continue
+            yield [recipe_id, *row[1:]]
+
+    def load_recipes(self, c: sqlite3.Cursor):
+        done = 0
+        for batch in batches(read_csv(self._path("RecipeInfo.csv")), self.batch_size):
+            tags = []
+            recipes = []
+            has_tag = []
+            for line, row in batch:
+                name, photo_url, tag_names, description, cook_time, difficulty, method = row
+                if name in self.recipes:
+                    self.skipped += 1
+                    continue
+                recipe_id = self.recipes[name] = len(self.recipes) + 1
+                try:
+                    recipes.append(
+                        (recipe_id, name, description, method, int(cook_time), int(difficulty), photo_url)
+                    )
+                except ValueError as e:
+                    raise ValueError(f"RecipeInfo.csv line {line}: {e}") from None
+                for tag in tag_names.split():
+                    tag_id = self.tags.get(tag)
+                    if tag_id is None:
+                        tag_id = self.tags[tag] = len(self.tags) + 1
+                        tags.append((tag_id, tag))
+                    has_tag.append((recipe_id, tag_id))
+
+            self._insert(c, INSERT_TAG, tags)
+            self._insert(c, INSERT_RECIPE, recipes)
+            self._insert(c, INSERT_HAS_TAG, has_tag)
+            done += len(batch)
+            self._report("RecipeInfo.csv", done)
+
+    def load_ingredients(self, c: sqlite3.Cursor):
+        type_id = 1
+        self._insert(c, INSERT_TYPE, [(type_id, DEFAULT_TYPE)])
+
+        done = 0
+        for batch in batches(self._recipe_rows("IngredientInfo.csv"), self.batch_size):
+            ingredients = []
+            requires = []
+            for recipe_id, name, amount, unit in batch:
+                ingredient_id = self.ingredients.get(name)
+                if ingredient_id is None:
+                    ingredient_id = self.ingredients[name] = len(self.ingredients) + 1
+                    ingredients.append((ingredient_id, name, type_id))
+                if amount and unit:
+                    requires.append((recipe_id, ingredient_id, float(amount), unit))
+                else:
+                    requires.append((recipe_id, ingredient_id, None, None))
+
+            self._insert(c, INSERT_INGREDIENT, ingredients)
+            self._insert(c, INSERT_REQUIRES, requires)
+            done += len(batch)
+            self._report("IngredientInfo.csv", done)
+
+    def load_posts(self, c: sqlite3.Cursor):
+        done = 0
+        for batch in batches(self._recipe_rows("PostInfo.csv"), self.batch_size):
+            self._insert(
+                c,
+                INSERT_POST,
+                [(r, int(likes), float(rating), int(reviews)) for r, likes, rating, reviews in batch],
+            )
+            done += len(batch)
+            self._report("PostInfo.csv", done)
+
+    def load_trending(self, c: sqlite3.Cursor):
+        done = 0
+        now = time.time()
+        for batch in batches(self._recipe_rows("TrendingInfo.csv"), self.batch_size):
+            self._insert(c, INSERT_TRENDING, [(r, float(likes), now) for r, likes in batch])
+            done += len(batch)
+            self._report("TrendingInfo.csv", done)
+
+
+class IncrementalImporter:
+    """
+    Brings a database up to date with edited CSV exports, in one transaction.
+
+    Each recipe's CSV rows are hashed and compared with the digest stored in
+    Imported at the last import, so only recipes that were added, changed or
+    removed are written; tags and ingredients are matched by name and
+    dropped once nothing uses them. Reading the CSVs and the digests are the
+    only passes over everything.
+
+    Likes, ratings and reviews are live counters: a new recipe starts from
+    PostInfo.csv and TrendingInfo.csv, an existing one keeps its own.
+    Recipes added through the app aren't in Imported and are never removed,
+    but one with the same name as a CSV recipe is taken over by it.
+
+    Running apps keep their in-memory catalog and indexes until restarted.
+    """
+
+    def __init__(self, db: sqlite3.Connection, static_dir: str, progress: Progress | None = None):
+        self.db = db
+        self.static_dir = static_dir
+        self.progress = progress
+
+    def _report(self, name: str, done: int):
+        if self.progress is not None:
+            self.progress(name, done)
+
+    def run(self) -> dict:
+        start = time.perf_counter()
+        c = self.db.cursor()
+        digests = recipe_digests(self.static_dir)
+        imported = dict(c.execute("SELECT RecipeName, Digest FROM Imported"))
+        changed = [name for name, d in digests.items() if imported.get(name) != d]
+        removed = [name for name in imported if name not in digests]
+        # Only the changed recipes' rows are read in full
+        recipes = read_recipes(self.static_dir, set(changed)) if changed else {}
+        self._report("changed", len(changed))
+        self._report("removed", len(removed))
+
+        stats = {"inserted": 0, "updated": 0, "deleted": len(removed)}
+        try:
+            c.execute("BEGIN")
+            ids = dict(
+                c.execute(
+                    "SELECT RecipeName, RecipeId FROM Recipes WHERE RecipeName IN (SELECT value FROM json_each(?))",
+                    (json.dumps(changed + removed),),
+                )
+            )
+            removed_ids = [ids[name] for name in removed if name in ids]
+            updated_ids = [ids[name] for name in changed if name in ids]
+            old_tags, old_ingredients = self.delete_links(c, removed_ids + updated_ids)
+            self.delete_recipes(c, removed_ids)
+
+            changed_ids = []
+            for name in changed:
+                row = recipes[name].row
+                values = (name, row[3], row[6], int(row[4]), int(row[5]), row[1])
+                if name in ids:
+                    c.execute(
+                        """
+                        UPDATE Recipes
+                        SET RecipeName = ?, Description = ?, Instructions = ?,
+                            CookTime = ?, Difficulty = ?, PhotoURL = ?
+                        WHERE RecipeId = ?
+                        """,
+                        (*values, ids[name]),
+                    )
+                    stats["updated"] += 1
+                else:
+                    c.execute(
+                        """
+                        INSERT INTO Recipes (RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        """,
+                        values,
+                    )
+                    ids[name] = c.lastrowid
+                    stats["inserted"] += 1
+                changed_ids.append(ids[name])
+
+            self.insert_links(c, [(ids[name], recipes[name]) for name in changed])
+            text_search.index_recipes(c, changed_ids)
+            self.delete_unused(c, old_tags, old_ingredients)
+
+            c.executemany(INSERT_IMPORTED, ((name, digests[name]) for name in changed))
+            c.execute(
+                "DELETE FROM Imported WHERE RecipeName IN (SELECT value FROM json_each(?))",
+                (json.dumps(removed),),
+            )
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+
+        stats["unchanged"] = len(digests) - len(changed)
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def delete_links(self, c: sqlite3.Cursor, recipe_ids: list[int]) -> tuple[set, set]:
+        """Drops the tags and ingredients of recipe_ids, returning their ids."""
+        ids = (json.dumps(recipe_ids),)
+        tags = {t for (t,) in c.execute(
+            "SELECT TagId FROM HasTag WHERE RecipeId IN (SELECT value FROM json_each(?))", ids
+        )}
+        ingredients = {i for (i,) in c.execute(
+            "SELECT IngredientId FROM Requires WHERE RecipeId IN (SELECT value FROM json_each(?))", ids
+        )}
+        c.execute("DELETE FROM HasTag WHERE RecipeId IN (SELECT value FROM json_each(?))", ids)
+        c.execute("DELETE FROM Requires WHERE RecipeId IN (SELECT value FROM json_each(?))", ids)
+        return tags, ingredients
+
+    def delete_recipes(self, c: sqlite3.Cursor, recipe_ids: list[int]):
+        ids = (json.dumps(recipe_ids),)
+        c.execute("DELETE FROM Comments WHERE PostId IN (SELECT value FROM json_each(?))", ids)
+        for table in ("Trending", "Posts", "Recipes"):
+            c.execute(f"DELETE FROM {table} WHERE RecipeId IN (SELECT value FROM json_each(?))", ids)
+        c.execute("DELETE FROM RecipeSearch WHERE rowid IN (SELECT value FROM json_each(?))", ids)
+
+    def insert_links(self, c: sqlite3.Cursor, recipes: list[tuple[int, CsvRecipe]]):
+        """Tags, ingredients, and a first post and trending row if missing."""
+        tag_names = {t for _, r in recipes for t in r.row[2].split()}
+        tags = self.resolve(
+            c,
+            tag_names,
+            "INSERT OR IGNORE INTO Tags (TagName) SELECT value FROM json_each(?)",
+            "SELECT TagName, TagId FROM Tags WHERE TagName IN (SELECT value FROM json_each(?))",
+        )
+        c.execute("INSERT OR IGNORE INTO IngredientTypes (TypeName) VALUES (?)", (DEFAULT_TYPE,))
+        (type_id,) = c.execute(
+            "SELECT TypeId FROM IngredientTypes WHERE TypeName = ?", (DEFAULT_TYPE,)
+        ).fetchone()
+        ingredients = self.resolve(
+            c,
+            {i[0] for _, r in recipes for i in r.ingredients},
+            f"INSERT OR IGNORE INTO Ingredients (IngredientName, TypeId) SELECT value, {type_id} FROM json_each(?)",
+            "SELECT IngredientName, IngredientId FROM Ingredients WHERE IngredientName IN (SELECT value FROM json_each(?))",
+        )
+
+        c.executemany(
+            INSERT_HAS_TAG,
+            ((recipe_id, tags[t]) for recipe_id, r in recipes for t in r.row[2].split()),
+        )
+        c.executemany(
+            INSERT_REQUIRES,
+            (
+                (recipe_id, ingredients[name], float(amount), unit)
+                if amount and unit
+                else (recipe_id, ingredients[name], None, None)
+                for recipe_id, r in recipes
+                for name, amount, unit in r.ingredients
+            ),
+        )
+        c.executemany(
+            INSERT_POST,
+            (
+                (recipe_id, int(r.post[0]), float(r.post[1]), int(r.post[2]))
+                for recipe_id, r in recipes
+                if r.post is not None
+            ),
+        )
+        now = time.time()
+        c.executemany(
+            INSERT_TRENDING,
+            ((recipe_id, float(r.trending[0]), now) for recipe_id, r in recipes if r.trending is not None),
+        )
+
+    def resolve(self, c: sqlite3.Cursor, names: set[str], insert: str, select: str) -> dict[str, int]:
+        """Name -> id for names, adding the ones that don't exist yet."""
+        names = (json.dumps(sorted(names)),)
+        c.execute(insert, names)
+        return dict(c.execute(select, names))
+
+    def delete_unused(self, c: sqlite3.Cursor, tags: set[int], ingredients: set[int]):
+        c.execute(
+            """
+            DELETE FROM Tags
+            WHERE TagId IN (SELECT value FROM json_each(?))
+              AND TagId NOT IN (SELECT TagId FROM HasTag)
+            """,
+            (json.dumps(sorted(tags)),),
+        )
+        c.execute(
+            """
+            DELETE FROM Ingredients
+            WHERE IngredientId IN (SELECT value FROM json_each(?))
+              AND IngredientId NOT IN (SELECT IngredientId FROM Requires)
+            """,
+            (json.dumps(sorted(ingredients)),),
+        )
+
+
+def create_database(path: str) -> sqlite3.Connection:
+    """Opens path with the current schema, migrating it if it is older, in
+    autocommit mode so the importer can manage its own transaction."""
+    db = sqlite3.connect(path, isolation_level=None)
+    migrate.create(db)
+    return db
@@ -0,0 +1,246 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from flask import Flask, Response, current_app, g, has_app_context, request
+
+# Upper bounds of the per-route latency histogram buckets, in milliseconds
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+@dataclass(slots=True)
+class Statement:
+    sql: str
+    seconds: float
+    rows: int
+
+
+@dataclass(slots=True)
+class RequestTiming:
+    """What one request spent its time on, collected while INSTRUMENT is on."""
+
+    start: float
+    connections: int = 0
+    serialize: float = 0.0
+    statements: list[Statement] = field(default_factory=list)
+
+    @property
+    def sql(self) -> float:
+        return sum(s.seconds for s in self.statements)
+
+
+def current_timing() -> RequestTiming | None:
+    """The timing of the request being handled, if it is being instrumented."""
+    return g.get("timing") if has_app_context() else None
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Times every statement and counts the rows it returns or changes.
+
+    A SELECT does most of its work as its rows are read, so the time spent
+    fetching is added to the statement until the rows run out.
+    """
+
+    _statement: Statement | None = None
+
+    def execute(self, sql: str, parameters=()):
+        return self._timed(super().execute, sql, parameters)
+
+    def executemany(self, sql: str, parameters):
+        return self._timed(super().executemany, sql, parameters)
+
+    def _timed(self, execute, sql: str, parameters):
+        timing = current_timing()
+        if timing is None:
+            execute(sql, parameters)
+            return self
+        start = time.perf_counter()
+        execute(sql, parameters)
+        statement = Statement(" ".join(sql.split()), time.perf_counter() - start, max(self.rowcount, 0))
+        timing.statements.append(statement)
+        self._statement = statement if self.description is not None else None
+        return self
+
+    def __next__(self):
+        statement = self._statement
+        if statement is None:
+            return super().__next__()
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._statement = None
+            raise
+        finally:
+            statement.seconds += time.perf_counter() - start
+        statement.rows += 1
+        return row
+
+    def fetchone(self):
+        statement = self._statement
+        if statement is None:
+            return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        statement.seconds += time.perf_counter() - start
+        if row is None:
+            self._statement = None
+        else:
+            statement.rows += 1
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        statement = self._statement
+        if statement is None:
+            return super().fetchmany(size or self.arraysize)
+        start = time.perf_counter()
+        rows = super().fetchmany(size or self.arraysize)
+        statement.seconds += time.perf_counter() - start
+        statement.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        statement = self._statement
+        if statement is None:
+            return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        statement.seconds += time.perf_counter() - start
+        statement.rows += len(rows)
+        self._statement = None
+        return rows
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A connection whose cursors are all InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, parameters):
+        return self.cursor().executemany(sql, parameters)
+
+
+class RouteTimings:
+    """Latency histograms and totals per route, for /api/v1/_debug/metrics."""
+
+    def __init__(self):
+        self._routes: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, route: str, total: float, timing: RequestTiming):
+        ms = total * 1000
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = {
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "sql_ms": 0.0,
+                    "serialize_ms": 0.0,
+                    "statements": 0,
+                    "connections": 0,
+                    "buckets": [0] * (len(BUCKETS_MS) + 1),
+                }
+            stats["count"] += 1
+            stats["total_ms"] += ms
+            stats["max_ms"] = max(stats["max_ms"], ms)
+            stats["sql_ms"] += timing.sql * 1000
+            stats["serialize_ms"] += timing.serialize * 1000
+            stats["statements"] += len(timing.statements)
+            stats["connections"] += timing.connections
+            stats["buckets"][_bucket(ms)] += 1
+
+    def snapshot(self) -> dict:
+        """Per route totals, with cumulative bucket counts like Prometheus."""
+        with self._lock:
+            routes = {route: dict(stats) for route, stats in self._routes.items()}
+        for stats in routes.values():
+            running = 0
+            buckets = {}
+            for bound, count in zip((*BUCKETS_MS, "+Inf"), stats["buckets"]):
+                running += count
+                buckets[str(bound)] = running
+            stats["buckets"] = buckets
+        return routes
+
+
+def _bucket(ms: float) -> int:
+    for i, bound in enumerate(BUCKETS_MS):
+        if ms <= bound:
+            return i
+    return len(BUCKETS_MS)
+
+
+def get_route_timings() -> RouteTimings:
+    timings = current_app.extensions.get("kitchenfire.route_timings")
+    if timings is None:
+        timings = current_app.extensions.setdefault("kitchenfire.route_timings", RouteTimings())
+    return timings
+
+
+def init_app(app: Flask):
+    """
+    Times requests while INSTRUMENT is set. Connections are only wrapped
+    when the pool is created with it set, so with it off the only cost is a
+    config lookup per request.
+    """
+    app.before_request(_start)
+    app.after_request(_finish)
+    # Under the app's logger, so the lines go wherever Flask's own do
+    log = app.logger.getChild("timing")
+    if log.level == logging.NOTSET:
+        log.setLevel(logging.INFO)
+
+
+def _start():
+    if current_app.config.get("INSTRUMENT"):
+        g.timing = RequestTiming(time.perf_counter())
+
+
+def _finish(response: Response) -> Response:
+    timing = g.pop("timing", None)
+    if timing is None:
+        return response
+    total = time.perf_counter() - timing.start
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+
+    response.headers["Server-Timing"] = ", ".join(
+        [
+            f"total;dur={total * 1000:.3f}",
+            f'sql;dur={timing.sql * 1000:.3f};desc="{len(timing.statements)} statements"',
+            f"serialize;dur={timing.serialize * 1000:.3f}",
+            f'connections;desc="{timing.connections} opened"',
+        ]
+    )
+    get_route_timings().record(route, total, timing)
+
+    log = current_app.logger.getChild("timing")
+    if current_app.config.get("INSTRUMENT_LOG", True) and log.isEnabledFor(logging.INFO):
+        log.info(
+            json.dumps(
+                {
+                    "method": request.method,
+                    "route": route,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "ms": round(total * 1000, 3),
+                    "sql_ms": round(timing.sql * 1000, 3),
+                    "serialize_ms": round(timing.serialize * 1000, 3),
+                    "connections": timing.connections,
+                    "statements": [
+                        {"sql": s.sql, "ms": round(s.seconds * 1000, 3), "rows": s.rows}
+                        for s in timing.statements
+                    ],
+                }
+            )
+        )
+    return response
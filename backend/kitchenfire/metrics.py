@@ -0,0 +1,447 @@
+import bisect
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterable
+
+from flask import Flask, Response, current_app, g, request
+
+# Upper bounds of the request latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+# Upper bounds of the writer's batch size histogram buckets, in mutations
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = tuple[str, ...]
+
+
+class _Value:
+    """One labelled counter or gauge. Each has its own lock, so updates to
+    different series never wait on each other."""
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _Buckets:
+    """One labelled histogram series."""
+
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+
+class Metric:
+    """
+    A family of series sharing a name, one per combination of label values.
+    Series are created the first time labels() asks for them.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._series: dict[Labels, object] = {}
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return _Value()
+
+    def labels(self, *values) -> object:
+        key = tuple(map(str, values))
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}, got {key}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new())
+        return series
+
+    def samples(self) -> Iterable[tuple[str, Labels, Labels, float]]:
+        """(suffix, label names, label values, value) for every series."""
+        for key, series in list(self._series.items()):
+            yield "", self.labelnames, key, series.value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self.labels().dec(amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def samples(self):
+        names = (*self.labelnames, "le")
+        for key, series in list(self._series.items()):
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            running = 0
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                running += count
+                yield "_bucket", names, (*key, _format(bound)), running
+            yield "_sum", self.labelnames, key, total
+            yield "_count", self.labelnames, key, running
+
+
+class Collected(Metric):
+    """A family whose series are read from somewhere else when scraped."""
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        labelnames: Iterable[str],
+        collect: Callable[[], dict[Labels, float]],
+    ):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self):
+        for key, value in self.collect().items():
+            yield "", self.labelnames, tuple(str(v) for v in key), value
+
+
+class Registry:
+    """
+    Named metric families, exported in the Prometheus text format.
+
+    Nothing in here needs Flask, so a registry can be filled in and read back
+    without an app.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"{metric.name} is already registered as a different metric")
+        return existing
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._add(Gauge(name, help, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def collected(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        collect: Callable[[], dict[Labels, float]],
+        labelnames: Iterable[str] = (),
+    ) -> Collected:
+        """A counter or gauge family whose values collect() returns, keyed by
+        label values, each time the registry is exported."""
+        return self._add(Collected(name, help, kind, labelnames, collect))
+
+    def __getitem__(self, name: str) -> Metric:
+        return self._metrics[name]
+
+    def value(self, name: str, **labels) -> float | None:
+        """The value of one sample, e.g. value("x_bucket", route="/", le="0.1")."""
+        for metric in list(self._metrics.values()):
+            if not name.startswith(metric.name):
+                continue
+            for suffix, names, values, value in metric.samples():
+                if metric.name + suffix == name and dict(zip(names, values)) == labels:
+                    return value
+        return None
+
+    def expose(self) -> str:
+        lines = []
+        for metric in sorted(list(self._metrics.values()), key=lambda m: m.name):
+            lines.append(f"# HELP {metric.name} {_escape(metric.help, help=True)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, names, values, value in metric.samples():
+                labels = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+                lines.append(
+                    f"{metric.name}{suffix}{{{labels}}} {_format(value)}"
+                    if labels
+                    else f"{metric.name}{suffix} {_format(value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def _escape(text: str, help: bool = False) -> str:
+    text = text.replace("\\", "\\\\").replace("\n", "\\n")
+    return text if help else text.replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if value != value:
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def get_metrics() -> Registry:
+    """The app's registry, with the families init_app's hooks and the
+    /metrics endpoint rely on."""
+    registry = current_app.extensions.get("kitchenfire.metrics")
+    if registry is None:
+        registry = current_app.extensions.setdefault(
+            "kitchenfire.metrics", _app_registry(current_app._get_current_object())
+        )
+    return registry
+
+
+def _app_registry(app: Flask) -> Registry:
+    # Imported here, they all import from this package's db module
+    from .cache import get_cache
+    from .counters import get_counters
+    from .db import get_pool
+    from .writer import get_writer
+
+    def in_app(collect):
+        def wrapper():
+            with app.app_context():
+                return collect()
+
+        return wrapper
+
+    registry = Registry()
+    registry.counter(
+        "kitchenfire_http_requests_total",
+        "Requests handled, by route template and status.",
+        ("method", "route", "status"),
+    )
+    registry.histogram(
+        "kitchenfire_http_request_duration_seconds",
+        "Time from the start of a request to its response, by route template.",
+        ("method", "route"),
+    )
+    registry.counter(
+        "kitchenfire_sqlite_locked_errors_total",
+        'Requests that failed with "database is locked", by route template.',
+        ("route",),
+    )
+
+    def lock_waits(field: str):
+        return in_app(
+            lambda: {(label,): wait[field] for label, wait in get_pool().stats()["lock_waits"].items()}
+        )
+
+    registry.collected(
+        "kitchenfire_sqlite_write_transactions_total",
+        "Write transactions started, by label.",
+        "counter",
+        lock_waits("writes"),
+        ("label",),
+    )
+    registry.collected(
+        "kitchenfire_sqlite_busy_total",
+        "Write transactions that found the write lock taken and had to wait "
+        "while SQLite retried, by label.",
+        "counter",
+        lock_waits("busy"),
+        ("label",),
+    )
+    registry.collected(
+        "kitchenfire_sqlite_busy_timeouts_total",
+        "Write transactions that gave up waiting for the write lock, by label.",
+        "counter",
+        lock_waits("timeouts"),
+        ("label",),
+    )
+    registry.collected(
+        "kitchenfire_sqlite_lock_wait_seconds_total",
+        "Time spent waiting for the write lock, by label.",
+        "counter",
+        lock_waits("seconds"),
+        ("label",),
+    )
+    registry.collected(
+        "kitchenfire_pool_connections_total",
+        "Connections handed out by the pool, by whether an idle one was reused.",
+        "counter",
+        in_app(lambda: {("hit",): get_pool().hits, ("miss",): get_pool().misses}),
+        ("result",),
+    )
+    registry.collected(
+        "kitchenfire_cache_requests_total",
+        "Lookups in the response cache, by result.",
+        "counter",
+        in_app(lambda: {("hit",): get_cache().hits, ("miss",): get_cache().misses}),
+        ("result",),
+    )
+    registry.collected(
+        "kitchenfire_cache_hit_ratio",
+        "Share of response cache lookups that were hits since start.",
+        "gauge",
+        in_app(lambda: {(): _ratio(get_cache().hits, get_cache().misses)}),
+    )
+    registry.collected(
+        "kitchenfire_pool_hit_ratio",
+        "Share of connections handed out that were reused since start.",
+        "gauge",
+        in_app(lambda: {(): _ratio(get_pool().hits, get_pool().misses)}),
+    )
+    registry.collected(
+        "kitchenfire_likes_total",
+        "Like and dislike clicks, by what was clicked. Take its rate for likes per second.",
+        "counter",
+        in_app(lambda: get_counters().clicks_snapshot()),
+        ("target", "direction"),
+    )
+    registry.collected(
+        "kitchenfire_counter_pending",
+        "Clicks waiting to be written by the next counter flush.",
+        "gauge",
+        in_app(lambda: {(): get_counters().pending}),
+    )
+    registry.collected(
+        "kitchenfire_counter_flushes_total",
+        "Counter flushes, by whether they were written or put back to retry.",
+        "counter",
+        in_app(lambda: {("ok",): get_counters().flushes, ("retried",): get_counters().retries}),
+        ("result",),
+    )
+    registry.histogram(
+        "kitchenfire_writer_batch_size",
+        "Mutations the writer committed together, per transaction.",
+        buckets=BATCH_BUCKETS,
+    )
+    registry.collected(
+        "kitchenfire_writer_queue_depth",
+        "Mutations waiting for the writer's next transaction.",
+        "gauge",
+        in_app(lambda: {(): get_writer().depth}),
+    )
+    registry.collected(
+        "kitchenfire_writer_mutations_total",
+        "Mutations run by the writer, by whether they committed or failed.",
+        "counter",
+        in_app(lambda: {("ok",): get_writer().committed, ("failed",): get_writer().failed}),
+        ("result",),
+    )
+    return registry
+
+
+def _ratio(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def init_app(app: Flask):
+    """Counts and times every request while METRICS is on (the default), and
+    serves the registry at /metrics, which Caddy doesn't proxy."""
+    app.before_request(_start)
+    app.after_request(_finish)
+    app.teardown_request(_failed)
+    app.add_url_rule("/metrics", "metrics", _expose)
+
+
+def _route() -> str:
+    return request.url_rule.rule if request.url_rule else "<unmatched>"
+
+
+def _start():
+    if current_app.config.get("METRICS", True):
+        g.metrics_start = time.perf_counter()
+
+
+def _finish(response: Response) -> Response:
+    start = g.pop("metrics_start", None)
+    if start is not None:
+        registry = get_metrics()
+        route = _route()
+        registry["kitchenfire_http_requests_total"].labels(
+            request.method, route, response.status_code
+        ).inc()
+        registry["kitchenfire_http_request_duration_seconds"].labels(request.method, route).observe(
+            time.perf_counter() - start
+        )
+    return response
+
+
+def _failed(exception: BaseException | None):
+    if (
+        isinstance(exception, sqlite3.OperationalError)
+        and "locked" in str(exception)
+        and current_app.config.get("METRICS", True)
+    ):
+        get_metrics()["kitchenfire_sqlite_locked_errors_total"].labels(_route()).inc()
+
+
+def _expose():
+    return Response(get_metrics().expose(), content_type=CONTENT_TYPE)
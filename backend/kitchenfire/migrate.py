@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import time
+from typing import Callable, NamedTuple
+
+from . import ratings
+
+SCHEMA = os.path.join(os.path.dirname(__file__), "..", "migrations", "schema.sql")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    apply: Callable[[sqlite3.Cursor], object]
+
+
+def _statements(*sql: str) -> Callable[[sqlite3.Cursor], None]:
+    # executescript would commit, and a migration has to stay one transaction
+    def apply(c: sqlite3.Cursor):
+        for statement in sql:
+            c.execute(statement)
+
+    return apply
+
+
+def _trending_score_times(c: sqlite3.Cursor):
+    columns = {row[1] for row in c.execute("PRAGMA table_info(Trending)")}
+    if "ScoredAt" not in columns:
+        c.execute("ALTER TABLE Trending ADD COLUMN ScoredAt DOUBLE")
+    # Scores so far were never decayed, so they are taken as of now
+    c.execute("UPDATE Trending SET ScoredAt = ? WHERE ScoredAt IS NULL", (time.time(),))
+
+
+# A database's PRAGMA user_version is the last of these it has had. Each
+# one must also hold for a database that already has the change, because
+# databases made from schema.sql before these existed start at 0. A new
+# step goes at the end, and schema.sql gets the same change so new
+# databases start out with it.
+MIGRATIONS = (
+    Migration(1, "running rating totals on Posts", ratings.backfill),
+    Migration(
+        2,
+        "comment page indexes",
+        _statements(
+            "CREATE INDEX IF NOT EXISTS CommentsByPost ON Comments (PostId, CommentId)",
+            "CREATE INDEX IF NOT EXISTS CommentsByLikes ON Comments (PostId, NumberOfLikes, CommentId)",
+        ),
+    ),
+    Migration(
+        3,
+        "tag and ingredient reverse lookups",
+        _statements(
+            "CREATE INDEX IF NOT EXISTS HasTagByTag ON HasTag (TagId, RecipeId)",
+            "CREATE INDEX IF NOT EXISTS RequiresByIngredient ON Requires (IngredientId, RecipeId)",
+            "ANALYZE",
+        ),
+    ),
+    Migration(4, "trending score timestamps", _trending_score_times),
+)
+
+LATEST = MIGRATIONS[-1].version
+
+
+def version(db: sqlite3.Connection) -> int:
+    return db.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db: sqlite3.Connection) -> list[Migration]:
+    """
+    Applies the migrations db hasn't had yet, each in its own transaction
+    along with the bump of user_version, and returns them. Safe to run from
+    several processes at once: the version is checked again once the write
+    lock is held. An empty database is left alone, create() is for those.
+    """
+    if _empty(db):
+        return []
+    applied = []
+    for migration in MIGRATIONS:
+        if version(db) >= migration.version:
+            continue
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if version(db) < migration.version:
+                migration.apply(db.cursor())
+                db.execute(f"PRAGMA user_version = {migration.version}")
+                applied.append(migration)
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+    return applied
+
+
+def create(db: sqlite3.Connection) -> list[Migration]:
+    """
+    Brings db up to the current schema, whether it is empty or was made by
+    an older version of it. Returns the migrations that had to be applied.
+    """
+    empty = _empty(db)
+    applied = migrate(db)
+    with open(SCHEMA) as schema:
+        db.executescript(schema.read())
+    if empty:
+        db.execute(f"PRAGMA user_version = {LATEST}")
+    return applied
+
+
+def _empty(db: sqlite3.Connection) -> bool:
+    return db.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0
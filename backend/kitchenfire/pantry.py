@@ -0,0 +1,113 @@
+import heapq
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from itertools import chain, islice
+from typing import Iterable
+
+from flask import current_app
+
+from .db import get_db
+
+
+class PantryMatcher:
+    """
+    Finds the recipes you are closest to being able to cook with what's in
+    your pantry, from an in-memory copy of Requires.
+
+    Only recipes that use something in the pantry are scored one by one; the
+    rest are missing all of their ingredients, so they are taken from a list
+    bucketed by ingredient count only while they could still make the top k.
+    """
+
+    def __init__(self):
+        self.requires: dict[int, tuple[int, ...]] = {}
+        self.by_ingredient: dict[int, array] = {}
+        self.by_size: dict[int, list[int]] = {}
+        self._lock = threading.Lock()
+
+    def load(self, c: sqlite3.Cursor):
+        # Both reads stop at the same recipe, so one saved between them
+        # can't show up in Requires without being in Recipes
+        (upto,) = c.execute("SELECT MAX(RecipeId) FROM Recipes").fetchone()
+        requires: dict[int, list[int]] = {
+            r: []
+            for (r,) in c.execute("SELECT RecipeId FROM Recipes WHERE RecipeId <= ?", (upto,))
+        }
+        by_ingredient: dict[int, array] = {}
+        for recipe_id, ingredient_id in c.execute(
+            "SELECT RecipeId, IngredientId FROM Requires WHERE RecipeId <= ? ORDER BY RecipeId",
+            (upto,),
+        ):
+            requires[recipe_id].append(ingredient_id)
+            by_ingredient.setdefault(ingredient_id, array("q")).append(recipe_id)
+
+        by_size: dict[int, list[int]] = {}
+        for recipe_id, ingredients in requires.items():
+            by_size.setdefault(len(ingredients), []).append(recipe_id)
+
+        with self._lock:
+            self.requires = {r: tuple(i) for r, i in requires.items()}
+            self.by_ingredient = by_ingredient
+            self.by_size = by_size
+
+    def add(self, recipe_id: int, ingredient_ids: Iterable[int]):
+        """Starts matching a new recipe, unless load() already picked it up."""
+        ingredient_ids = tuple(ingredient_ids)
+        with self._lock:
+            if recipe_id in self.requires:
+                return
+            self.requires[recipe_id] = ingredient_ids
+            for i in ingredient_ids:
+                self.by_ingredient.setdefault(i, array("q")).append(recipe_id)
+            self.by_size.setdefault(len(ingredient_ids), []).append(recipe_id)
+
+    def match(
+        self, pantry: Iterable[int], k: int = 20, max_missing: int | None = None
+    ) -> list[tuple[int, list[int]]]:
+        """
+        Up to k (RecipeId, missing IngredientIds) pairs, fewest missing first,
+        then most ingredients already in the pantry, then RecipeId.
+        """
+        if k <= 0:
+            return []
+        pantry = set(pantry)
+
+        have = Counter(chain.from_iterable(self.by_ingredient.get(i, ()) for i in pantry))
+
+        requires = self.requires
+        # (missing, -have, RecipeId), so the smallest is the best match
+        best = heapq.nsmallest(
+            k,
+            (
+                (len(requires[r]) - n, -n, r)
+                for r, n in have.items()
+                if max_missing is None or len(requires[r]) - n <= max_missing
+            ),
+        )
+
+        # Recipes using nothing in the pantry are missing everything, so they
+        # only get in while they have fewer ingredients than the worst match.
+        # Buckets are in RecipeId order, so the first k of one are enough.
+        for size in sorted(self.by_size):
+            if max_missing is not None and size > max_missing:
+                break
+            if len(best) == k and size >= best[-1][0]:
+                break
+            unmatched = (r for r in self.by_size[size] if r not in have)
+            best.extend((size, 0, r) for r in islice(unmatched, k))
+            best = heapq.nsmallest(k, best)
+
+        return [(r, [i for i in requires[r] if i not in pantry]) for _, _, r in best]
+
+
+def get_pantry() -> PantryMatcher:
+    """The app's pantry matcher, loaded from Requires on first use."""
+    matcher = current_app.extensions.get("kitchenfire.pantry")
+    if matcher is None:
+        matcher = PantryMatcher()
+        with get_db() as db:
+            matcher.load(db.cursor())
+        matcher = current_app.extensions.setdefault("kitchenfire.pantry", matcher)
+    return matcher
@@ -3,27 +3,41 @@ from .recipe import Recipe
 import json
 
 
-@dataclass
+# Not frozen: reads add unflushed likes to number_of_likes
+@dataclass(slots=True)
 class Post:
     recipe: Recipe
     number_of_likes: int
     rating: float
     reviews: int
 
-    def to_json(self) -> str:
-        out = {
+    def to_dict(self, legacy: bool = False) -> dict:
+        """
+        The post as the frontend expects it. With legacy, tags and
+        ingredients are JSON strings inside the lists, as to_json used to
+        send them.
+        """
+        if legacy:
+            tags = [t.to_json() for t in self.recipe.tags]
+            ingredients = [i.to_json() for i in self.recipe.ingredients]
+        else:
+            tags = [t.to_dict() for t in self.recipe.tags]
+            ingredients = [i.to_dict() for i in self.recipe.ingredients]
+
+        return {
             "id": self.recipe.recipe_id,
             "name": self.recipe.name,
             "image": self.recipe.photo_url,
             "rank": self.number_of_likes,
             "rating": self.rating,
             "reviews": self.reviews,
-            "tags": [ t.to_json() for t in self.recipe.tags ],
-            "ingredients": [i.to_json() for i in self.recipe.ingredients],
+            "tags": tags,
+            "ingredients": ingredients,
             "instructions": self.recipe.instructions,
             "isFavorited": not not self.recipe.recipe_id % 2,  # TODO: Favourites?
             "likes": self.number_of_likes,
             "comments": self.reviews,
         }
 
-        return json.dumps(out)
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(legacy=True))
@@ -0,0 +1,168 @@
+import json
+from typing import Iterable
+
+# Name -> SQL for every statement the API runs while serving requests. Each
+# is fixed text with its values bound as parameters, and lists of ids bound
+# as one json array, so a connection prepares each of them once and takes
+# it from the sqlite3 statement cache from then on. Formatting values into
+# the SQL instead makes new text every time, which misses the cache and
+# evicts the statements that would have hit it.
+STATEMENTS: dict[str, str] = {}
+
+# Statement cache room for the ones run outside the registry: BEGIN, PRAGMAs
+# and the one-off loads when the app starts
+CACHE_HEADROOM = 32
+
+
+def statement(name: str, sql: str) -> str:
+    """Registers sql under name and returns it, for a module-level constant."""
+    if STATEMENTS.setdefault(name, sql) != sql:
+        raise ValueError(f"Statement {name!r} is already registered with different SQL")
+    return sql
+
+
+def cache_size() -> int:
+    """A statement cache size that holds every registered statement at once."""
+    return len(STATEMENTS) + CACHE_HEADROOM
+
+
+def id_list(ids: Iterable[int]) -> str:
+    """ids as the json array the json_each(?) statements take."""
+    return json.dumps([int(i) for i in ids])
+
+
+ALL_TAGS_QUERY = statement("tags.all", "SELECT TagId, TagName FROM Tags")
+
+TAGS_BY_ID_QUERY = statement(
+    "tags.by_id",
+    """
+    SELECT TagId, TagName
+    FROM Tags
+    WHERE TagId IN (SELECT value FROM json_each(?));
+    """,
+)
+
+ALL_INGREDIENTS_QUERY = statement(
+    "ingredients.all", "SELECT IngredientId, IngredientName FROM Ingredients"
+)
+
+INGREDIENTS_BY_ID_QUERY = statement(
+    "ingredients.by_id",
+    """
+    SELECT IngredientId, IngredientName
+    FROM Ingredients
+    WHERE IngredientId IN (SELECT value FROM json_each(?));
+    """,
+)
+
+# The filters take the excluded ids and then the included ones. The _ALL
+# forms are for when nothing is included, and start from every recipe.
+FILTER_BY_INGREDIENT_QUERY = statement(
+    "filter.ingredient",
+    """
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN Requires
+    WHERE IngredientId IN (SELECT value FROM json_each(?2))
+        EXCEPT
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN Requires
+    WHERE IngredientId IN (SELECT value FROM json_each(?1));
+    """,
+)
+
+FILTER_ALL_BY_INGREDIENT_QUERY = statement(
+    "filter.ingredient_exclude_only",
+    """
+    SELECT RecipeId, RecipeName
+    FROM Recipes
+        EXCEPT
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN Requires
+    WHERE IngredientId IN (SELECT value FROM json_each(?1));
+    """,
+)
+
+FILTER_BY_TAG_QUERY = statement(
+    "filter.tag",
+    """
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN HasTag
+    WHERE TagId IN (SELECT value FROM json_each(?2))
+        EXCEPT
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN HasTag
+    WHERE TagId IN (SELECT value FROM json_each(?1));
+    """,
+)
+
+FILTER_ALL_BY_TAG_QUERY = statement(
+    "filter.tag_exclude_only",
+    """
+    SELECT RecipeId, RecipeName
+    FROM Recipes
+        EXCEPT
+    SELECT RecipeId, RecipeName
+    FROM Recipes NATURAL JOIN HasTag
+    WHERE TagId IN (SELECT value FROM json_each(?1));
+    """,
+)
+
+# Saving a recipe. Tag and ingredient names come in as json arrays, in place
+# of the temporary tables this used to fill: creating and dropping those
+# changed the schema, which throws away every prepared statement on the
+# connection.
+INSERT_TAGS_QUERY = statement(
+    "save.insert_tags", "INSERT OR IGNORE INTO Tags (TagName) SELECT value FROM json_each(?);"
+)
+
+TAG_IDS_QUERY = statement(
+    "save.tag_ids", "SELECT TagId FROM Tags WHERE TagName IN (SELECT value FROM json_each(?));"
+)
+
+INSERT_INGREDIENTS_QUERY = statement(
+    "save.insert_ingredients",
+    "INSERT OR IGNORE INTO Ingredients (IngredientName, TypeId) SELECT value, ? FROM json_each(?);",
+)
+
+INGREDIENT_IDS_QUERY = statement(
+    "save.ingredient_ids",
+    """
+    SELECT IngredientName, IngredientId
+    FROM Ingredients
+    WHERE IngredientName IN (SELECT value FROM json_each(?));
+    """,
+)
+
+NAME_TAKEN_QUERY = statement(
+    "save.name_taken", "SELECT COUNT(*) FROM Recipes WHERE RecipeName = ?;"
+)
+
+INSERT_RECIPE_QUERY = statement(
+    "save.insert_recipe",
+    """
+    INSERT INTO Recipes (RecipeName, Description, Instructions, CookTime, Difficulty, PhotoURL)
+    VALUES (?, ?, ?, ?, ?, ?);
+    """,
+)
+
+INSERT_HAS_TAG_QUERY = statement("save.insert_has_tag", "INSERT INTO HasTag VALUES (?, ?);")
+
+INSERT_REQUIRES_QUERY = statement("save.insert_requires", "INSERT INTO Requires VALUES (?, ?, ?, ?);")
+
+INSERT_POST_QUERY = statement(
+    "save.insert_post",
+    "INSERT INTO Posts (RecipeId, NumberOfLikes, Rating, Reviews) VALUES (?, 0, 0, 0);",
+)
+
+INSERT_TRENDING_QUERY = statement(
+    "save.insert_trending",
+    "INSERT INTO Trending (RecipeId, NumberOfRecentLikes) VALUES (?, 0);",
+)
+
+INSERT_COMMENT_QUERY = statement(
+    "comments.insert",
+    """
+    INSERT INTO Comments (PostId, Author, Body, Rating)
+    VALUES (?, ?, ?, ?);
+    """,
+)
@@ -0,0 +1,69 @@
+import sqlite3
+
+from .queries import statement
+
+# Posts keeps the sum and count of its ratings, so a new review is one row
+# update however many comments the post has. The right hand sides see the
+# row as it was before the update.
+ADD_REVIEW_QUERY = statement(
+    "ratings.add_review",
+    """
+    UPDATE Posts
+    SET RatingSum = RatingSum + ?1,
+        Reviews = Reviews + 1,
+        Rating = (RatingSum + ?1) / (Reviews + 1)
+    WHERE RecipeId = ?2
+    RETURNING Rating, Reviews;
+    """,
+)
+
+POST_RATING_QUERY = statement(
+    "ratings.post", "SELECT Rating, Reviews FROM Posts WHERE RecipeId = ?;"
+)
+
+ADD_COLUMN_QUERY = "ALTER TABLE Posts ADD COLUMN RatingSum DOUBLE NOT NULL DEFAULT 0.0;"
+
+# Imported posts only come with an average and a count
+SEED_QUERY = "UPDATE Posts SET RatingSum = Rating * Reviews;"
+
+# Posts with rated comments get their totals from them, which is what
+# rating a post by commenting on it always meant
+FROM_COMMENTS_QUERY = """
+    UPDATE Posts
+    SET RatingSum = Rated.Total, Reviews = Rated.Count, Rating = Rated.Total / Rated.Count
+    FROM (
+        SELECT PostId, total(Rating) AS Total, count(Rating) AS Count
+        FROM Comments
+        WHERE Rating IS NOT NULL
+        GROUP BY PostId
+    ) AS Rated
+    WHERE Posts.RecipeId = Rated.PostId;
+    """
+
+
+def add_review(c: sqlite3.Cursor, post_id: int, rating: int | None) -> tuple[float, int] | None:
+    """
+    Folds rating into the post's totals and returns its (rating, reviews),
+    or None if there is no such post. Run it in the transaction that
+    inserts the comment, so the two can't disagree.
+    """
+    if rating is None:
+        return c.execute(POST_RATING_QUERY, (post_id,)).fetchone()
+    return c.execute(ADD_REVIEW_QUERY, (rating, post_id)).fetchone()
+
+
+def has_running_totals(c: sqlite3.Cursor) -> bool:
+    return any(column[1] == "RatingSum" for column in c.execute("PRAGMA table_info(Posts)"))
+
+
+def backfill(c: sqlite3.Cursor) -> int:
+    """
+    Adds Posts.RatingSum if the database was made before it existed, and
+    works out RatingSum, Reviews and Rating for every post again. Run it in
+    a transaction. Returns the number of posts whose totals came from their
+    comments.
+    """
+    if not has_running_totals(c):
+        c.execute(ADD_COLUMN_QUERY)
+    c.execute(SEED_QUERY)
+    return c.execute(FROM_COMMENTS_QUERY).rowcount
@@ -4,7 +4,7 @@ from dataclasses import dataclass
 from kitchenfire.tag import Tag
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Recipe:
     recipe_id: int
     name: str
@@ -15,3 +15,13 @@ class Recipe:
     photo_url: str
     ingredients: List[Ingredient]
     tags: List[Tag]
+
+    @classmethod
+    def from_row(
+        cls, row: tuple, ingredients: List[Ingredient], tags: List[Tag]
+    ) -> "Recipe":
+        """
+        From a (RecipeId, RecipeName, Description, Instructions, CookTime,
+        Difficulty, PhotoURL) row.
+        """
+        return cls(*row, ingredients, tags)
@@ -0,0 +1,200 @@
+import sqlite3
+import threading
+from typing import Iterable
+
+from flask import current_app
+
+from .db import get_db
+
+
+def to_bits(ids: Iterable[int]) -> int:
+    """A bitset (as a python int) with the bit for every id set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    buf = bytearray((max(ids) >> 3) + 1)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def from_bits(bits: int) -> list[int]:
+    """The ids set in bits, ascending."""
+    ids = []
+    digits = bin(bits)[:1:-1]
+    i = digits.find("1")
+    while i != -1:
+        ids.append(i)
+        i = digits.find("1", i + 1)
+    return ids
+
+
+class RecipeIndex:
+    """
+    IngredientId -> RecipeIds and TagId -> RecipeIds (and CookTime and
+    Difficulty -> RecipeIds), kept in memory as bitsets so the filter and
+    search endpoints are a few big-int ANDs and ORs instead of a join per
+    request. Those run under the lock, as add() inserts into the dicts in
+    place; turning the result back into ids doesn't need it.
+    """
+
+    def __init__(self):
+        self.names: dict[int, str] = {}
+        self.recipes = 0
+        self.by_ingredient: dict[int, int] = {}
+        self.by_tag: dict[int, int] = {}
+        self.by_cook_time: dict[int, int] = {}
+        self.by_difficulty: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def load(self, c: sqlite3.Cursor):
+        rows = c.execute(
+            "SELECT RecipeId, RecipeName, CookTime, Difficulty FROM Recipes"
+        ).fetchall()
+        names = {r[0]: r[1] for r in rows}
+        by_cook_time = _postings((r[2], r[0]) for r in rows)
+        by_difficulty = _postings((r[3], r[0]) for r in rows)
+        by_ingredient = _postings(c.execute("SELECT IngredientId, RecipeId FROM Requires"))
+        by_tag = _postings(c.execute("SELECT TagId, RecipeId FROM HasTag"))
+
+        with self._lock:
+            self.names = names
+            self.recipes = to_bits(names)
+            self.by_ingredient = by_ingredient
+            self.by_tag = by_tag
+            self.by_cook_time = by_cook_time
+            self.by_difficulty = by_difficulty
+
+    def add(
+        self,
+        recipe_id: int,
+        name: str,
+        cook_time: int,
+        difficulty: int,
+        ingredient_ids: Iterable[int],
+        tag_ids: Iterable[int],
+    ):
+        bit = 1 << recipe_id
+        with self._lock:
+            self.names[recipe_id] = name
+            self.recipes |= bit
+            self.by_cook_time[cook_time] = self.by_cook_time.get(cook_time, 0) | bit
+            self.by_difficulty[difficulty] = self.by_difficulty.get(difficulty, 0) | bit
+            for i in ingredient_ids:
+                self.by_ingredient[i] = self.by_ingredient.get(i, 0) | bit
+            for t in tag_ids:
+                self.by_tag[t] = self.by_tag.get(t, 0) | bit
+
+    def filter_ingredients(
+        self, exclude: Iterable[int], include: Iterable[int] | None = None
+    ) -> list[tuple[int, str]]:
+        return self._filter("by_ingredient", exclude, include)
+
+    def filter_tags(
+        self, exclude: Iterable[int], include: Iterable[int] | None = None
+    ) -> list[tuple[int, str]]:
+        return self._filter("by_tag", exclude, include)
+
+    def _filter(
+        self,
+        field: str,
+        exclude: Iterable[int],
+        include: Iterable[int] | None,
+    ) -> list[tuple[int, str]]:
+        """
+        Recipes with any of include (every recipe if include is None) and
+        none of exclude in the postings named field, as (RecipeId,
+        RecipeName) ordered by RecipeId.
+        """
+        with self._lock:
+            postings: dict[int, int] = getattr(self, field)
+            if include is None:
+                matches = self.recipes
+            else:
+                matches = 0
+                for i in include:
+                    matches |= postings.get(i, 0)
+
+            for i in exclude:
+                matches &= ~postings.get(i, 0)
+            names = self.names
+
+        return [(r, names[r]) for r in from_bits(matches)]
+
+    def search(
+        self,
+        include_ingredients: Iterable[int] = (),
+        exclude_ingredients: Iterable[int] = (),
+        include_tags: Iterable[int] = (),
+        exclude_tags: Iterable[int] = (),
+        max_cook_time: int | None = None,
+        min_difficulty: int = 1,
+        max_difficulty: int = 5,
+        match_all: bool = True,
+    ) -> dict[int, int]:
+        """
+        Recipes matching every facet, each with how many of the included
+        ingredients and tags it has.
+
+        With match_all a recipe needs all of the included ingredients and
+        all of the included tags, otherwise at least one of each. Either
+        way it needs none of the excluded ones.
+        """
+        with self._lock:
+            include_ingredients = [self.by_ingredient.get(i, 0) for i in include_ingredients]
+            include_tags = [self.by_tag.get(t, 0) for t in include_tags]
+
+            matches = self.recipes
+            for included in (include_ingredients, include_tags):
+                if not included:
+                    continue
+                if match_all:
+                    for postings in included:
+                        matches &= postings
+                else:
+                    either = 0
+                    for postings in included:
+                        either |= postings
+                    matches &= either
+
+            for i in exclude_ingredients:
+                matches &= ~self.by_ingredient.get(i, 0)
+            for t in exclude_tags:
+                matches &= ~self.by_tag.get(t, 0)
+
+            if max_cook_time is not None:
+                quick = 0
+                for cook_time, postings in self.by_cook_time.items():
+                    if cook_time <= max_cook_time:
+                        quick |= postings
+                matches &= quick
+
+            difficulty = 0
+            for level, postings in self.by_difficulty.items():
+                if min_difficulty <= level <= max_difficulty:
+                    difficulty |= postings
+            matches &= difficulty
+
+        coverage = dict.fromkeys(from_bits(matches), 0)
+        for postings in include_ingredients + include_tags:
+            for r in from_bits(postings & matches):
+                coverage[r] += 1
+        return coverage
+
+
+def _postings(rows: Iterable[tuple[int, int]]) -> dict[int, int]:
+    ids: dict[int, list[int]] = {}
+    for key, recipe_id in rows:
+        ids.setdefault(key, []).append(recipe_id)
+    return {key: to_bits(recipe_ids) for key, recipe_ids in ids.items()}
+
+
+def get_recipe_index() -> RecipeIndex:
+    """The app's recipe index, loaded from the database on first use."""
+    index = current_app.extensions.get("kitchenfire.recipe_index")
+    if index is None:
+        index = RecipeIndex()
+        with get_db() as db:
+            index.load(db.cursor())
+        index = current_app.extensions.setdefault("kitchenfire.recipe_index", index)
+    return index
@@ -0,0 +1,71 @@
+import json
+import time
+from typing import Any, Iterator
+
+from flask import Response, current_app
+
+from .Ingredient import Ingredient
+from .instrument import current_timing
+from .post import Post
+from .tag import Tag
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the stdlib encoder works too
+    orjson = None
+
+
+def _encoder(legacy: bool):
+    def default(o: Any):
+        if isinstance(o, Post):
+            return o.to_dict(legacy)
+        if isinstance(o, (Tag, Ingredient)):
+            return o.to_dict()
+        raise TypeError(f"Can't serialize {type(o).__name__}")
+
+    return default
+
+
+def dumps(obj: Any, legacy: bool = False) -> bytes:
+    """
+    Encodes obj in one pass, turning any Post, Tag or Ingredient in it into
+    plain dicts along the way. Uses orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(
+            obj, default=_encoder(legacy), option=orjson.OPT_PASSTHROUGH_DATACLASS
+        )
+    return json.dumps(obj, default=_encoder(legacy)).encode()
+
+
+def _stream(items: list, legacy: bool, chunk: int) -> Iterator[bytes]:
+    yield b"["
+    for start in range(0, len(items), chunk):
+        encoded = dumps(items[start : start + chunk], legacy)
+        # Strip the brackets so the chunks join into one array
+        yield (b"," if start else b"") + encoded[1:-1]
+    yield b"]"
+
+
+def json_response(obj: Any, status: int = 200) -> Response:
+    """
+    A JSON response for obj. Lists longer than STREAM_THRESHOLD are sent in
+    chunks as they are encoded instead of all at once.
+
+    With LEGACY_JSON set, posts keep their tags and ingredients as JSON
+    strings for clients that still parse them that way.
+    """
+    config = current_app.config
+    legacy = config.get("LEGACY_JSON", False)
+    threshold = config.get("STREAM_THRESHOLD", 500)
+
+    if isinstance(obj, list) and len(obj) > threshold:
+        # Encoded after the response has left the view, so not timed
+        body = _stream(obj, legacy, threshold)
+    elif (timing := current_timing()) is not None:
+        start = time.perf_counter()
+        body = dumps(obj, legacy)
+        timing.serialize += time.perf_counter() - start
+    else:
+        body = dumps(obj, legacy)
+    return Response(body, status=status, content_type="application/json")
@@ -1,12 +1,20 @@
 from dataclasses import dataclass
+from sys import intern
 import json
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Tag:
     tag_id: int
     name: str
 
-    def to_json(self) -> str:
-        return json.dumps({"id": self.tag_id, "name": self.name})
+    @classmethod
+    def from_row(cls, row: tuple[int, str]) -> "Tag":
+        """From a (TagId, TagName) row, sharing the name string between copies."""
+        return cls(row[0], intern(row[1]))
+
+    def to_dict(self) -> dict:
+        return {"id": self.tag_id, "name": self.name}
 
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
@@ -0,0 +1,127 @@
+import html
+import json
+import re
+import sqlite3
+
+from flask import current_app
+
+from .queries import statement
+from .writer import mutate
+
+CREATE_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS RecipeSearch USING fts5(
+        RecipeName, Description, Instructions, Tags, Ingredients,
+        tokenize = 'porter unicode61',
+        prefix = '2 3'
+    );
+    """
+
+# RecipeSearch rowids are RecipeIds
+DOCUMENTS_QUERY = """
+    SELECT RecipeId, RecipeName, Description, Instructions,
+        (SELECT group_concat(TagName, ' ')
+         FROM HasTag JOIN Tags USING (TagId)
+         WHERE HasTag.RecipeId = Recipes.RecipeId),
+        (SELECT group_concat(IngredientName, ' ')
+         FROM Requires JOIN Ingredients USING (IngredientId)
+         WHERE Requires.RecipeId = Recipes.RecipeId)
+    FROM Recipes
+    """
+
+INSERT_QUERY = """
+    INSERT INTO RecipeSearch (rowid, RecipeName, Description, Instructions, Tags, Ingredients)
+    """
+
+# Snippets come back with the matches between these, so the text can be
+# escaped before they become <mark> tags
+MARK_START, MARK_END = "\x02", "\x03"
+
+# Name matches count the most, then tags and ingredients, then the rest
+SEARCH_QUERY = statement(
+    "search.text",
+    """
+    SELECT rowid,
+        snippet(RecipeSearch, -1, char(2), char(3), '…', 12)
+    FROM RecipeSearch
+    WHERE RecipeSearch MATCH ?
+    ORDER BY bm25(RecipeSearch, 10.0, 2.0, 1.0, 4.0, 4.0)
+    LIMIT ? OFFSET ?;
+    """,
+)
+
+
+# Keeping one saved recipe's row up to date
+UNINDEX_QUERY = statement("search.unindex", "DELETE FROM RecipeSearch WHERE rowid = ?;")
+
+INDEX_QUERY = statement("search.index", INSERT_QUERY + DOCUMENTS_QUERY + "WHERE RecipeId = ?;")
+
+
+def ensure_table():
+    """
+    Creates RecipeSearch if it is missing and fills it if it is out of step
+    with Recipes, through the writer. Only checks once per app.
+    """
+    if current_app.extensions.get("kitchenfire.text_search"):
+        return
+    mutate(_ensure_table)
+    current_app.extensions["kitchenfire.text_search"] = True
+
+
+def _ensure_table(c: sqlite3.Cursor):
+    c.execute(CREATE_TABLE)
+    (indexed,) = c.execute("SELECT count(*) FROM RecipeSearch").fetchone()
+    (recipes,) = c.execute("SELECT count(*) FROM Recipes").fetchone()
+    if indexed != recipes:
+        rebuild(c)
+
+
+def rebuild(c: sqlite3.Cursor):
+    c.execute("DELETE FROM RecipeSearch")
+    c.execute(INSERT_QUERY + DOCUMENTS_QUERY)
+
+
+def index_recipe(c: sqlite3.Cursor, recipe_id: int):
+    c.execute(UNINDEX_QUERY, (recipe_id,))
+    c.execute(INDEX_QUERY, (recipe_id,))
+
+
+def index_recipes(c: sqlite3.Cursor, recipe_ids: list[int]):
+    """index_recipe for many recipes, in one statement each way."""
+    ids = (json.dumps(recipe_ids),)
+    c.execute("DELETE FROM RecipeSearch WHERE rowid IN (SELECT value FROM json_each(?))", ids)
+    c.execute(
+        INSERT_QUERY + DOCUMENTS_QUERY + "WHERE RecipeId IN (SELECT value FROM json_each(?))", ids
+    )
+
+
+def to_match(text: str) -> str:
+    """
+    Turns what the user typed into an FTS5 query: every word has to appear,
+    and the words are matched as prefixes so "butt chick" finds butter chicken.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+
+def search(
+    c: sqlite3.Cursor, text: str, offset: int = 0, count: int = 20
+) -> list[tuple[int, str]]:
+    """
+    (RecipeId, highlighted snippet) pairs, best match first. Snippets are
+    HTML, with the recipe text escaped and the matches in <mark></mark>.
+    """
+    query = to_match(text)
+    if not query:
+        return []
+    return [
+        (recipe_id, highlight(snippet))
+        for recipe_id, snippet in c.execute(SEARCH_QUERY, (query, count, offset))
+    ]
+
+
+def highlight(snippet: str) -> str:
+    """A snippet from SEARCH_QUERY as HTML."""
+    return (
+        html.escape(snippet)
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
@@ -0,0 +1,209 @@
+import base64
+import math
+import sqlite3
+import struct
+import threading
+import time
+from typing import Callable, Iterable
+
+from flask import current_app
+from sortedcontainers import SortedList
+
+from .db import get_db
+from .queries import id_list, statement
+
+HALF_LIFE = 6 * 60 * 60
+
+SCORES_QUERY = statement(
+    "trending.scores",
+    """
+    SELECT RecipeId, NumberOfRecentLikes, ScoredAt
+    FROM Trending
+    WHERE RecipeId IN (SELECT value FROM json_each(?));
+    """,
+)
+
+SAVE_SCORE_QUERY = statement(
+    "trending.save_score",
+    """
+    UPDATE Trending
+    SET NumberOfRecentLikes = ?, ScoredAt = ?
+    WHERE RecipeId = ?;
+    """,
+)
+
+
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without leaving log space."""
+    high, low = max(a, b), min(a, b)
+    if low == -math.inf:
+        return high
+    return high + math.log1p(math.exp(low - high))
+
+
+def _log_sub(a: float, b: float) -> float:
+    """log(exp(a) - exp(b)), clamped to log(0) when b >= a."""
+    if b >= a:
+        return -math.inf
+    return a + math.log1p(-math.exp(b - a))
+
+
+class TrendingEngine:
+    """
+    Ranks recipes by an exponentially decayed like score, kept in memory so
+    feed pages don't have to sort the Trending table.
+
+    Scores are stored as log(score) plus the decay accumulated since the Unix
+    epoch (forward decay). Decay then moves every score by the same
+    amount, so the order never changes by itself and a like only has to move
+    one recipe, out of the sorted ranking and back in, in O(log n).
+
+    Each process keeps its own ranking, seeded when it starts from
+    Trending.NumberOfRecentLikes decayed from Trending.ScoredAt to now.
+    """
+
+    def __init__(
+        self,
+        half_life: float = HALF_LIFE,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.decay = math.log(2) / half_life
+        self._clock = clock
+        self._keys: dict[int, float] = {}
+        # (-key, RecipeId), ascending, so the hottest recipe is first
+        self._ranking: SortedList = SortedList()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def _elapsed(self) -> float:
+        return self.decay * self._clock()
+
+    def load(self, rows: Iterable[tuple[int, float, float | None]]):
+        """
+        Replaces the ranking with (RecipeId, score, time scored) rows. A score
+        with no time is taken as of now.
+        """
+        now = self._clock()
+        keys = {
+            int(recipe_id): (
+                math.log(score) + self.decay * (now if scored_at is None else scored_at)
+                if score > 0
+                else -math.inf
+            )
+            for recipe_id, score, scored_at in rows
+        }
+        ranking = SortedList((-key, recipe_id) for recipe_id, key in keys.items())
+        with self._lock:
+            self._keys = keys
+            self._ranking = ranking
+
+    def track(self, recipe_id: int):
+        """Starts ranking a new recipe with a score of 0."""
+        with self._lock:
+            if recipe_id not in self._keys:
+                self._keys[recipe_id] = -math.inf
+                self._ranking.add((math.inf, recipe_id))
+
+    def add(self, recipe_id: int, weight: float):
+        """Adds weight (negative for a dislike) to a recipe's score as of now."""
+        if not weight:
+            return
+        with self._lock:
+            old = self._keys.get(recipe_id)
+            if old is None:
+                return
+
+            change = math.log(abs(weight)) + self._elapsed()
+            new = _log_add(old, change) if weight > 0 else _log_sub(old, change)
+
+            self._ranking.remove((-old, recipe_id))
+            self._ranking.add((-new, recipe_id))
+            self._keys[recipe_id] = new
+
+    def score(self, recipe_id: int) -> float:
+        key = self._keys.get(recipe_id, -math.inf)
+        return math.exp(key - self._elapsed())
+
+    def page(self, offset: int, count: int) -> list[int]:
+        with self._lock:
+            return [r for _, r in self._ranking[offset : offset + count]]
+
+    def page_after(
+        self, cursor: tuple[float, int] | None, count: int
+    ) -> tuple[list[int], tuple[float, int] | None]:
+        """
+        Up to count recipes ranked after cursor (from the top if None), and
+        the cursor for the page after them, or None at the end.
+
+        A cursor is the (key, RecipeId) of the last recipe served, so likes
+        landing between requests don't shift the next page the way an offset
+        would. Keys are decayed from a fixed time rather than when the engine
+        started, so a cursor still seeks to the same place after a restart or
+        on another worker with the same TRENDING_HALF_LIFE.
+        """
+        with self._lock:
+            start = 0
+            if cursor is not None:
+                key, recipe_id = cursor
+                start = self._ranking.bisect_right((-key, recipe_id))
+            entries = self._ranking[start : start + count]
+            more = start + count < len(self._ranking)
+
+        next_cursor = (-entries[-1][0], entries[-1][1]) if entries and more else None
+        return [r for _, r in entries], next_cursor
+
+
+def decayed(score: float, scored_at: float | None, now: float, half_life: float) -> float:
+    """score as of scored_at, decayed to now. No time means it is already now."""
+    if scored_at is None or scored_at >= now:
+        return score
+    return score * 0.5 ** ((now - scored_at) / half_life)
+
+
+def save_scores(c: sqlite3.Cursor, changes: dict[int, float], half_life: float = HALF_LIFE):
+    """
+    Adds changes to the stored scores of their recipes, decaying each score to
+    now first and recording now as the time it was scored. The Trending table
+    then holds the same decayed scores the engines rank by, so a restart
+    picks the ranking up where it was.
+    """
+    changes = {recipe_id: change for recipe_id, change in changes.items() if change}
+    if not changes:
+        return
+    now = time.time()
+    rows = c.execute(SCORES_QUERY, (id_list(changes),)).fetchall()
+    c.executemany(
+        SAVE_SCORE_QUERY,
+        (
+            (max(decayed(score, scored_at, now, half_life) + changes[recipe_id], 0.0), now, recipe_id)
+            for recipe_id, score, scored_at in rows
+        ),
+    )
+
+
+def encode_cursor(cursor: tuple[float, int]) -> str:
+    return base64.urlsafe_b64encode(struct.pack(">dq", *cursor)).decode().rstrip("=")
+
+
+def decode_cursor(text: str) -> tuple[float, int]:
+    """Raises ValueError if text isn't a cursor from encode_cursor."""
+    try:
+        key, recipe_id = struct.unpack(">dq", base64.urlsafe_b64decode(text + "=="))
+    except (struct.error, ValueError) as e:
+        raise ValueError(f"Invalid cursor {text!r}") from e
+    if math.isnan(key):
+        raise ValueError(f"Invalid cursor {text!r}")
+    return key, recipe_id
+
+
+def get_trending() -> TrendingEngine:
+    """The app's trending ranking, built from the Trending table on first use."""
+    engine = current_app.extensions.get("kitchenfire.trending")
+    if engine is None:
+        engine = TrendingEngine(current_app.config.get("TRENDING_HALF_LIFE", HALF_LIFE))
+        with get_db() as db:
+            engine.load(db.execute("SELECT RecipeId, NumberOfRecentLikes, ScoredAt FROM Trending"))
+        engine = current_app.extensions.setdefault("kitchenfire.trending", engine)
+    return engine
@@ -0,0 +1,212 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Callable, TypeVar
+
+from flask import Flask, Response, current_app
+
+from .db import ConnectionPool, get_pool, write_transaction
+from .metrics import get_metrics
+
+T = TypeVar("T")
+
+Mutation = Callable[[sqlite3.Cursor], object]
+
+
+class WriterTimeout(sqlite3.OperationalError):
+    """A mutation waited longer than WRITER_TIMEOUT and was dropped unrun."""
+
+
+class Writer:
+    """
+    Holds a write connection on a thread of its own and runs the mutations
+    given to submit() on it. While WRITER is on, every write a request or
+    the counter buffer makes goes through here. Migrations are the
+    exception: they run on the pool when it is made, before there is a
+    writer. The importer also writes on its own connection, in a process of
+    its own.
+
+    Everything that queued up while the last transaction was committing goes
+    into the next one (group commit), so a burst of writes waits for the
+    write lock and syncs the WAL once instead of once each, and writes in the
+    process don't contend for the lock with each other. Each mutation runs
+    in a savepoint, so one that raises is undone on its own and the rest of
+    its batch still commits. Futures are only resolved once their batch has
+    committed.
+
+    If the thread dies, everything queued fails with the error and the next
+    submit() starts a new one.
+
+    Mutations get a cursor and must not commit or roll back themselves.
+    """
+
+    def __init__(
+        self,
+        pool: ConnectionPool,
+        max_batch: int = 256,
+        on_batch: Callable[[int], None] | None = None,
+    ):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.on_batch = on_batch
+        self.batches = 0
+        self.committed = 0
+        self.failed = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def depth(self) -> int:
+        """Mutations waiting for the next transaction."""
+        return self._queue.qsize()
+
+    def submit(self, mutation: Mutation) -> Future:
+        future = Future()
+        # With the lock held, so a thread that is exiting either fails this
+        # or has already gone and a new one is started
+        with self._lock:
+            self._queue.put((mutation, future))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="kitchenfire-writer", daemon=True)
+                self._thread.start()
+        return future
+
+    def close(self):
+        """Commits what is already queued, then stops the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self):
+        error: BaseException | None = None
+        try:
+            db = self.pool.open()
+            try:
+                while True:
+                    batch = [self._queue.get()]
+                    while len(batch) < self.max_batch:
+                        try:
+                            batch.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    self._commit(db, [job for job in batch if job is not None])
+                    if None in batch:
+                        return
+            finally:
+                db.close()
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._exit(error)
+
+    def _exit(self, error: BaseException | None):
+        with self._lock:
+            if self._thread is threading.current_thread():
+                self._thread = None
+            if error is None:
+                return
+            failed = []
+            while True:
+                try:
+                    job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None and job[1].set_running_or_notify_cancel():
+                    failed.append(job[1])
+            self.failed += len(failed)
+        for future in failed:
+            future.set_exception(error)
+
+    def _commit(self, db: sqlite3.Connection, batch: list[tuple[Mutation, Future]]):
+        batch = [(mutation, future) for mutation, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        outcomes = []
+        try:
+            self.pool.begin_write(db, "writer")
+            c = db.cursor()
+            for mutation, future in batch:
+                c.execute("SAVEPOINT mutation")
+                try:
+                    outcomes.append((future, mutation(c), None))
+                except Exception as e:
+                    c.execute("ROLLBACK TO mutation")
+                    outcomes.append((future, None, e))
+                c.execute("RELEASE mutation")
+            db.commit()
+        except BaseException as e:
+            # Lost the whole transaction, so nothing in it happened
+            if db.in_transaction:
+                db.rollback()
+            with self._lock:
+                self.failed += len(batch)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        failed = sum(error is not None for _, _, error in outcomes)
+        with self._lock:
+            self.batches += 1
+            self.committed += len(batch) - failed
+            self.failed += failed
+        if self.on_batch is not None:
+            self.on_batch(len(batch))
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+def get_writer() -> Writer:
+    """The app's writer, with at most WRITER_MAX_BATCH mutations per transaction."""
+    writer = current_app.extensions.get("kitchenfire.writer")
+    if writer is None:
+        writer = current_app.extensions.setdefault(
+            "kitchenfire.writer",
+            Writer(
+                get_pool(),
+                current_app.config.get("WRITER_MAX_BATCH", 256),
+                get_metrics()["kitchenfire_writer_batch_size"].observe,
+            ),
+        )
+    return writer
+
+
+def mutate(mutation: Callable[[sqlite3.Cursor], T]) -> T:
+    """
+    Runs mutation in a write transaction and returns what it returned once
+    that has committed, raising whatever it raised. Goes through the writer
+    while WRITER is on (the default), and otherwise runs in a
+    write_transaction on this thread's own connection.
+
+    Raises WriterTimeout if the writer hasn't started on it within
+    WRITER_TIMEOUT seconds; it is then dropped, so it never happens. One
+    the writer has started on is waited for, as the transaction it is in
+    only takes as long as the busy timeout allows.
+    """
+    config = current_app.config
+    if not config.get("WRITER", True):
+        with write_transaction() as db:
+            return mutation(db.cursor())
+
+    future = get_writer().submit(mutation)
+    try:
+        return future.result(config.get("WRITER_TIMEOUT", 10.0))
+    except TimeoutError:
+        if future.cancel():
+            raise WriterTimeout("timed out waiting for the writer") from None
+    return future.result()
+
+
+def init_app(app: Flask):
+    """Answers requests whose writes timed out with a 503 to retry later."""
+    app.register_error_handler(
+        WriterTimeout, lambda e: Response(status=503, headers={"Retry-After": "1"})
+    )
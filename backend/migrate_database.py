@@ -0,0 +1,49 @@
+"""
+Brings a database up to the current schema.
+
+    python migrate_database.py [--db data/fire.db] [--status]
+
+The app does this itself when it starts, and so does database_populator.py.
+This is for doing it ahead of a deploy, or seeing where a database is up
+to with --status.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+
+from kitchenfire import migrate
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.path.join(HERE, "data", "fire.db"))
+    parser.add_argument("--status", action="store_true", help="only list pending migrations")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        sys.exit(f"no database at {args.db}")
+    db = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        current = migrate.version(db)
+        if args.status:
+            print(f"at version {current} of {migrate.LATEST}")
+            for m in migrate.MIGRATIONS:
+                if m.version > current:
+                    print(f"pending {m.version}: {m.name}")
+            return
+        applied = migrate.migrate(db)
+    except sqlite3.Error as e:
+        sys.exit(f"migration failed: {e}")
+    finally:
+        db.close()
+
+    for m in applied:
+        print(f"applied {m.version}: {m.name}")
+    print(f"at version {migrate.LATEST}" if applied else f"already at version {current}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,6 @@
+-- The current schema, for new databases. Existing ones are brought up to it
+-- by the steps in kitchenfire/migrate.py, which every change here needs too.
+
 CREATE TABLE IF NOT EXISTS Tags (
 	TagId INTEGER,
 	TagName TEXT NOT NULL UNIQUE,
@@ -40,6 +43,9 @@ CREATE TABLE IF NOT EXISTS HasTag (
 		ON DELETE RESTRICT ON UPDATE CASCADE
 );
 
+-- Recipes by tag, for the tag filters
+CREATE INDEX IF NOT EXISTS HasTagByTag ON HasTag (TagId, RecipeId);
+
 CREATE TABLE IF NOT EXISTS Requires (
 	RecipeId INTEGER,
 	IngredientId INTEGER,
@@ -52,11 +58,16 @@ CREATE TABLE IF NOT EXISTS Requires (
 		ON DELETE RESTRICT ON UPDATE CASCADE
 );
 
+-- Recipes by ingredient, for the ingredient filters
+CREATE INDEX IF NOT EXISTS RequiresByIngredient ON Requires (IngredientId, RecipeId);
+
 CREATE TABLE IF NOT EXISTS Posts (
 	RecipeId INTEGER,
 	NumberOfLikes INTEGER NOT NULL CHECK (NumberOfLikes >= 0) DEFAULT 0,
 	Rating DOUBLE NOT NULL CHECK (Rating >= 0 AND Rating <= 5),
 	Reviews INTEGER NOT NULL DEFAULT 0,
+	-- Sum of the ratings counted in Reviews; Rating is RatingSum / Reviews
+	RatingSum DOUBLE NOT NULL DEFAULT 0.0,
 	PRIMARY KEY (RecipeId),
 	FOREIGN KEY (RecipeId) REFERENCES Recipes (RecipeId)
 		ON DELETE RESTRICT ON UPDATE CASCADE
@@ -65,6 +76,8 @@ CREATE TABLE IF NOT EXISTS Posts (
 CREATE TABLE IF NOT EXISTS Trending (
 	RecipeId INTEGER,
 	NumberOfRecentLikes DOUBLE NOT NULL CHECK (NumberOfRecentLikes >= 0),
+	-- Unix time NumberOfRecentLikes was last decayed to; none means it is current
+	ScoredAt DOUBLE,
 	PRIMARY KEY (RecipeId),
 	FOREIGN KEY (RecipeId) REFERENCES Posts (RecipeId)
 		ON DELETE CASCADE ON UPDATE CASCADE
@@ -81,3 +94,21 @@ CREATE TABLE IF NOT EXISTS Comments (
     FOREIGN KEY (PostId) REFERENCES Posts (PostId)
         ON DELETE CASCADE ON UPDATE CASCADE
 );
+
+-- Comment pages, newest first and most liked first
+CREATE INDEX IF NOT EXISTS CommentsByPost ON Comments (PostId, CommentId);
+CREATE INDEX IF NOT EXISTS CommentsByLikes ON Comments (PostId, NumberOfLikes, CommentId);
+
+-- What each recipe looked like in the CSVs when it was last imported, so an
+-- incremental import only touches the recipes that changed
+CREATE TABLE IF NOT EXISTS Imported (
+	RecipeName TEXT,
+	Digest TEXT NOT NULL,
+	PRIMARY KEY (RecipeName)
+) WITHOUT ROWID;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS RecipeSearch USING fts5(
+    RecipeName, Description, Instructions, Tags, Ingredients,
+    tokenize = 'porter unicode61',
+    prefix = '2 3'
+);
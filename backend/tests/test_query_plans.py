@@ -0,0 +1,33 @@
+"""
+No registered statement scans a table it wasn't meant to; see
+benchmarks/query_plans.py for a larger database and the plans themselves.
+
+    cd backend && python -m pytest tests
+"""
+import pytest
+
+from benchmarks.query_plans import PARAMETERS, full_scans, plan_database
+from kitchenfire import queries
+
+# Small enough to build quickly, big enough that the planner uses the indexes
+# it would in production rather than scanning the smaller tables
+RECIPES = 10_000
+COMMENTS = 40_000
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    db = plan_database(str(tmp_path_factory.mktemp("plans") / "plans.db"), RECIPES, COMMENTS)
+    yield db
+    db.close()
+
+
+def test_every_statement_is_checked():
+    assert not set(queries.STATEMENTS) - set(PARAMETERS), "add them to PARAMETERS"
+
+
+@pytest.mark.parametrize("name", sorted(PARAMETERS))
+def test_no_full_scans(db, name):
+    parameters, allowed = PARAMETERS[name]
+    plan, bad = full_scans(db, queries.STATEMENTS[name], parameters, allowed)
+    assert not bad, plan
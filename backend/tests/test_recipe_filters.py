@@ -0,0 +1,50 @@
+"""
+The in-memory index's ingredient and tag filters give the same recipes as
+the SQL they replaced.
+
+    cd backend && python -m pytest tests
+"""
+import random
+import sqlite3
+
+import pytest
+
+from benchmarks.recipe_filters import as_path, random_queries
+from benchmarks.synthetic import build_database
+from kitchenfire import filter_by_ingredient_sql, filter_by_tag_sql
+from kitchenfire.recipe_index import RecipeIndex
+
+INGREDIENTS = 300
+TAGS = 40
+
+
+@pytest.fixture(scope="module")
+def cursor(tmp_path_factory):
+    db_url = build_database(
+        str(tmp_path_factory.mktemp("filters") / "filters.db"),
+        recipes=2_000,
+        ingredients=INGREDIENTS,
+        tags=TAGS,
+        skew=1.1,
+    )
+    db = sqlite3.connect(db_url)
+    yield db.cursor()
+    db.close()
+
+
+@pytest.fixture(scope="module")
+def index(cursor):
+    index = RecipeIndex()
+    index.load(cursor)
+    return index
+
+
+@pytest.mark.parametrize(
+    "kind, ids, sql",
+    [("ingredient", INGREDIENTS, filter_by_ingredient_sql), ("tag", TAGS, filter_by_tag_sql)],
+)
+def test_index_matches_sql(cursor, index, kind, ids, sql):
+    indexed = index.filter_ingredients if kind == "ingredient" else index.filter_tags
+    for exclude, include in random_queries(random.Random(kind), ids):
+        path = (as_path(exclude), as_path(include))
+        assert indexed(exclude, include) == sorted(sql(cursor, *path)), path